@@ -1,9 +1,10 @@
 #!/usr/bin/env python3
 
-from flask import Flask, request, send_file, jsonify, make_response
+from flask import Flask, request, send_file, jsonify, make_response, Response, redirect, g
 import flask_restful
 import json
 import functools
+import itertools
 import os
 import sys
 import logging
@@ -11,7 +12,10 @@ import urllib.parse
 import cloudlanguagetools.constants
 import cloudlanguagetools.servicemanager
 import cloudlanguagetools.errors
+import cloudlanguagetools.audiocache
 import redisdb
+import request_coalescing
+import peer_cache
 import patreon_utils
 import getcheddar_utils as getcheddar_utils_module
 import convertkit
@@ -19,6 +23,9 @@ import secrets
 import pprint
 import hashlib
 import hmac
+import io
+import zipfile
+import time
 
 #logging.basicConfig()
 logging.basicConfig(format='%(asctime)s %(levelname)-8s [%(filename)s:%(lineno)d] %(message)s', 
@@ -32,6 +39,9 @@ manager = cloudlanguagetools.servicemanager.ServiceManager(secrets.config)
 manager.configure()
 
 redis_connection = redisdb.RedisDb()
+manager.configure_request_coalescer(request_coalescing.RequestCoalescer(redis_connection))
+# optional, when running several nodes
+manager.configure_peer_cache(peer_cache.create_peer_cache_from_env(redis_connection))
 convertkit_client = convertkit.ConvertKit()
 getcheddar_utils = getcheddar_utils_module.GetCheddarUtils()
 
@@ -59,6 +69,28 @@ def authenticate_get(func):
         return {'error': result['msg']}, 401
     return wrapper
 
+def authenticate_peer(func):
+    # requests from other nodes of the peer audio cache
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        shared_secret = os.environ.get('PEER_CACHE_SECRET', None)
+        peer_secret = request.headers.get(peer_cache.PEER_SECRET_HEADER, '')
+        if shared_secret != None and hmac.compare_digest(peer_secret, shared_secret):
+            return func(*args, **kwargs)
+        return {'error': 'invalid peer secret'}, 401
+    return wrapper
+
+def authenticate_admin(func):
+    # operator endpoints, disabled unless ADMIN_SECRET is set
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        admin_secret = os.environ.get('ADMIN_SECRET', None)
+        request_secret = request.headers.get('admin_secret', '')
+        if admin_secret != None and hmac.compare_digest(request_secret, admin_secret):
+            return func(*args, **kwargs)
+        return {'error': 'invalid admin secret'}, 401
+    return wrapper
+
 def track_usage(request_type, request, func, *args, **kwargs):
     api_key = request.headers.get('api_key', None)
     if api_key != None:
@@ -98,23 +130,153 @@ def track_usage_audio(func):
         return track_usage(cloudlanguagetools.constants.RequestType.audio, request, func, *args, **kwargs)
     return wrapper            
 
+def validate_audio_format(func):
+    # before usage tracking, a request which can't be served doesn't get charged
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        audio_format_str = request.json.get('audio_format', cloudlanguagetools.constants.AudioFormat.mp3.name)
+        if audio_format_str not in cloudlanguagetools.constants.AudioFormat.__members__:
+            return {'error': f'unsupported audio_format: {audio_format_str}'}, 400
+        return func(*args, **kwargs)
+    return wrapper
+
 def track_usage_audio_yomichan(func):
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         api_key = request.args.get('api_key', None)
         if api_key != None:
-            text = request.args.get('text', None)
-            service_str = request.args.get('service', None)
-            if text != None and service_str != None:
-                service = cloudlanguagetools.constants.Service[service_str]
-                characters = len(text)
-                try:
-                    redis_connection.track_usage(api_key, service, cloudlanguagetools.constants.RequestType.audio, characters, cloudlanguagetools.constants.Language.ja)
-                except cloudlanguagetools.errors.OverQuotaError as err:
-                    return {'error': str(err)}, 429
+            source_text, service_str, voice_key, options = g.yomichan_audio_args
+            service = cloudlanguagetools.constants.Service[service_str]
+            characters = len(source_text)
+            try:
+                redis_connection.track_usage(api_key, service, cloudlanguagetools.constants.RequestType.audio, characters, cloudlanguagetools.constants.Language.ja)
+            except cloudlanguagetools.errors.OverQuotaError as err:
+                return {'error': str(err)}, 429
         return func(*args, **kwargs)
     return wrapper
 
+# yomichan audio is fully determined by the query parameters, browsers can keep it.
+# private, because the url contains the api key
+YOMICHAN_AUDIO_CACHE_CONTROL = 'private, max-age=2592000' # 30 days
+# the voice handle index gets built when the process starts
+YOMICHAN_VOICE_LIST_RETRY_AFTER = 10
+
+def get_yomichan_audio_args():
+    """returns (text, service, voice_key, options) from the query string, or None if arguments are missing.
+    the voice is either specified with service and voice_key, or with a voice handle (voice=<handle>),
+    see /voice_list. raises NotFoundError if the voice handle doesn't exist"""
+    source_text = request.args.get('text')
+    voice_handle = request.args.get('voice')
+    options = {}
+    if source_text != None and voice_handle != None:
+        service, voice_key = manager.get_voice_for_handle(voice_handle)
+        return source_text, service, voice_key, options
+    service = request.args.get('service')
+    voice_key_urlencode_str = request.args.get('voice_key')
+    if source_text == None or service == None or voice_key_urlencode_str == None:
+        return None
+    voice_key_json_str = urllib.parse.unquote_plus(voice_key_urlencode_str)
+    voice_key = json.loads(voice_key_json_str)
+    return source_text, service, voice_key, options
+
+def get_yomichan_audio_etag(yomichan_audio_args):
+    source_text, service, voice_key, options = yomichan_audio_args
+    return cloudlanguagetools.audiocache.build_audio_cache_key(source_text, service, voice_key, options)
+
+def resolve_yomichan_audio_args(func):
+    # the voice handle is resolved once per request, the next steps use g.yomichan_audio_args
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            yomichan_audio_args = get_yomichan_audio_args()
+        except json.decoder.JSONDecodeError:
+            return {'error': 'invalid voice_key'}, 400
+        except cloudlanguagetools.errors.NotFoundError as err:
+            return {'error': str(err)}, 404
+        except cloudlanguagetools.errors.RequestError as err:
+            # the voice list isn't available yet
+            return {'error': str(err)}, 503, {'Retry-After': str(YOMICHAN_VOICE_LIST_RETRY_AFTER)}
+        if yomichan_audio_args == None:
+            return {'error': 'missing arguments'}, 400
+        if yomichan_audio_args[1] not in cloudlanguagetools.constants.Service.__members__:
+            return {'error': f'unknown service: {yomichan_audio_args[1]}'}, 400
+        g.yomichan_audio_args = yomichan_audio_args
+        return func(*args, **kwargs)
+    return wrapper
+
+def yomichan_audio_conditional_get(func):
+    # runs before usage tracking: a client which already has the audio doesn't get charged
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        etag = get_yomichan_audio_etag(g.yomichan_audio_args)
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = YOMICHAN_AUDIO_CACHE_CONTROL
+            return response
+        return func(*args, **kwargs)
+    return wrapper
+
+AUDIO_BATCH_MAX_ITEMS = 100
+VOICE_COMPARISON_MAX_VOICES = 20
+AUDIO_PREFETCH_MAX_ITEMS = 20
+AUDIO_CONCAT_MAX_ITEMS = 20
+AUDIO_CONCAT_MAX_SILENCE = 5000 # milliseconds
+JOB_MAX_ITEMS = 1000
+# long-polling holds a sync web worker, keep it short and let the client poll again
+JOB_MAX_WAIT = 2
+JOB_POLL_INTERVAL = 0.5
+
+def track_usage_audio_batch(api_key, audio_requests, track=True):
+    """charge the quota for a list of audio requests in one pass, raises OverQuotaError.
+    with track=False, only checks that the key is under quota"""
+    characters_by_service_language = {}
+    for audio_request in audio_requests:
+        key = (audio_request['service'], audio_request.get('language_code', None))
+        characters_by_service_language[key] = characters_by_service_language.get(key, 0) + len(audio_request['text'])
+    usage_list = []
+    for (service_str, language_code_str), characters in characters_by_service_language.items():
+        service = cloudlanguagetools.constants.Service[service_str]
+        language_code = None
+        if language_code_str != None:
+            language_code = cloudlanguagetools.constants.Language[language_code_str]
+        usage_list.append((service, characters, language_code))
+    # check every service / language first, so that a 429 doesn't leave part of the batch charged
+    for service, characters, language_code in usage_list:
+        redis_connection.track_usage(api_key, service, cloudlanguagetools.constants.RequestType.audio, characters, language_code, False)
+    if track:
+        for service, characters, language_code in usage_list:
+            redis_connection.track_usage(api_key, service, cloudlanguagetools.constants.RequestType.audio, characters, language_code)
+
+def track_usage_translation_batch(api_key, items, track=True):
+    """charge the quota for a list of translation items, one pass per service, raises OverQuotaError.
+    with track=False, only checks that the key is under quota"""
+    characters_by_service = {}
+    for item in items:
+        characters_by_service[item['service']] = characters_by_service.get(item['service'], 0) + len(item['text'])
+    for service_str, characters in characters_by_service.items():
+        service = cloudlanguagetools.constants.Service[service_str]
+        redis_connection.track_usage(api_key, service, cloudlanguagetools.constants.RequestType.translation, characters, track=track)
+
+def build_audio_zip_response(results, audio_format=cloudlanguagetools.constants.AudioFormat.mp3):
+    """zip file containing one audio file per successful result, and results.json with the status of each item"""
+    zip_buffer = io.BytesIO()
+    status_list = []
+    with zipfile.ZipFile(zip_buffer, 'w') as zip_file:
+        for index, result in enumerate(results):
+            status = {'index': index, 'processing_time': result['processing_time']}
+            if result['error'] == None:
+                filename = f'{index}.{audio_format.file_extension}'
+                zip_file.writestr(filename, result['audio'].get_bytes())
+                status.update({'status': 200, 'filename': filename})
+            elif isinstance(result['error'], cloudlanguagetools.errors.NotFoundError):
+                status.update({'status': 404, 'error': str(result['error'])})
+            else:
+                status.update({'status': 400, 'error': str(result['error'])})
+            status_list.append(status)
+        zip_file.writestr('results.json', json.dumps(status_list))
+    zip_buffer.seek(0)
+    return send_file(zip_buffer, mimetype='application/zip')
 
 class LanguageList(flask_restful.Resource):
     def get(self):
@@ -172,8 +334,8 @@ class Audio(flask_restful.Resource):
     def post(self):
         try:
             data = request.json
-            audio_temp_file = manager.get_tts_audio(data['text'], data['service'], data['voice_key'], data['options'])
-            return send_file(audio_temp_file.name, mimetype='audio/mpeg')
+            audio_buffer = manager.get_tts_audio(data['text'], data['service'], data['voice_key'], data['options'])
+            return send_file(audio_buffer.get_file(), mimetype='audio/mpeg')
         except cloudlanguagetools.errors.NotFoundError as err:
             return {'error': str(err)}, 404
         except cloudlanguagetools.errors.RequestError as err:
@@ -181,7 +343,7 @@ class Audio(flask_restful.Resource):
 
 
 class AudioV2(flask_restful.Resource):
-    method_decorators = [track_usage_audio, authenticate] # authenticate is the first step
+    method_decorators = [track_usage_audio, validate_audio_format, authenticate] # authenticate is the first step
     def post(self):
         try:
 
@@ -198,8 +360,28 @@ class AudioV2(flask_restful.Resource):
             language_code = cloudlanguagetools.constants.Language[language]
             service = cloudlanguagetools.constants.Service[service_str]
             request_mode = cloudlanguagetools.constants.RequestMode[request_mode_str]
-
-            audio_temp_file = manager.get_tts_audio(text, service.name, voice_key, options)
+            audio_format = cloudlanguagetools.constants.AudioFormat[data.get('audio_format', cloudlanguagetools.constants.AudioFormat.mp3.name)]
+
+            # streaming: forward audio chunks to the client as the service synthesizes them
+            stream = data.get('stream', False)
+            # long texts: sentences get synthesized concurrently, then joined
+            chunked = data.get('chunked', False)
+            # clients which send 'redirect': True download audio which is in the shared audio storage
+            # (and not cached on this node) from there directly
+            audio_url = None
+            if data.get('redirect', False):
+                audio_url = manager.get_tts_audio_url(text, service.name, voice_key, options, audio_format)
+            if audio_url != None:
+                stream = False
+            elif chunked:
+                stream = False
+                audio_buffer = manager.get_tts_audio_chunked(text, service.name, voice_key, options, language_code, audio_format, request_mode)
+            elif stream:
+                audio_stream = manager.get_tts_audio_stream(text, service.name, voice_key, options, audio_format, request_mode)
+                # retrieve the first chunk right away, so that errors are reported with the right status code
+                first_chunk = next(audio_stream, b'')
+            else:
+                audio_buffer = manager.get_tts_audio(text, service.name, voice_key, options, audio_format, request_mode)
 
             # track client
             api_key = request.headers.get('api_key')
@@ -216,31 +398,305 @@ class AudioV2(flask_restful.Resource):
             # track audio language
             redis_connection.track_audio_language(api_key, language_code)
 
+            # log the request, popular requests get pre-synthesized into the audio cache
+            redis_connection.log_audio_request(api_key, {
+                'text': text,
+                'service': service.name,
+                'voice_key': voice_key,
+                'options': options,
+                'language_code': language_code.name,
+                'request_mode': request_mode.name,
+                'audio_format': audio_format.name
+            })
+
             # return data
-            return send_file(audio_temp_file.name, mimetype='audio/mpeg')
+            if audio_url != None:
+                # 303: the client fetches the url with a GET
+                return redirect(audio_url, code=303)
+            if stream:
+                return Response(itertools.chain([first_chunk], audio_stream), mimetype=audio_format.mime_type)
+            return send_file(audio_buffer.get_file(), mimetype=audio_format.mime_type)
         except cloudlanguagetools.errors.NotFoundError as err:
             return {'error': str(err)}, 404
         except cloudlanguagetools.errors.RequestError as err:
             return {'error': str(err)}, 400            
 
 class YomichanAudio(flask_restful.Resource):
-    method_decorators = [track_usage_audio_yomichan, authenticate_get]
+    method_decorators = [track_usage_audio_yomichan, yomichan_audio_conditional_get, resolve_yomichan_audio_args, authenticate_get]
     def get(self):
         try:
-            source_text = request.args.get('text')
-            service = request.args.get('service')
-            voice_key_urlencode_str = request.args.get('voice_key')
-            if source_text == None or service == None or voice_key_urlencode_str == None:
-                return {'error': 'missing arguments'}, 400
-            voice_key_json_str = urllib.parse.unquote_plus(voice_key_urlencode_str)
-            voice_key = json.loads(voice_key_json_str)
-            options = {}
-            audio_temp_file = manager.get_tts_audio(source_text, service, voice_key, options)
-            return send_file(audio_temp_file.name, mimetype='audio/mpeg')
+            yomichan_audio_args = g.yomichan_audio_args
+            source_text, service, voice_key, options = yomichan_audio_args
+            # yomichan plays the audio as soon as the user looks up a word
+            audio_buffer = manager.get_tts_audio(source_text, service, voice_key, options,
+                request_mode=cloudlanguagetools.constants.RequestMode.dynamic)
+            response = send_file(audio_buffer.get_file(), mimetype='audio/mpeg')
+            response.set_etag(get_yomichan_audio_etag(yomichan_audio_args))
+            response.headers['Cache-Control'] = YOMICHAN_AUDIO_CACHE_CONTROL
+            return response
+        except cloudlanguagetools.errors.NotFoundError as err:
+            return {'error': str(err)}, 404
         except cloudlanguagetools.errors.RequestError as err:
             return {'error': str(err)}, 400        
 
 
+class PeerAudio(flask_restful.Resource):
+    # no usage tracking, the node which received the request from the user does it
+    method_decorators = [authenticate_peer]
+    def post(self):
+        try:
+            data = request.json
+            audio_format = cloudlanguagetools.constants.AudioFormat[data['audio_format']]
+            request_mode = cloudlanguagetools.constants.RequestMode[data['request_mode']]
+            audio_buffer = manager.get_tts_audio(data['text'], data['service'], data['voice_key'], data['options'],
+                audio_format, request_mode, use_peer_cache=False)
+            return send_file(audio_buffer.get_file(), mimetype=audio_format.mime_type)
+        except cloudlanguagetools.errors.NotFoundError as err:
+            return {'error': str(err)}, 404
+        except cloudlanguagetools.errors.RequestError as err:
+            return {'error': str(err)}, 400
+
+class ServiceStats(flask_restful.Resource):
+    # exposes peer urls and cache internals
+    method_decorators = [authenticate_admin]
+    def get(self):
+        return manager.get_stats()
+
+def validate_audio_batch(audio_requests, max_items):
+    """returns an error message, or None if the audio requests are valid"""
+    if len(audio_requests) > max_items:
+        return f'too many items, maximum is {max_items}'
+    for audio_request in audio_requests:
+        for field in ['text', 'service', 'voice_key', 'options']:
+            if field not in audio_request:
+                return f'missing field: {field}'
+        if audio_request['service'] not in cloudlanguagetools.constants.Service.__members__:
+            return f"unknown service: {audio_request['service']}"
+    return None
+
+def validate_audio_concat(items):
+    """returns an error message, or None if the items are valid"""
+    audio_requests = [item for item in items if 'silence' not in item]
+    if len(audio_requests) == 0:
+        return 'no audio items'
+    for item in items:
+        if 'silence' in item:
+            if not isinstance(item['silence'], int) or item['silence'] < 0 or item['silence'] > AUDIO_CONCAT_MAX_SILENCE:
+                return f'silence must be between 0 and {AUDIO_CONCAT_MAX_SILENCE} milliseconds'
+    if len(items) > AUDIO_CONCAT_MAX_ITEMS:
+        return f'too many items, maximum is {AUDIO_CONCAT_MAX_ITEMS}'
+    return validate_audio_batch(audio_requests, AUDIO_CONCAT_MAX_ITEMS)
+
+def process_audio_batch(audio_requests, request_mode, audio_format, multi_utterance=False):
+    """charge quota, synthesize concurrently and track usage, returns the zip response"""
+    # authentication and quota accounting happen once for the whole batch
+    api_key = request.headers.get('api_key')
+    try:
+        track_usage_audio_batch(api_key, audio_requests)
+    except cloudlanguagetools.errors.OverQuotaError as err:
+        return {'error': str(err)}, 429
+
+    results = manager.get_tts_audio_batch([{**audio_request, 'audio_format': audio_format, 'request_mode': request_mode} for audio_request in audio_requests],
+        multi_utterance)
+
+    track_audio_batch(api_key, audio_requests, request_mode)
+
+    return build_audio_zip_response(results, audio_format)
+
+def track_audio_batch(api_key, audio_requests, request_mode):
+    client = request.headers.get('client')
+    version = request.headers.get('client_version')
+    redis_connection.track_client(api_key, client, version)
+    redis_connection.track_request_mode(api_key, request_mode)
+    for service_str in set([x['service'] for x in audio_requests]):
+        redis_connection.track_service(api_key, cloudlanguagetools.constants.Service[service_str])
+    for language_code_str in set([x['language_code'] for x in audio_requests if 'language_code' in x]):
+        redis_connection.track_audio_language(api_key, cloudlanguagetools.constants.Language[language_code_str])
+
+class AudioBatch(flask_restful.Resource):
+    method_decorators = [authenticate]
+    def post(self):
+        try:
+            data = request.json
+            request_mode = cloudlanguagetools.constants.RequestMode[data['request_mode']]
+            audio_requests = data['items']
+            audio_format = cloudlanguagetools.constants.AudioFormat[data.get('audio_format', cloudlanguagetools.constants.AudioFormat.mp3.name)]
+            # vocabulary decks: short words on the same voice get synthesized with a single service call
+            multi_utterance = data.get('multi_utterance', False)
+            error_message = validate_audio_batch(audio_requests, AUDIO_BATCH_MAX_ITEMS)
+            if error_message != None:
+                return {'error': error_message}, 400
+            return process_audio_batch(audio_requests, request_mode, audio_format, multi_utterance)
+        except KeyError as err:
+            return {'error': f'invalid request: {err}'}, 400
+
+class VoiceComparison(flask_restful.Resource):
+    # the same text in several voices, so that the user can pick one
+    method_decorators = [authenticate]
+    def post(self):
+        try:
+            data = request.json
+            request_mode = cloudlanguagetools.constants.RequestMode[data.get('request_mode', cloudlanguagetools.constants.RequestMode.edit.name)]
+            audio_format = cloudlanguagetools.constants.AudioFormat[data.get('audio_format', cloudlanguagetools.constants.AudioFormat.mp3.name)]
+            audio_requests = []
+            for voice in data['voices']:
+                audio_request = {
+                    'text': data['text'],
+                    'service': voice['service'],
+                    'voice_key': voice['voice_key'],
+                    'options': voice.get('options', {})
+                }
+                if 'language_code' in data:
+                    audio_request['language_code'] = data['language_code']
+                audio_requests.append(audio_request)
+            error_message = validate_audio_batch(audio_requests, VOICE_COMPARISON_MAX_VOICES)
+            if error_message != None:
+                return {'error': error_message}, 400
+            return process_audio_batch(audio_requests, request_mode, audio_format)
+        except KeyError as err:
+            return {'error': f'invalid request: {err}'}, 400
+
+class AudioConcat(flask_restful.Resource):
+    # a word followed by its example sentence, or the same text in two voices, returned as a single clip.
+    # items are audio requests, or {'silence': milliseconds} to insert a pause
+    method_decorators = [authenticate]
+    def post(self):
+        try:
+            data = request.json
+            request_mode = cloudlanguagetools.constants.RequestMode[data.get('request_mode', cloudlanguagetools.constants.RequestMode.edit.name)]
+            audio_format = cloudlanguagetools.constants.AudioFormat[data.get('audio_format', cloudlanguagetools.constants.AudioFormat.mp3.name)]
+            items = data['items']
+            error_message = validate_audio_concat(items)
+            if error_message != None:
+                return {'error': error_message}, 400
+            audio_requests = [item for item in items if 'silence' not in item]
+
+            api_key = request.headers.get('api_key')
+            try:
+                track_usage_audio_batch(api_key, audio_requests)
+            except cloudlanguagetools.errors.OverQuotaError as err:
+                return {'error': str(err)}, 429
+
+            audio_buffer = manager.get_tts_audio_concat(items, audio_format, request_mode)
+
+            track_audio_batch(api_key, audio_requests, request_mode)
+
+            return send_file(audio_buffer.get_file(), mimetype=audio_format.mime_type)
+        except KeyError as err:
+            return {'error': f'invalid request: {err}'}, 400
+        except cloudlanguagetools.errors.NotFoundError as err:
+            return {'error': str(err)}, 404
+        except cloudlanguagetools.errors.RequestError as err:
+            return {'error': str(err)}, 400
+
+class AudioPrefetch(flask_restful.Resource):
+    # hints about audio the client is going to request soon (upcoming cards in a review session).
+    # the audio gets synthesized into the cache in the background, quota is charged when the client
+    # actually requests it on /audio_v2
+    method_decorators = [authenticate]
+    def post(self):
+        try:
+            data = request.json
+            audio_format = cloudlanguagetools.constants.AudioFormat[data.get('audio_format', cloudlanguagetools.constants.AudioFormat.mp3.name)]
+            audio_requests = data['items']
+            error_message = validate_audio_batch(audio_requests, AUDIO_PREFETCH_MAX_ITEMS)
+            if error_message != None:
+                return {'error': error_message}, 400
+            # not charged yet, but keys over quota can't make us call services
+            api_key = request.headers.get('api_key')
+            track_usage_audio_batch(api_key, audio_requests, track=False)
+            queued_count = manager.prefetch_tts_audio([{**audio_request, 'audio_format': audio_format} for audio_request in audio_requests], api_key)
+            return {'queued': queued_count}, 202
+        except cloudlanguagetools.errors.OverQuotaError as err:
+            return {'error': str(err)}, 429
+        except KeyError as err:
+            return {'error': f'invalid request: {err}'}, 400
+
+class Jobs(flask_restful.Resource):
+    # large batches get queued and processed by job_worker.py, the client polls for the results
+    method_decorators = [authenticate]
+    def post(self):
+        try:
+            data = request.json
+            api_key = request.headers.get('api_key')
+            job_type = data['job_type']
+            items = data['items']
+            if job_type == redisdb.JOB_TYPE_AUDIO:
+                if not manager.shared_audio_available():
+                    return {'error': 'audio jobs are not available, no audio storage shared with the job workers'}, 503
+                request_mode = cloudlanguagetools.constants.RequestMode[data['request_mode']]
+                audio_format = cloudlanguagetools.constants.AudioFormat[data.get('audio_format', cloudlanguagetools.constants.AudioFormat.mp3.name)]
+                error_message = validate_audio_batch(items, JOB_MAX_ITEMS)
+                if error_message != None:
+                    return {'error': error_message}, 400
+                track_usage_audio_batch(api_key, items)
+                track_audio_batch(api_key, items, request_mode)
+                job_data = {'items': items, 'audio_format': audio_format.name}
+            elif job_type == redisdb.JOB_TYPE_TRANSLATION:
+                if len(items) > JOB_MAX_ITEMS:
+                    return {'error': f'too many items, maximum is {JOB_MAX_ITEMS}'}, 400
+                for item in items:
+                    for field in ['text', 'service', 'from_language_key', 'to_language_key']:
+                        if field not in item:
+                            return {'error': f'missing field: {field}'}, 400
+                # check the quota for every item before charging any of them
+                track_usage_translation_batch(api_key, items, track=False)
+                track_usage_translation_batch(api_key, items)
+                job_data = {'items': items}
+            else:
+                return {'error': f'unknown job_type: {job_type}'}, 400
+            job_id = redis_connection.submit_job(api_key, job_type, job_data)
+            return {'job_id': job_id}, 202
+        except cloudlanguagetools.errors.OverQuotaError as err:
+            return {'error': str(err)}, 429
+        except KeyError as err:
+            return {'error': f'invalid request: {err}'}, 400
+
+def get_user_job(job_id):
+    """returns the job, or None if it doesn't exist or belongs to another user"""
+    job = redis_connection.get_job(job_id)
+    if job == None or job['api_key'] != request.headers.get('api_key'):
+        return None
+    return job
+
+class Job(flask_restful.Resource):
+    method_decorators = [authenticate]
+    def get(self, job_id):
+        # long-polling: ?wait=<seconds> returns as soon as the job is done
+        try:
+            wait_time = min(max(float(request.args.get('wait', 0)), 0), JOB_MAX_WAIT)
+        except ValueError:
+            return {'error': f"invalid wait: {request.args.get('wait')}"}, 400
+        deadline = time.time() + wait_time
+        job = get_user_job(job_id)
+        while job != None and job['status'] != redisdb.JOB_STATUS_DONE and time.time() < deadline:
+            time.sleep(JOB_POLL_INTERVAL)
+            job = get_user_job(job_id)
+        if job == None:
+            return {'error': f'job not found: {job_id}'}, 404
+        return {
+            'job_id': job_id,
+            'job_type': job['job_type'],
+            'status': job['status'],
+            'results': job['results']
+        }
+
+class JobAudio(flask_restful.Resource):
+    method_decorators = [authenticate]
+    def get(self, job_id, index):
+        job = get_user_job(job_id)
+        if job == None:
+            return {'error': f'job not found: {job_id}'}, 404
+        if index >= len(job['results']) or job['results'][index]['status'] != 200:
+            return {'error': f'no audio for job {job_id} item {index}'}, 404
+        audio_format = cloudlanguagetools.constants.AudioFormat[job['data']['audio_format']]
+        # the job worker put the audio in the audio storage / shared audio cache
+        audio_data = manager.get_cached_audio(job['results'][index]['cache_key'], audio_format)
+        if audio_data == None:
+            # evicted. synthesizing it again here would charge the provider twice and hold a web worker
+            return {'error': f'audio for job {job_id} item {index} is no longer available'}, 404
+        return send_file(io.BytesIO(audio_data), mimetype=audio_format.mime_type)
+
 class VerifyApiKey(flask_restful.Resource):
     def post(self):
         data = request.json
@@ -356,6 +812,15 @@ api.add_resource(Detect, '/detect')
 api.add_resource(Audio, '/audio')
 api.add_resource(AudioV2, '/audio_v2')
 api.add_resource(YomichanAudio, '/yomichan_audio')
+api.add_resource(AudioBatch, '/audio_batch')
+api.add_resource(VoiceComparison, '/voice_comparison')
+api.add_resource(AudioConcat, '/audio_concat')
+api.add_resource(AudioPrefetch, '/audio_prefetch')
+api.add_resource(Jobs, '/jobs')
+api.add_resource(Job, '/jobs/<string:job_id>')
+api.add_resource(JobAudio, '/jobs/<string:job_id>/audio/<int:index>')
+api.add_resource(ServiceStats, '/service_stats')
+api.add_resource(PeerAudio, '/_peer_audio')
 api.add_resource(VerifyApiKey, '/verify_api_key')
 api.add_resource(Account, '/account')
 api.add_resource(PatreonKey, '/patreon_key')
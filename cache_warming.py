@@ -0,0 +1,100 @@
+import json
+import logging
+import timeit
+
+import quotas
+import cloudlanguagetools.constants
+import cloudlanguagetools.errors
+import cloudlanguagetools.audiocache
+import cloudlanguagetools.textnormalization
+
+# only requests which came back at least this many times are worth pre-synthesizing
+CACHE_WARMING_MIN_REQUEST_COUNT = 2
+CACHE_WARMING_MAX_REQUESTS = 5000
+# provider spend allowed per run, in dollars
+CACHE_WARMING_DEFAULT_BUDGET = 1.0
+# stop before the end of the off-peak window
+CACHE_WARMING_MAX_DURATION = 2 * 3600
+
+def get_audio_character_costs():
+    # services not in the cost table (Forvo, CereProc, ...) don't get warmed, we don't know what they cost
+    return {x['service']: x['character_cost'] for x in quotas.COST_TABLE if x['request_type'] == 'audio'}
+
+def get_popular_audio_requests(audio_request_log, min_count=CACHE_WARMING_MIN_REQUEST_COUNT):
+    """audio_request_log is a list of json strings, as written by redisdb.log_audio_request.
+    returns a list of (count, audio_request), most requested first"""
+    counts = {}
+    audio_requests = {}
+    for entry in audio_request_log:
+        data = json.loads(entry)
+        audio_request = {
+            # the same way ServiceManager.get_tts_audio builds the cache key
+            'text': cloudlanguagetools.textnormalization.normalize_text(data['text'], cloudlanguagetools.constants.RequestType.audio, data['service']),
+            'service': data['service'],
+            'voice_key': data['voice_key'],
+            'options': data.get('options', {}),
+            'language_code': data.get('language_code', None),
+            'audio_format': data.get('audio_format', cloudlanguagetools.constants.AudioFormat.mp3.name)
+        }
+        cache_key = cloudlanguagetools.audiocache.build_audio_cache_key(audio_request['text'], audio_request['service'],
+            audio_request['voice_key'], audio_request['options'], cloudlanguagetools.constants.AudioFormat[audio_request['audio_format']])
+        counts[cache_key] = counts.get(cache_key, 0) + 1
+        audio_requests[cache_key] = audio_request
+
+    result = [(count, audio_requests[cache_key]) for cache_key, count in counts.items() if count >= min_count]
+    result.sort(key=lambda x: x[0], reverse=True)
+    return result
+
+def get_audio_request_cost(audio_request, character_costs):
+    service = cloudlanguagetools.constants.Service[audio_request['service']]
+    language = None
+    if audio_request['language_code'] in cloudlanguagetools.constants.Language.__members__:
+        language = cloudlanguagetools.constants.Language[audio_request['language_code']]
+    characters = quotas.adjust_character_count(service, cloudlanguagetools.constants.RequestType.audio, language, len(audio_request['text']))
+    return characters * character_costs[service.name]
+
+def select_audio_requests(popular_audio_requests, audio_cache, budget, max_requests=CACHE_WARMING_MAX_REQUESTS):
+    """pick the most popular requests which are not cached yet, until the budget is spent.
+    returns a list of audio requests and the total cost"""
+    character_costs = get_audio_character_costs()
+    selected = []
+    total_cost = 0
+    for count, audio_request in popular_audio_requests:
+        if len(selected) >= max_requests:
+            break
+        if audio_request['service'] not in character_costs:
+            continue
+        audio_format = cloudlanguagetools.constants.AudioFormat[audio_request['audio_format']]
+        cache_key = cloudlanguagetools.audiocache.build_audio_cache_key(audio_request['text'], audio_request['service'],
+            audio_request['voice_key'], audio_request['options'], audio_format)
+        if audio_cache.contains(cache_key):
+            continue
+        cost = get_audio_request_cost(audio_request, character_costs)
+        if total_cost + cost > budget:
+            # a shorter request further down the list may still fit
+            continue
+        total_cost += cost
+        selected.append(audio_request)
+    return selected, total_cost
+
+def warm_audio_cache(manager, audio_request_log, budget=CACHE_WARMING_DEFAULT_BUDGET, max_requests=CACHE_WARMING_MAX_REQUESTS, max_duration=CACHE_WARMING_MAX_DURATION):
+    """synthesize the most popular audio requests into manager's audio cache"""
+    starttime = timeit.default_timer()
+    popular_audio_requests = get_popular_audio_requests(audio_request_log)
+    selected, total_cost = select_audio_requests(popular_audio_requests, manager.audio_cache, budget, max_requests)
+    logging.info(f'cache warming: {len(popular_audio_requests)} popular requests, {len(selected)} not cached, estimated cost: ${total_cost:.2f}')
+
+    stats = {'selected': len(selected), 'estimated_cost': total_cost, 'synthesized': 0, 'errors': 0}
+    for audio_request in selected:
+        if timeit.default_timer() - starttime > max_duration:
+            logging.warning(f'cache warming: stopping after {max_duration}s')
+            break
+        try:
+            manager.get_tts_audio(audio_request['text'], audio_request['service'], audio_request['voice_key'],
+                audio_request['options'], cloudlanguagetools.constants.AudioFormat[audio_request['audio_format']])
+            stats['synthesized'] += 1
+        except (cloudlanguagetools.errors.RequestError, cloudlanguagetools.errors.NotFoundError) as err:
+            logging.warning(f'cache warming: could not synthesize {audio_request}: {err}')
+            stats['errors'] += 1
+    logging.info(f'cache warming: {stats}')
+    return stats
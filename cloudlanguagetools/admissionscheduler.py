@@ -0,0 +1,136 @@
+import time
+import threading
+import contextlib
+import collections
+import logging
+
+import cloudlanguagetools.constants
+import cloudlanguagetools.errors
+
+RequestMode = cloudlanguagetools.constants.RequestMode
+
+# when requests are waiting in several classes, each class gets a share of the service slots
+# proportional to its weight. a user waiting on a card during review (dynamic) goes ahead of batch generation
+ADMISSION_DEFAULT_WEIGHTS = {
+    RequestMode.dynamic: 8,
+    RequestMode.edit: 4,
+    RequestMode.batch: 1
+}
+# a user is waiting on dynamic / edit requests, batch requests can wait longer for their turn under load.
+# /audio_batch is synchronous, batch requests still have to fit within the gunicorn timeout
+ADMISSION_DEFAULT_TIMEOUTS = {
+    RequestMode.dynamic: 2 * cloudlanguagetools.constants.RequestTimeout,
+    RequestMode.edit: 2 * cloudlanguagetools.constants.RequestTimeout,
+    RequestMode.batch: 6 * cloudlanguagetools.constants.RequestTimeout
+}
+
+class AdmissionWaiter():
+    def __init__(self):
+        self.event = threading.Event()
+        self.enqueue_time = time.time()
+        self.admitted = False
+
+class ServiceAdmissionState():
+    def __init__(self, max_concurrency):
+        self.max_concurrency = max_concurrency
+        self.running = 0
+        self.queues = {request_mode: collections.deque() for request_mode in RequestMode}
+        # weighted fair queueing: the class whose next request would finish first in virtual time
+        # (pass value + 1/weight) goes next, its pass value then increases by 1/weight
+        self.pass_values = {request_mode: 0.0 for request_mode in RequestMode}
+        self.virtual_time = 0.0
+        self.admitted = {request_mode: 0 for request_mode in RequestMode}
+        self.total_wait = {request_mode: 0.0 for request_mode in RequestMode}
+        self.max_wait = {request_mode: 0.0 for request_mode in RequestMode}
+        self.timeouts = {request_mode: 0 for request_mode in RequestMode}
+
+    def queue_depth(self):
+        return sum([len(queue) for queue in self.queues.values()])
+
+class AdmissionScheduler():
+    """admission control in front of service calls: at most max_concurrency calls per service run at the same time,
+    the others wait in a queue per request mode, and get admitted with weighted fair sharing between request modes"""
+    def __init__(self, max_concurrency, weights=ADMISSION_DEFAULT_WEIGHTS, timeouts=ADMISSION_DEFAULT_TIMEOUTS):
+        """max_concurrency is a dict: service name -> maximum number of concurrent calls.
+        timeouts is a dict: request mode -> maximum time waiting in the queue"""
+        self.weights = weights
+        self.timeouts = timeouts
+        self.lock = threading.Lock()
+        self.services = {service: ServiceAdmissionState(service_max_concurrency) for service, service_max_concurrency in max_concurrency.items()}
+
+    @contextlib.contextmanager
+    def admit(self, service, request_mode):
+        """blocks until the call to service can go ahead, raises RequestError if that takes longer than the timeout
+        for request_mode"""
+        self.acquire(service, request_mode)
+        try:
+            yield
+        finally:
+            self.release(service)
+
+    def acquire(self, service, request_mode):
+        state = self.services[service]
+        waiter = None
+        with self.lock:
+            if state.running < state.max_concurrency and state.queue_depth() == 0:
+                state.running += 1
+                state.admitted[request_mode] += 1
+                return
+            queue = state.queues[request_mode]
+            if len(queue) == 0:
+                # a class which was idle doesn't get to catch up on the share it didn't use
+                state.pass_values[request_mode] = max(state.pass_values[request_mode], state.virtual_time)
+            waiter = AdmissionWaiter()
+            queue.append(waiter)
+
+        timeout = self.timeouts[request_mode]
+        waiter.event.wait(timeout)
+        with self.lock:
+            if waiter.admitted:
+                return
+            state.queues[request_mode].remove(waiter)
+            state.timeouts[request_mode] += 1
+        logging.warning(f'{service}: request ({request_mode.name}) not admitted after {timeout}s')
+        raise cloudlanguagetools.errors.RequestError(f'{service} is busy, please retry later')
+
+    def release(self, service):
+        state = self.services[service]
+        with self.lock:
+            state.running -= 1
+            self.dispatch(state)
+
+    def dispatch(self, state):
+        # lock must be held
+        while state.running < state.max_concurrency and state.queue_depth() > 0:
+            # on ties, the class with the highest weight goes first
+            request_mode = min([x for x in RequestMode if len(state.queues[x]) > 0],
+                key=lambda x: (state.pass_values[x] + 1.0 / self.weights[x], -self.weights[x]))
+            state.virtual_time = state.pass_values[request_mode]
+            state.pass_values[request_mode] += 1.0 / self.weights[request_mode]
+            waiter = state.queues[request_mode].popleft()
+            wait_time = time.time() - waiter.enqueue_time
+            state.admitted[request_mode] += 1
+            state.total_wait[request_mode] += wait_time
+            state.max_wait[request_mode] = max(state.max_wait[request_mode], wait_time)
+            state.running += 1
+            waiter.admitted = True
+            waiter.event.set()
+
+    def get_stats(self):
+        stats = {}
+        with self.lock:
+            for service, state in self.services.items():
+                if sum(state.admitted.values()) == 0:
+                    continue
+                stats[service] = {
+                    'running': state.running,
+                    'max_concurrency': state.max_concurrency,
+                    'request_modes': {request_mode.name: {
+                        'queue_depth': len(state.queues[request_mode]),
+                        'admitted': state.admitted[request_mode],
+                        'timeouts': state.timeouts[request_mode],
+                        'average_wait': state.total_wait[request_mode] / max(state.admitted[request_mode], 1),
+                        'max_wait': state.max_wait[request_mode]
+                    } for request_mode in RequestMode}
+                }
+        return stats
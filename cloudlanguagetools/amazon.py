@@ -1,6 +1,6 @@
+import os
 import json
 import requests
-import tempfile
 import boto3
 import botocore.exceptions
 import contextlib
@@ -11,10 +11,17 @@ import cloudlanguagetools.ttsvoice
 import cloudlanguagetools.translationlanguage
 import cloudlanguagetools.transliterationlanguage
 import cloudlanguagetools.errors
+import cloudlanguagetools.audiobuffer
 
 DEFAULT_VOICE_PITCH = 0
 DEFAULT_VOICE_RATE = 100
 
+# polly produces mp3 at various sample rates, but no opus (only ogg vorbis)
+AMAZON_SAMPLE_RATES = {
+    cloudlanguagetools.constants.AudioFormat.mp3: None, # voice default
+    cloudlanguagetools.constants.AudioFormat.mp3_low: '16000'
+}
+
 def get_audio_language_enum(language_code):
     language_map = {
         'arb': 'ar_XA',
@@ -78,16 +85,16 @@ class AmazonService(cloudlanguagetools.service.Service):
     def __init__(self):
         self.polly_client = boto3.client("polly")
         self.translate_client = boto3.client("translate")
+        # speech marks take a second request with the same text, which polly bills too: multi-utterance synthesis
+        # costs twice the characters of synthesizing each text separately. opt-in with AMAZON_MULTI_UTTERANCE
+        self.multi_utterance_enabled = 'AMAZON_MULTI_UTTERANCE' in os.environ
 
     def get_translation(self, text, from_language_key, to_language_key):
         result = self.translate_client.translate_text(Text=text, 
                     SourceLanguageCode=from_language_key, TargetLanguageCode=to_language_key)
         return result.get('TranslatedText')
 
-    def get_tts_audio(self, text, voice_key, options):
-        output_temp_file = tempfile.NamedTemporaryFile()
-        output_temp_filename = output_temp_file.name
-
+    def get_ssml(self, text, voice_key, options):
         pitch = options.get('pitch', DEFAULT_VOICE_PITCH)
         pitch_str = f'{pitch:+.0f}%'
         rate = options.get('rate', DEFAULT_VOICE_RATE)
@@ -104,26 +111,66 @@ class AmazonService(cloudlanguagetools.service.Service):
         {text}
     </prosody>
 </speak>"""
+        return ssml_str
 
+    def synthesize_speech(self, text, voice_key, options, audio_format=cloudlanguagetools.constants.AudioFormat.mp3):
+        ssml_str = self.get_ssml(text, voice_key, options)
         try:
-            response = self.polly_client.synthesize_speech(Text=ssml_str, TextType="ssml", OutputFormat="mp3", VoiceId=voice_key['voice_id'], Engine=voice_key['engine'])
+            synthesize_args = {}
+            sample_rate = AMAZON_SAMPLE_RATES[audio_format]
+            if sample_rate != None:
+                synthesize_args['SampleRate'] = sample_rate
+            response = self.polly_client.synthesize_speech(Text=ssml_str, TextType="ssml", OutputFormat="mp3", VoiceId=voice_key['voice_id'], Engine=voice_key['engine'], **synthesize_args)
         except (botocore.exceptions.BotoCoreError, botocore.exceptions.ClientError) as error:
             raise cloudlanguagetools.errors.RequestError(str(error))
 
-        if "AudioStream" in response:
-            # Note: Closing the stream is important because the service throttles on the
-            # number of parallel connections. Here we are using contextlib.closing to
-            # ensure the close method of the stream object will be called automatically
-            # at the end of the with statement's scope.
-            with contextlib.closing(response["AudioStream"]) as stream:
-                with open(output_temp_filename, 'wb') as audio:
-                    audio.write(stream.read())
-                return output_temp_file
-
-        else:
+        if "AudioStream" not in response:
             # The response didn't contain audio data, exit gracefully
             raise cloudlanguagetools.errors.RequestError('no audio stream')
 
+        return response["AudioStream"]
+
+    def get_supported_audio_formats(self):
+        return list(AMAZON_SAMPLE_RATES.keys())
+
+    def get_tts_audio(self, text, voice_key, options, audio_format=cloudlanguagetools.constants.AudioFormat.mp3):
+        audio_buffer = cloudlanguagetools.audiobuffer.AudioBuffer()
+        for chunk in self.get_tts_audio_stream(text, voice_key, options, audio_format=audio_format):
+            audio_buffer.write(chunk)
+        return audio_buffer
+
+    def tts_multiple_supported(self):
+        return self.multi_utterance_enabled
+
+    def get_tts_audio_multiple(self, text_list, voice_key, options):
+        # polly returns speech marks in a separate request, with the same text
+        text = cloudlanguagetools.service.join_marked_texts(text_list, '<mark name="{}"/>')
+        audio_data = self.get_tts_audio(text, voice_key, options).get_bytes()
+        ssml_str = self.get_ssml(text, voice_key, options)
+        try:
+            response = self.polly_client.synthesize_speech(Text=ssml_str, TextType="ssml", OutputFormat="json", SpeechMarkTypes=['ssml'],
+                VoiceId=voice_key['voice_id'], Engine=voice_key['engine'])
+        except (botocore.exceptions.BotoCoreError, botocore.exceptions.ClientError) as error:
+            raise cloudlanguagetools.errors.RequestError(str(error))
+        with contextlib.closing(response['AudioStream']) as stream:
+            # one json object per line
+            speech_marks = [json.loads(line) for line in stream.read().decode('utf-8').splitlines() if len(line.strip()) > 0]
+        marks = [(speech_mark['value'], speech_mark['time']) for speech_mark in speech_marks if speech_mark['type'] == 'ssml']
+        return audio_data, cloudlanguagetools.service.get_mark_offsets(marks, len(text_list))
+
+    def tts_streaming_supported(self):
+        return True
+
+    def get_tts_audio_stream(self, text, voice_key, options, audio_format=cloudlanguagetools.constants.AudioFormat.mp3):
+        audio_stream = self.synthesize_speech(text, voice_key, options, audio_format=audio_format)
+        # Note: Closing the stream is important because the service throttles on the
+        # number of parallel connections. Here we are using contextlib.closing to
+        # ensure the close method of the stream object will be called automatically
+        # at the end of the with statement's scope.
+        with contextlib.closing(audio_stream) as stream:
+            for chunk in stream.iter_chunks():
+                yield chunk
+
 
     def get_tts_voice_list(self):
         result = []
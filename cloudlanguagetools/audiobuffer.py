@@ -0,0 +1,65 @@
+import io
+import tempfile
+
+AUDIO_BUFFER_DEFAULT_SPOOL_SIZE = 4 * 1024 * 1024 # 4mb, audio beyond that gets spooled to disk
+
+class AudioBuffer():
+    """audio data returned by services' get_tts_audio. the data is kept in memory,
+    unless it grows beyond spool_size, in which case it gets moved to a temporary file"""
+    def __init__(self, data=None, spool_size=AUDIO_BUFFER_DEFAULT_SPOOL_SIZE):
+        self.spool_size = spool_size
+        self.buffer = io.BytesIO()
+        self.spooled_file = None
+        if data != None:
+            self.write(data)
+
+    def write(self, data):
+        if self.spooled_file != None:
+            self.spooled_file.write(data)
+            return
+        self.buffer.write(data)
+        if self.buffer.tell() > self.spool_size:
+            self.spooled_file = tempfile.NamedTemporaryFile()
+            self.spooled_file.write(self.buffer.getbuffer())
+            self.buffer = None
+
+    def spooled(self):
+        return self.spooled_file != None
+
+    def get_bytes(self):
+        if self.spooled():
+            self.spooled_file.flush()
+            with open(self.spooled_file.name, 'rb') as f:
+                return f.read()
+        return self.buffer.getvalue()
+
+    def get_memoryview(self):
+        if self.spooled():
+            return memoryview(self.get_bytes())
+        return self.buffer.getbuffer()
+
+    def get_file(self):
+        """return a binary file object positioned at the start of the audio data,
+        suitable for flask's send_file"""
+        if self.spooled():
+            self.spooled_file.flush()
+            return open(self.spooled_file.name, 'rb')
+        # getvalue doesn't copy the underlying data
+        return io.BytesIO(self.buffer.getvalue())
+
+    def __len__(self):
+        if self.spooled():
+            self.spooled_file.flush()
+            return self.spooled_file.tell()
+        return self.buffer.getbuffer().nbytes
+
+    @property
+    def name(self):
+        """compatibility with callers which expect a NamedTemporaryFile: the audio
+        gets written to a temporary file on first access"""
+        if not self.spooled():
+            self.spooled_file = tempfile.NamedTemporaryFile()
+            self.spooled_file.write(self.buffer.getbuffer())
+            self.buffer = None
+        self.spooled_file.flush()
+        return self.spooled_file.name
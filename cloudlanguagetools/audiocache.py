@@ -0,0 +1,162 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+import logging
+import time
+
+import cloudlanguagetools.constants
+
+AUDIO_CACHE_DEFAULT_MAX_SIZE = 512 * 1024 * 1024 # 512mb
+# when the cache goes over its max size, evict down to this fraction of the max size,
+# so that we don't have to scan the directory on every insert
+AUDIO_CACHE_EVICTION_TARGET_RATIO = 0.9
+AUDIO_CACHE_TEMP_PREFIX = '.tmp_'
+# the other workers sharing the directory don't report what they write, the size gets recomputed from disk this often
+AUDIO_CACHE_SIZE_REFRESH_INTERVAL = 60
+
+def build_audio_cache_key(text, service, voice_key, options, audio_format=cloudlanguagetools.constants.AudioFormat.mp3):
+    # the request is serialized with sorted keys, so that the ordering of voice_key / options
+    # entries doesn't influence the cache key
+    request = {
+        'text': text,
+        'service': service,
+        'voice_key': voice_key,
+        'options': options
+    }
+    # mp3 keys are left unchanged, so that existing cache entries remain valid
+    if audio_format != cloudlanguagetools.constants.AudioFormat.mp3:
+        request['audio_format'] = audio_format.name
+    canonical_request = json.dumps(request, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(canonical_request.encode('utf-8')).hexdigest()
+
+def build_audio_concat_cache_key(segments, audio_format=cloudlanguagetools.constants.AudioFormat.mp3):
+    """segments is a list of audio cache keys (str) and silence durations in milliseconds (int)"""
+    request = {
+        'concat': segments,
+        'audio_format': audio_format.name
+    }
+    canonical_request = json.dumps(request, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical_request.encode('utf-8')).hexdigest()
+
+class AudioCache():
+    """content-addressed on-disk cache of audio data, with LRU eviction.
+    the cache directory may be shared between several worker processes."""
+    def __init__(self, cache_dir, max_size=AUDIO_CACHE_DEFAULT_MAX_SIZE):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # only one thread walks the directory at a time
+        self.refreshing = False
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # size on disk at the last refresh, plus what this process wrote since
+        self.current_size = sum([size for mtime, size, path in self.list_entries()])
+        self.size_refresh_time = time.time()
+        logging.info(f'audio cache directory: {self.cache_dir}, current size: {self.current_size}, max size: {self.max_size}')
+
+    def get_path(self, cache_key):
+        # shard on the first two characters to keep directories small
+        return os.path.join(self.cache_dir, cache_key[0:2], cache_key)
+
+    def contains(self, cache_key):
+        """doesn't count as a hit / miss and doesn't affect eviction order"""
+        return os.path.exists(self.get_path(cache_key))
+
+    def get(self, cache_key):
+        """return audio bytes, or None if not present in the cache"""
+        path = self.get_path(cache_key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            # update modification time, eviction removes the least recently used entries first
+            os.utime(path)
+        except FileNotFoundError:
+            with self.lock:
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+        return data
+
+    def put(self, cache_key, data):
+        path = self.get_path(cache_key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # write to a temporary file first, so that other workers never read a partial file
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=AUDIO_CACHE_TEMP_PREFIX)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        try:
+            previous_size = os.stat(path).st_size
+        except FileNotFoundError:
+            previous_size = 0
+        os.replace(temp_path, path)
+
+        refresh = False
+        with self.lock:
+            self.current_size += len(data) - previous_size
+            size_refresh_due = time.time() - self.size_refresh_time > AUDIO_CACHE_SIZE_REFRESH_INTERVAL
+            if not self.refreshing and (self.current_size > self.max_size or size_refresh_due):
+                self.refreshing = True
+                refresh = True
+        if refresh:
+            try:
+                self.refresh_size()
+            finally:
+                with self.lock:
+                    self.refreshing = False
+
+    def list_entries(self):
+        entries = []
+        for root, dirs, files in os.walk(self.cache_dir):
+            for filename in files:
+                if filename.startswith(AUDIO_CACHE_TEMP_PREFIX):
+                    continue
+                path = os.path.join(root, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    # removed by another worker
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def refresh_size(self):
+        """recompute the size from disk, and evict the least recently used entries if it's over the max size.
+        walks the directory without holding the lock"""
+        entries = self.list_entries()
+        total_size = sum([size for mtime, size, path in entries])
+        evictions = 0
+        if total_size > self.max_size:
+            previous_size = total_size
+            target_size = self.max_size * AUDIO_CACHE_EVICTION_TARGET_RATIO
+            entries.sort()
+            for mtime, size, path in entries:
+                if total_size <= target_size:
+                    break
+                try:
+                    os.remove(path)
+                    evictions += 1
+                except FileNotFoundError:
+                    # evicted by another worker
+                    pass
+                total_size -= size
+            logging.info(f'audio cache eviction: size {previous_size} -> {total_size}')
+        with self.lock:
+            self.current_size = total_size
+            self.size_refresh_time = time.time()
+            self.evictions += evictions
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': self.current_size,
+                'max_size': self.max_size
+            }
@@ -0,0 +1,124 @@
+import os
+import threading
+import logging
+import boto3
+import botocore.config
+import botocore.exceptions
+
+import cloudlanguagetools.memorycache
+
+# presigned urls are only used for the redirect, the client follows it right away
+AUDIO_STORAGE_URL_EXPIRATION = 300
+AUDIO_STORAGE_KEY_PREFIX = 'audio/'
+# remember which objects exist, so that most requests don't need a HEAD request to the bucket.
+# objects only go away through the bucket's lifecycle rules, which are measured in days
+AUDIO_STORAGE_PRESENT_CACHE_TTL = 12 * 3600
+# objects which didn't exist may get uploaded by another node soon after
+AUDIO_STORAGE_ABSENT_CACHE_TTL = 60
+AUDIO_STORAGE_KNOWN_KEYS_MAX_ENTRIES = 200000
+# the bucket is optional, an outage shouldn't hold up audio requests
+AUDIO_STORAGE_CONNECT_TIMEOUT = 1
+AUDIO_STORAGE_READ_TIMEOUT = 5
+AUDIO_STORAGE_MAX_ATTEMPTS = 2
+
+def create_audio_storage_from_env():
+    """returns an AudioStorage if AUDIO_STORAGE_BUCKET is set, None otherwise.
+    credentials default to the digitalocean spaces ones used for the redis backups"""
+    bucket_name = os.environ.get('AUDIO_STORAGE_BUCKET', None)
+    if bucket_name == None:
+        return None
+    session = boto3.session.Session()
+    client = session.client('s3',
+                            region_name=os.environ.get('AUDIO_STORAGE_REGION', os.environ.get('SPACE_REGION')),
+                            endpoint_url=os.environ.get('AUDIO_STORAGE_ENDPOINT_URL', os.environ.get('SPACE_ENDPOINT_URL')),
+                            aws_access_key_id=os.environ.get('AUDIO_STORAGE_KEY', os.environ.get('SPACE_KEY')),
+                            aws_secret_access_key=os.environ.get('AUDIO_STORAGE_SECRET', os.environ.get('SPACE_SECRET')),
+                            config=botocore.config.Config(connect_timeout=AUDIO_STORAGE_CONNECT_TIMEOUT, read_timeout=AUDIO_STORAGE_READ_TIMEOUT,
+                                retries={'max_attempts': AUDIO_STORAGE_MAX_ATTEMPTS, 'mode': 'standard'}))
+    logging.info(f'audio storage bucket: {bucket_name}')
+    return AudioStorage(client, bucket_name)
+
+class AudioStorage():
+    """audio shared between all nodes, in an S3-compatible bucket, keyed by audio cache key.
+    clients can download the audio directly with a presigned url"""
+    def __init__(self, client, bucket_name, url_expiration=AUDIO_STORAGE_URL_EXPIRATION):
+        self.client = client
+        self.bucket_name = bucket_name
+        self.url_expiration = url_expiration
+        self.present_keys = cloudlanguagetools.memorycache.MemoryCache(AUDIO_STORAGE_KNOWN_KEYS_MAX_ENTRIES, AUDIO_STORAGE_PRESENT_CACHE_TTL)
+        self.absent_keys = cloudlanguagetools.memorycache.MemoryCache(AUDIO_STORAGE_KNOWN_KEYS_MAX_ENTRIES, AUDIO_STORAGE_ABSENT_CACHE_TTL)
+        self.lock = threading.Lock()
+        self.stats = {'uploads': 0, 'downloads': 0, 'redirects': 0, 'errors': 0}
+
+    def get_object_key(self, cache_key, audio_format):
+        return f'{AUDIO_STORAGE_KEY_PREFIX}{cache_key[0:2]}/{cache_key}.{audio_format.file_extension}'
+
+    def increment_stat(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    def contains(self, cache_key, audio_format):
+        object_key = self.get_object_key(cache_key, audio_format)
+        if self.present_keys.get(object_key) != None:
+            return True
+        if self.absent_keys.get(object_key) != None:
+            return False
+        try:
+            self.client.head_object(Bucket=self.bucket_name, Key=object_key)
+            self.present_keys.put(object_key, True)
+            return True
+        except botocore.exceptions.ClientError as err:
+            if err.response['Error']['Code'] not in ['404', 'NoSuchKey']:
+                logging.warning(f'could not check {object_key} in audio storage: {err}')
+                self.increment_stat('errors')
+            self.absent_keys.put(object_key, True)
+            return False
+        except botocore.exceptions.BotoCoreError as err:
+            # connection errors, timeouts: treat as absent for a little while, don't retry on every request
+            logging.warning(f'could not check {object_key} in audio storage: {err}')
+            self.increment_stat('errors')
+            self.absent_keys.put(object_key, True)
+            return False
+
+    def get(self, cache_key, audio_format):
+        """returns audio bytes, or None"""
+        if not self.contains(cache_key, audio_format):
+            return None
+        object_key = self.get_object_key(cache_key, audio_format)
+        try:
+            response = self.client.get_object(Bucket=self.bucket_name, Key=object_key)
+            self.increment_stat('downloads')
+            return response['Body'].read()
+        except (botocore.exceptions.ClientError, botocore.exceptions.BotoCoreError) as err:
+            logging.warning(f'could not download {object_key} from audio storage: {err}')
+            self.increment_stat('errors')
+            return None
+
+    def put(self, cache_key, audio_format, data):
+        object_key = self.get_object_key(cache_key, audio_format)
+        try:
+            self.client.put_object(Body=data, Bucket=self.bucket_name, Key=object_key, ContentType=audio_format.mime_type)
+            self.present_keys.put(object_key, True)
+            self.increment_stat('uploads')
+        except (botocore.exceptions.ClientError, botocore.exceptions.BotoCoreError) as err:
+            logging.warning(f'could not upload {object_key} to audio storage: {err}')
+            self.increment_stat('errors')
+
+    def get_url(self, cache_key, audio_format):
+        """presigned url to download the audio, or None if the audio isn't in the bucket"""
+        if not self.contains(cache_key, audio_format):
+            return None
+        try:
+            url = self.client.generate_presigned_url('get_object',
+                Params={'Bucket': self.bucket_name, 'Key': self.get_object_key(cache_key, audio_format)},
+                ExpiresIn=self.url_expiration)
+        except (botocore.exceptions.ClientError, botocore.exceptions.BotoCoreError) as err:
+            logging.warning(f'could not create a url for {cache_key} in audio storage: {err}')
+            self.increment_stat('errors')
+            return None
+        self.increment_stat('redirects')
+        return url
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats)
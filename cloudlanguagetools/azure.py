@@ -5,6 +5,11 @@ import uuid
 import operator
 import pydub
 import logging
+import os
+import queue
+import threading
+import contextlib
+import timeit
 
 import cloudlanguagetools.service
 import cloudlanguagetools.constants
@@ -12,11 +17,33 @@ import cloudlanguagetools.ttsvoice
 import cloudlanguagetools.translationlanguage
 import cloudlanguagetools.transliterationlanguage
 import cloudlanguagetools.errors
+import cloudlanguagetools.audiobuffer
 
 
 import azure.cognitiveservices.speech
 import azure.cognitiveservices.speech.audio
 
+AZURE_AUDIO_STREAM_CHUNK_SIZE = 16000
+AZURE_OUTPUT_FORMATS = {
+    cloudlanguagetools.constants.AudioFormat.mp3: 'Audio24Khz96KBitRateMonoMp3',
+    cloudlanguagetools.constants.AudioFormat.mp3_low: 'Audio16Khz32KBitRateMonoMp3',
+    cloudlanguagetools.constants.AudioFormat.ogg_opus: 'Ogg16Khz16BitMonoOpus'
+}
+# maximum number of synthesizers per output format, in each worker process
+AZURE_SYNTHESIZER_POOL_SIZE = 4
+# how long to wait for a synthesizer to become available when the pool is exhausted
+AZURE_SYNTHESIZER_ACQUIRE_TIMEOUT = cloudlanguagetools.constants.RequestTimeout
+AZURE_SYNTHESIS_TIMEOUT = cloudlanguagetools.constants.RequestTimeout
+# cancellations after which the synthesizer's connection can't be trusted anymore. others (bad voice, throttling)
+# are about the request, the synthesizer goes back to the pool
+AZURE_CONNECTION_ERROR_CODES = [
+    azure.cognitiveservices.speech.CancellationErrorCode.ConnectionFailure,
+    azure.cognitiveservices.speech.CancellationErrorCode.ServiceTimeout,
+    azure.cognitiveservices.speech.CancellationErrorCode.ServiceError,
+    azure.cognitiveservices.speech.CancellationErrorCode.ServiceUnavailable,
+    azure.cognitiveservices.speech.CancellationErrorCode.RuntimeError
+]
+
 class AzureVoice(cloudlanguagetools.ttsvoice.TtsVoice):
     def __init__(self, voice_data):
         # print(voice_data)
@@ -115,6 +142,166 @@ class AzureTransliterationLanguage(cloudlanguagetools.transliterationlanguage.Tr
         }
 
 
+class AzurePooledSynthesizer():
+    """SpeechSynthesizer with a pre-opened connection, meant to be reused across requests"""
+    def __init__(self, key, region, output_format):
+        speech_config = azure.cognitiveservices.speech.SpeechConfig(subscription=key, region=region)
+        speech_config.set_speech_synthesis_output_format(azure.cognitiveservices.speech.SpeechSynthesisOutputFormat[output_format])
+        # no audio config: the audio data is returned in memory, in the result
+        self.synthesizer = azure.cognitiveservices.speech.SpeechSynthesizer(speech_config=speech_config, audio_config=None)
+        # started_event also gets set when synthesis ends before any audio, for example when it gets canceled right away
+        self.started_event = threading.Event()
+        self.done_event = threading.Event()
+        self.synthesizer.synthesis_started.connect(lambda event: self.started_event.set())
+        self.synthesizer.synthesis_completed.connect(lambda event: self.set_done())
+        self.synthesizer.synthesis_canceled.connect(lambda event: self.set_done())
+        # set when the synthesizer shouldn't be reused
+        self.broken = False
+        # bookmarks reached during the current synthesis, offsets are in ticks (100ns)
+        self.bookmarks = []
+        self.synthesizer.bookmark_reached.connect(lambda event: self.bookmarks.append((event.text, event.audio_offset / 10000)))
+        # open the websocket connection right away, it stays open between requests
+        self.connection = azure.cognitiveservices.speech.Connection.from_speech_synthesizer(self.synthesizer)
+        self.connection.open(True)
+
+    def set_done(self):
+        self.started_event.set()
+        self.done_event.set()
+
+    def wait(self, event, timeout):
+        if not event.wait(timeout):
+            self.broken = True
+            self.synthesizer.stop_speaking_async()
+            raise cloudlanguagetools.errors.RequestError(f'Azure: synthesis did not complete within {timeout}s')
+
+    def check_result(self, result, expected_reason):
+        """raises RequestError if the result doesn't have the expected reason"""
+        if result.reason == expected_reason:
+            return
+        error_details = ''
+        if result.reason == azure.cognitiveservices.speech.ResultReason.Canceled:
+            cancellation_details = result.cancellation_details
+            if cancellation_details.error_code in AZURE_CONNECTION_ERROR_CODES:
+                self.broken = True
+            error_details = f'{cancellation_details.error_code}: {cancellation_details.error_details}'
+        raise cloudlanguagetools.errors.RequestError(f'Azure: could not synthesize audio: {result.reason}: {error_details}')
+
+    def speak_ssml(self, ssml_str, timeout):
+        """wait until the full audio is available"""
+        self.started_event.clear()
+        self.done_event.clear()
+        self.bookmarks = []
+        result_future = self.synthesizer.speak_ssml_async(ssml_str)
+        self.wait(self.done_event, timeout)
+        return result_future.get()
+
+    def start_speaking_ssml(self, ssml_str, timeout):
+        """wait until the first audio chunk is available, or synthesis ended"""
+        self.started_event.clear()
+        self.done_event.clear()
+        result_future = self.synthesizer.start_speaking_ssml_async(ssml_str)
+        self.wait(self.started_event, timeout)
+        return result_future.get()
+
+class AzureSynthesizerPool():
+    """per-process pool of synthesizers, keyed by output format"""
+    def __init__(self, key, region, pool_size=AZURE_SYNTHESIZER_POOL_SIZE):
+        self.key = key
+        self.region = region
+        self.pool_size = pool_size
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        # synthesizers hold connections and native threads, they can't be shared with a forked process
+        self.pid = os.getpid()
+        self.idle_synthesizers = {}
+        self.synthesizer_count = {}
+        self.in_use = 0
+        self.acquire_waits = 0
+        self.discarded = 0
+        self.synthesis_count = 0
+        self.synthesis_time_total = 0.0
+        self.synthesis_time_max = 0.0
+
+    def get_idle_queue(self, output_format):
+        with self.lock:
+            if self.pid != os.getpid():
+                self.reset()
+            if output_format not in self.idle_synthesizers:
+                self.idle_synthesizers[output_format] = queue.Queue()
+                self.synthesizer_count[output_format] = 0
+            return self.idle_synthesizers[output_format]
+
+    def get_synthesizer(self, output_format):
+        idle_queue = self.get_idle_queue(output_format)
+        try:
+            return idle_queue.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            create_synthesizer = self.synthesizer_count[output_format] < self.pool_size
+            if create_synthesizer:
+                self.synthesizer_count[output_format] += 1
+            else:
+                self.acquire_waits += 1
+        if create_synthesizer:
+            try:
+                return AzurePooledSynthesizer(self.key, self.region, output_format)
+            except:
+                with self.lock:
+                    self.synthesizer_count[output_format] -= 1
+                raise
+        try:
+            return idle_queue.get(timeout=AZURE_SYNTHESIZER_ACQUIRE_TIMEOUT)
+        except queue.Empty:
+            raise cloudlanguagetools.errors.RequestError(f'Azure: no synthesizer available after {AZURE_SYNTHESIZER_ACQUIRE_TIMEOUT}s')
+
+    @contextlib.contextmanager
+    def acquire(self, output_format):
+        synthesizer = self.get_synthesizer(output_format)
+        with self.lock:
+            self.in_use += 1
+        start_time = timeit.default_timer()
+        reusable = False
+        try:
+            yield synthesizer
+            reusable = not synthesizer.broken
+        except cloudlanguagetools.errors.RequestError:
+            # the request failed (bad voice, throttling), the connection may still be fine
+            reusable = not synthesizer.broken
+            raise
+        finally:
+            time_diff = timeit.default_timer() - start_time
+            with self.lock:
+                self.in_use -= 1
+                if reusable:
+                    self.synthesis_count += 1
+                    self.synthesis_time_total += time_diff
+                    self.synthesis_time_max = max(self.synthesis_time_max, time_diff)
+                else:
+                    # the synthesizer is in an unknown state (timeout, connection error, client went away), don't reuse it
+                    self.synthesizer_count[output_format] -= 1
+                    self.discarded += 1
+            if reusable:
+                self.get_idle_queue(output_format).put(synthesizer)
+
+    def get_stats(self):
+        with self.lock:
+            synthesis_time_avg = 0.0
+            if self.synthesis_count > 0:
+                synthesis_time_avg = self.synthesis_time_total / self.synthesis_count
+            return {
+                'pool_size': self.pool_size,
+                'synthesizers': dict(self.synthesizer_count),
+                'in_use': self.in_use,
+                'acquire_waits': self.acquire_waits,
+                'discarded': self.discarded,
+                'synthesis_count': self.synthesis_count,
+                'synthesis_time_avg': synthesis_time_avg,
+                'synthesis_time_max': self.synthesis_time_max
+            }
+
 class AzureService(cloudlanguagetools.service.Service):
     def __init__(self):
         self.url_translator_base = 'https://api.cognitive.microsofttranslator.com'
@@ -122,6 +309,7 @@ class AzureService(cloudlanguagetools.service.Service):
     def configure(self, key, region):
         self.key = key
         self.region = region
+        self.synthesizer_pool = AzureSynthesizerPool(key, region)
 
     def get_token(self):
         fetch_token_url = f"https://{self.region}.api.cognitive.microsoft.com/sts/v1.0/issueToken"
@@ -141,14 +329,7 @@ class AzureService(cloudlanguagetools.service.Service):
         }
         return headers        
 
-    def get_tts_audio(self, text, voice_key, options):
-        output_temp_file = tempfile.NamedTemporaryFile()
-        output_temp_filename = output_temp_file.name
-        speech_config = azure.cognitiveservices.speech.SpeechConfig(subscription=self.key, region=self.region)
-        speech_config.set_speech_synthesis_output_format(azure.cognitiveservices.speech.SpeechSynthesisOutputFormat["Audio24Khz96KBitRateMonoMp3"])
-        audio_config = azure.cognitiveservices.speech.audio.AudioOutputConfig(filename=output_temp_filename)
-        synthesizer = azure.cognitiveservices.speech.SpeechSynthesizer(speech_config=speech_config, audio_config=audio_config)
-
+    def get_ssml(self, text, voice_key, options):
         default_pitch = 0
         default_rate = 1.0
 
@@ -175,9 +356,56 @@ class AzureService(cloudlanguagetools.service.Service):
 
         # print(f'[{ssml_str}] len: {len(ssml_str)}')
 
-        result = synthesizer.start_speaking_ssml(ssml_str)
-
-        return output_temp_file
+        return ssml_str
+
+    def get_supported_audio_formats(self):
+        return list(AZURE_OUTPUT_FORMATS.keys())
+
+    def get_tts_audio(self, text, voice_key, options, audio_format=cloudlanguagetools.constants.AudioFormat.mp3):
+        ssml_str = self.get_ssml(text, voice_key, options)
+        with self.synthesizer_pool.acquire(AZURE_OUTPUT_FORMATS[audio_format]) as synthesizer:
+            # wait for synthesis to complete, the audio must be complete before it gets cached
+            result = synthesizer.speak_ssml(ssml_str, AZURE_SYNTHESIS_TIMEOUT)
+            synthesizer.check_result(result, azure.cognitiveservices.speech.ResultReason.SynthesizingAudioCompleted)
+
+        return cloudlanguagetools.audiobuffer.AudioBuffer(result.audio_data)
+
+    def tts_multiple_supported(self):
+        return True
+
+    def get_tts_audio_multiple(self, text_list, voice_key, options):
+        text = cloudlanguagetools.service.join_marked_texts(text_list, '<bookmark mark="{}"/>')
+        ssml_str = self.get_ssml(text, voice_key, options)
+        with self.synthesizer_pool.acquire(AZURE_OUTPUT_FORMATS[cloudlanguagetools.constants.AudioFormat.mp3]) as synthesizer:
+            result = synthesizer.speak_ssml(ssml_str, AZURE_SYNTHESIS_TIMEOUT)
+            synthesizer.check_result(result, azure.cognitiveservices.speech.ResultReason.SynthesizingAudioCompleted)
+            bookmarks = list(synthesizer.bookmarks)
+        return result.audio_data, cloudlanguagetools.service.get_mark_offsets(bookmarks, len(text_list))
+
+    def tts_streaming_supported(self):
+        return True
+
+    def get_tts_audio_stream(self, text, voice_key, options, audio_format=cloudlanguagetools.constants.AudioFormat.mp3):
+        ssml_str = self.get_ssml(text, voice_key, options)
+        with self.synthesizer_pool.acquire(AZURE_OUTPUT_FORMATS[audio_format]) as synthesizer:
+            # returns as soon as the first audio chunk is available
+            result = synthesizer.start_speaking_ssml(ssml_str, AZURE_SYNTHESIS_TIMEOUT)
+            synthesizer.check_result(result, azure.cognitiveservices.speech.ResultReason.SynthesizingAudioStarted)
+
+            audio_data_stream = azure.cognitiveservices.speech.AudioDataStream(result)
+            chunk = bytes(AZURE_AUDIO_STREAM_CHUNK_SIZE)
+            filled_size = audio_data_stream.read_data(chunk)
+            while filled_size > 0:
+                yield chunk[:filled_size]
+                filled_size = audio_data_stream.read_data(chunk)
+            if audio_data_stream.status == azure.cognitiveservices.speech.StreamStatus.Canceled:
+                synthesizer.broken = True
+                raise cloudlanguagetools.errors.RequestError(f'Azure: audio stream canceled, voice: {voice_key}')
+
+    def get_stats(self):
+        return {
+            'synthesizer_pool': self.synthesizer_pool.get_stats()
+        }
 
     def get_tts_voice_list(self):
         # returns list of TtSVoice
@@ -1,6 +1,5 @@
 import json
 import requests
-import tempfile
 import logging
 import os
 import base64
@@ -11,6 +10,7 @@ import cloudlanguagetools.ttsvoice
 import cloudlanguagetools.translationlanguage
 import cloudlanguagetools.transliterationlanguage
 import cloudlanguagetools.errors
+import cloudlanguagetools.audiobuffer
 
 
 def get_audio_language_enum(language_iso, country_iso):
@@ -89,9 +89,6 @@ class CereProcService(cloudlanguagetools.service.Service):
         return result
 
     def get_tts_audio(self, text, voice_key, options):
-        output_temp_file = tempfile.NamedTemporaryFile()
-        output_temp_filename = output_temp_file.name
-
         voice_name = voice_key['name']
         url = f'https://api.cerevoice.com/v2/speak?voice={voice_name}&audio_format=mp3'
 
@@ -103,9 +100,7 @@ class CereProcService(cloudlanguagetools.service.Service):
         response = requests.post(url, data=ssml_text, headers=self.get_auth_headers(), timeout=cloudlanguagetools.constants.RequestTimeout)
 
         if response.status_code == 200:
-            with open(output_temp_filename, 'wb') as audio:
-                audio.write(response.content)
-            return output_temp_file
+            return cloudlanguagetools.audiobuffer.AudioBuffer(response.content)
 
         # otherwise, an error occured
         error_message = f"Status code: {response.status_code} reason: {response.reason} voice: [{voice_name}]]"
@@ -60,6 +60,19 @@ class Service(enum.Enum):
     VocalWare = enum.auto()
     FptAi = enum.auto()
 
+# audio formats which can be requested on /audio_v2. services which don't produce a format
+# natively get their mp3 audio transcoded with ffmpeg
+class AudioFormat(enum.Enum):
+    def __init__(self, mime_type, file_extension, codec, sample_rate, bitrate):
+        self.mime_type = mime_type
+        self.file_extension = file_extension # also the ffmpeg container format
+        self.codec = codec
+        self.sample_rate = sample_rate
+        self.bitrate = bitrate
+    mp3 = ('audio/mpeg', 'mp3', 'libmp3lame', 24000, '96k')
+    mp3_low = ('audio/mpeg', 'mp3', 'libmp3lame', 16000, '32k')
+    ogg_opus = ('audio/ogg', 'ogg', 'libopus', 16000, '24k')
+
 class Gender(enum.Enum):
     Male = enum.auto()
     Female = enum.auto()
@@ -1,7 +1,6 @@
 import json
 import requests
 import urllib
-import tempfile
 import logging
 import os
 import pprint
@@ -12,6 +11,8 @@ import cloudlanguagetools.ttsvoice
 import cloudlanguagetools.translationlanguage
 import cloudlanguagetools.transliterationlanguage
 import cloudlanguagetools.errors
+import cloudlanguagetools.audiobuffer
+import cloudlanguagetools.memorycache
 
 GENDER_MAP = {
     cloudlanguagetools.constants.Gender.Male: 'm',
@@ -20,6 +21,15 @@ GENDER_MAP = {
 
 COUNTRY_ANY = 'ANY'
 
+# pronunciation lookups: word/language/country/gender/preferred_user -> best pronunciation
+FORVO_LOOKUP_CACHE_MAX_ENTRIES = 50000
+FORVO_LOOKUP_CACHE_TTL = 24 * 3600 # new pronunciations / ratings get picked up eventually
+# downloaded mp3s, keyed by pronunciation id
+FORVO_AUDIO_CACHE_MAX_ENTRIES = 2000
+# words which have no pronunciation
+FORVO_NOT_FOUND_CACHE_MAX_ENTRIES = 50000
+FORVO_NOT_FOUND_CACHE_TTL = 6 * 3600
+
 class ForvoVoice(cloudlanguagetools.ttsvoice.TtsVoice):
     def __init__(self, language_code, country_code, audio_language, gender):
         # print(voice_data)
@@ -50,6 +60,9 @@ class ForvoService(cloudlanguagetools.service.Service):
     def __init__(self):
         self.url_base = 'https://apicommercial.forvo.com'
         self.build_audio_language_map()
+        self.lookup_cache = cloudlanguagetools.memorycache.MemoryCache(FORVO_LOOKUP_CACHE_MAX_ENTRIES, FORVO_LOOKUP_CACHE_TTL)
+        self.audio_cache = cloudlanguagetools.memorycache.MemoryCache(FORVO_AUDIO_CACHE_MAX_ENTRIES)
+        self.not_found_cache = cloudlanguagetools.memorycache.MemoryCache(FORVO_NOT_FOUND_CACHE_MAX_ENTRIES, FORVO_NOT_FOUND_CACHE_TTL)
 
     def configure(self):
         self.key = os.environ['FORVO_KEY']
@@ -58,8 +71,34 @@ class ForvoService(cloudlanguagetools.service.Service):
         # forvo uses cloudflare or something equivalent
         return {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:85.0) Gecko/20100101 Firefox/85.0'}
 
+    def get_lookup_key(self, text, voice_key):
+        return (text, voice_key['language_code'], voice_key['country_code'], voice_key.get('gender', None), voice_key.get('preferred_user', None))
+
     def get_tts_audio(self, text, voice_key, options):
+        lookup_key = self.get_lookup_key(text, voice_key)
+
+        error_message = self.not_found_cache.get(lookup_key)
+        if error_message != None:
+            raise cloudlanguagetools.errors.NotFoundError(error_message)
+
+        pronunciation = self.lookup_cache.get(lookup_key)
+        if pronunciation == None:
+            pronunciation = self.lookup_pronunciation(text, voice_key)
+            self.lookup_cache.put(lookup_key, pronunciation)
+        pronunciation_id, audio_url = pronunciation
 
+        audio_data = self.audio_cache.get(pronunciation_id)
+        if audio_data == None:
+            audio_request = requests.get(audio_url, headers=self.get_headers(), timeout=cloudlanguagetools.constants.RequestTimeout)
+            if audio_request.status_code != 200:
+                error_message = f'could not download Forvo audio, status_code: {audio_request.status_code}'
+                raise cloudlanguagetools.errors.RequestError(error_message)
+            audio_data = audio_request.content
+            self.audio_cache.put(pronunciation_id, audio_data)
+        return cloudlanguagetools.audiobuffer.AudioBuffer(audio_data)
+
+    def lookup_pronunciation(self, text, voice_key):
+        # returns (pronunciation id, mp3 url) of the best rated pronunciation
         language = voice_key['language_code']
 
         sex_param = ''
@@ -85,18 +124,22 @@ class ForvoService(cloudlanguagetools.service.Service):
             items = data['items']
             if len(items) == 0:
                 error_message = f"Pronunciation not found in Forvo for word [{text}], language={language}, country={voice_key['country_code']}"
+                self.not_found_cache.put(self.get_lookup_key(text, voice_key), error_message)
                 raise cloudlanguagetools.errors.NotFoundError(error_message)
-            audio_url = items[0]['pathmp3']
-            output_temp_file = tempfile.NamedTemporaryFile()
-            output_temp_filename = output_temp_file.name
-            audio_request = requests.get(audio_url, headers=self.get_headers(), timeout=cloudlanguagetools.constants.RequestTimeout)
-            open(output_temp_filename, 'wb').write(audio_request.content)
-            return output_temp_file
+            item = items[0]
+            return item.get('id', item['pathmp3']), item['pathmp3']
         else:
             error_message = f'status_code: {response.status_code} response: {response.content}'
             raise cloudlanguagetools.errors.RequestError(error_message)
 
 
+    def get_stats(self):
+        return {
+            'lookup_cache': self.lookup_cache.get_stats(),
+            'audio_cache': self.audio_cache.get_stats(),
+            'not_found_cache': self.not_found_cache.get_stats()
+        }
+
     def get_language_enum(self, language_id):
         forvo_language_id_map = {
             'zh': 'zh_cn',
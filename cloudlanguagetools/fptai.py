@@ -1,6 +1,5 @@
 import json
 import requests
-import tempfile
 import logging
 import time
 
@@ -10,10 +9,17 @@ import cloudlanguagetools.ttsvoice
 import cloudlanguagetools.translationlanguage
 import cloudlanguagetools.transliterationlanguage
 import cloudlanguagetools.errors
+import cloudlanguagetools.audiobuffer
 
 
 FPTAI_VOICE_SPEED_DEFAULT = 0
 
+# polling for the audio, once the synthesis request has been submitted
+FPTAI_POLL_INITIAL_WAIT = 0.2
+FPTAI_POLL_BACKOFF_FACTOR = 2.0
+FPTAI_POLL_MAX_WAIT = 3.0
+FPTAI_POLL_TIMEOUT = 25.0
+
 
 class FptAiVoice(cloudlanguagetools.ttsvoice.TtsVoice):
     def __init__(self, audio_language, voice_id, name, gender, region):
@@ -45,19 +51,24 @@ class FptAiVoice(cloudlanguagetools.ttsvoice.TtsVoice):
 
 class FptAiService(cloudlanguagetools.service.Service):
     def __init__(self):
-        pass
+        self.poll_initial_wait = FPTAI_POLL_INITIAL_WAIT
+        self.poll_backoff_factor = FPTAI_POLL_BACKOFF_FACTOR
+        self.poll_max_wait = FPTAI_POLL_MAX_WAIT
+        self.poll_timeout = FPTAI_POLL_TIMEOUT
 
-    def configure(self, api_key):
+    def configure(self, api_key, poll_initial_wait=FPTAI_POLL_INITIAL_WAIT, poll_backoff_factor=FPTAI_POLL_BACKOFF_FACTOR,
+            poll_max_wait=FPTAI_POLL_MAX_WAIT, poll_timeout=FPTAI_POLL_TIMEOUT):
         self.api_key = api_key
+        self.poll_initial_wait = poll_initial_wait
+        self.poll_backoff_factor = poll_backoff_factor
+        self.poll_max_wait = poll_max_wait
+        self.poll_timeout = poll_timeout
 
     def get_translation(self, text, from_language_key, to_language_key):
         raise cloudlanguagetools.errors.RequestError('not supported')
 
 
     def get_tts_audio(self, text, voice_key, options):
-        output_temp_file = tempfile.NamedTemporaryFile()
-        output_temp_filename = output_temp_file.name
-
         api_url = "https://api.fpt.ai/hmi/tts/v5"
         body = text
         headers = {
@@ -70,33 +81,28 @@ class FptAiService(cloudlanguagetools.service.Service):
         speed = options.get('speed', FPTAI_VOICE_SPEED_DEFAULT)
         if speed != FPTAI_VOICE_SPEED_DEFAULT:
             headers['speed'] = str(speed)
-        response = requests.post(api_url, headers=headers, data=body.encode('utf-8'))
+        response = requests.post(api_url, headers=headers, data=body.encode('utf-8'), timeout=cloudlanguagetools.constants.RequestTimeout)
 
         if response.status_code == 200:
             response_data = response.json()
             async_url = response_data['async']
             logging.debug(f'received async_url: {async_url}')
 
-            # wait until the audio is available
-            audio_available = False
-            max_tries = 7
-            wait_time = 0.2
-            while audio_available == False and max_tries > 0:
-                time.sleep(wait_time)
+            # wait until the audio is available, with exponential backoff up to the deadline
+            deadline = time.time() + self.poll_timeout
+            wait_time = self.poll_initial_wait
+            poll_count = 0
+            while True:
+                time.sleep(min(wait_time, max(deadline - time.time(), 0)))
+                poll_count += 1
                 logging.debug(f'checking whether audio is available on {async_url}')
-                response = requests.get(async_url, allow_redirects=True)
+                response = requests.get(async_url, allow_redirects=True, timeout=cloudlanguagetools.constants.RequestTimeout)
                 if response.status_code == 200 and len(response.content) > 0:
-                    with open(output_temp_filename, 'wb') as audio:
-                        audio.write(response.content)                    
-                    audio_available = True
-                wait_time = wait_time * 2
-                max_tries -= 1            
-            
-            if not audio_available:
-                error_message = f'could not retrieve audio after {max_tries} tries (url {async_url})'
-                raise cloudlanguagetools.errors.RequestError(error_message)
-
-            return output_temp_file
+                    return cloudlanguagetools.audiobuffer.AudioBuffer(response.content)
+                if time.time() >= deadline:
+                    error_message = f'could not retrieve FPT.AI audio (url {async_url}): result not available after {poll_count} polls ({self.poll_timeout}s)'
+                    raise cloudlanguagetools.errors.RequestError(error_message)
+                wait_time = min(wait_time * self.poll_backoff_factor, self.poll_max_wait)
 
         error_message = f'could not retrieve FPT.AI audio: {response.content}'
         raise cloudlanguagetools.errors.RequestError(error_message)
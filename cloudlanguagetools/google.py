@@ -1,11 +1,30 @@
 import os
-import tempfile
 import html
 import logging
+import threading
 import google.cloud.texttospeech
+import google.cloud.texttospeech_v1.services.text_to_speech.transports
+# timepoints are only available in the beta api
+import google.cloud.texttospeech_v1beta1
+import google.cloud.texttospeech_v1beta1.services.text_to_speech.transports
 import google.cloud.translate_v2
 import cloudlanguagetools.service
 import cloudlanguagetools.constants
+import cloudlanguagetools.audiobuffer
+
+# keep the grpc channel alive between requests, so that we don't pay for TLS / channel setup
+GOOGLE_GRPC_CHANNEL_OPTIONS = [
+    ('grpc.keepalive_time_ms', 30000),
+    ('grpc.keepalive_timeout_ms', 10000),
+    ('grpc.keepalive_permit_without_calls', 1),
+    ('grpc.http2.max_pings_without_data', 0)
+]
+
+GOOGLE_AUDIO_ENCODINGS = {
+    cloudlanguagetools.constants.AudioFormat.mp3: 'MP3',
+    cloudlanguagetools.constants.AudioFormat.mp3_low: 'MP3',
+    cloudlanguagetools.constants.AudioFormat.ogg_opus: 'OGG_OPUS'
+}
 
 def language_code_to_enum(language_code):
     override_map = {
@@ -90,20 +109,57 @@ class GoogleTranslationLanguage(cloudlanguagetools.translationlanguage.Translati
 
 class GoogleService(cloudlanguagetools.service.Service):
     def __init__(self):
-        pass
-
-    def configure(self):
-        pass
+        self.lock = threading.Lock()
+        self.channel_options = GOOGLE_GRPC_CHANNEL_OPTIONS
+        self.reset_clients()
+
+    def configure(self, channel_options=None):
+        if channel_options != None:
+            self.channel_options = channel_options
+        self.reset_clients()
+
+    def reset_clients(self):
+        self.client_pid = os.getpid()
+        self.client = None
+        self.beta_client = None
+        self.translation_client = None
+
+    def check_fork(self):
+        # grpc channels can't be used across a fork (gunicorn workers), re-create the clients in the child
+        if self.client_pid != os.getpid():
+            self.reset_clients()
 
     def get_client(self):
-        client = google.cloud.texttospeech.TextToSpeechClient()
-        return client
+        with self.lock:
+            self.check_fork()
+            if self.client == None:
+                transport_class = google.cloud.texttospeech_v1.services.text_to_speech.transports.TextToSpeechGrpcTransport
+                channel = transport_class.create_channel(options=self.channel_options)
+                self.client = google.cloud.texttospeech.TextToSpeechClient(transport=transport_class(channel=channel))
+            return self.client
+
+    def get_beta_client(self):
+        with self.lock:
+            self.check_fork()
+            if self.beta_client == None:
+                # same keep-alive / connection reuse settings as the v1 client
+                transport_class = google.cloud.texttospeech_v1beta1.services.text_to_speech.transports.TextToSpeechGrpcTransport
+                channel = transport_class.create_channel(options=self.channel_options)
+                self.beta_client = google.cloud.texttospeech_v1beta1.TextToSpeechClient(transport=transport_class(channel=channel))
+            return self.beta_client
 
     def get_translation_client(self):
-        translate_client = google.cloud.translate_v2.Client()
-        return translate_client
+        with self.lock:
+            self.check_fork()
+            if self.translation_client == None:
+                # the client holds on to an http session, connections get reused across requests
+                self.translation_client = google.cloud.translate_v2.Client()
+            return self.translation_client
+
+    def get_supported_audio_formats(self):
+        return list(GOOGLE_AUDIO_ENCODINGS.keys())
 
-    def get_tts_audio(self, text, voice_key, options):
+    def get_tts_audio(self, text, voice_key, options, audio_format=cloudlanguagetools.constants.AudioFormat.mp3):
         client = self.get_client()
 
         ssml_text = '<speak>' + text + '</speak>'
@@ -117,8 +173,14 @@ class GoogleService(cloudlanguagetools.service.Service):
             ssml_gender=google.cloud.texttospeech.SsmlVoiceGender[voice_key['ssml_gender']]
         )
 
+        # for the default format, let google pick the voice's natural sample rate
+        sample_rate_hertz = 0
+        if audio_format != cloudlanguagetools.constants.AudioFormat.mp3:
+            sample_rate_hertz = audio_format.sample_rate
+
         audio_config = google.cloud.texttospeech.AudioConfig(
-            audio_encoding=google.cloud.texttospeech.AudioEncoding.MP3,
+            audio_encoding=google.cloud.texttospeech.AudioEncoding[GOOGLE_AUDIO_ENCODINGS[audio_format]],
+            sample_rate_hertz=sample_rate_hertz,
             speaking_rate=options.get('speaking_rate', 1.0),
             pitch=options.get('pitch', 0.0)
         )
@@ -128,13 +190,34 @@ class GoogleService(cloudlanguagetools.service.Service):
         )
 
         # The response's audio_content is binary.
-        output_temp_file = tempfile.NamedTemporaryFile()
-        output_temp_filename = output_temp_file.name        
-        with open(output_temp_filename, "wb") as out:
-            out.write(response.audio_content)
+        return cloudlanguagetools.audiobuffer.AudioBuffer(response.audio_content)
 
-        return output_temp_file
 
+    def tts_multiple_supported(self):
+        return True
+
+    def get_tts_audio_multiple(self, text_list, voice_key, options):
+        client = self.get_beta_client()
+        text = cloudlanguagetools.service.join_marked_texts(text_list, '<mark name="{}"/>')
+        input_text = google.cloud.texttospeech_v1beta1.SynthesisInput(ssml='<speak>' + text + '</speak>')
+        voice = google.cloud.texttospeech_v1beta1.VoiceSelectionParams(
+            name=voice_key['name'],
+            language_code=voice_key['language_code'],
+            ssml_gender=google.cloud.texttospeech_v1beta1.SsmlVoiceGender[voice_key['ssml_gender']]
+        )
+        audio_config = google.cloud.texttospeech_v1beta1.AudioConfig(
+            audio_encoding=google.cloud.texttospeech_v1beta1.AudioEncoding.MP3,
+            speaking_rate=options.get('speaking_rate', 1.0),
+            pitch=options.get('pitch', 0.0)
+        )
+        response = client.synthesize_speech(request={
+            "input": input_text,
+            "voice": voice,
+            "audio_config": audio_config,
+            "enable_time_pointing": [google.cloud.texttospeech_v1beta1.SynthesizeSpeechRequest.TimepointType.SSML_MARK]
+        })
+        marks = [(timepoint.mark_name, timepoint.time_seconds * 1000) for timepoint in response.timepoints]
+        return response.audio_content, cloudlanguagetools.service.get_mark_offsets(marks, len(text_list))
 
     def get_tts_voice_list(self):
         client = self.get_client()
@@ -172,7 +255,7 @@ class GoogleService(cloudlanguagetools.service.Service):
         return html.unescape(result["translatedText"])
 
     def get_translation_languages(self):
-        translate_client = google.cloud.translate_v2.Client()
+        translate_client = self.get_translation_client()
 
         results = translate_client.get_languages()
 
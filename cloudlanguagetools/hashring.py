@@ -0,0 +1,24 @@
+import bisect
+import hashlib
+
+# each node appears at many points of the ring, so that keys are spread evenly
+HASH_RING_VIRTUAL_NODES = 160
+
+def hash_value(value):
+    return int.from_bytes(hashlib.md5(value.encode('utf-8')).digest()[0:8], 'big')
+
+class HashRing():
+    """consistent hashing: each key belongs to one of the nodes, and adding / removing a node
+    only moves the keys of that node"""
+    def __init__(self, nodes, virtual_nodes=HASH_RING_VIRTUAL_NODES):
+        self.nodes = sorted(set(nodes))
+        points = sorted([(hash_value(f'{node}#{i}'), node) for node in self.nodes for i in range(virtual_nodes)])
+        self.point_hashes = [point_hash for point_hash, node in points]
+        self.point_nodes = [node for point_hash, node in points]
+
+    def get_node(self, key):
+        """the node owning key, None if the ring is empty"""
+        if len(self.point_hashes) == 0:
+            return None
+        index = bisect.bisect(self.point_hashes, hash_value(key)) % len(self.point_hashes)
+        return self.point_nodes[index]
@@ -0,0 +1,48 @@
+import time
+import threading
+import collections
+
+class MemoryCache():
+    """thread-safe in-process LRU cache, entries optionally expire after ttl seconds"""
+    def __init__(self, max_entries, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key, None)
+            if entry != None:
+                value, expiry_time = entry
+                if expiry_time == None or time.time() < expiry_time:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self.entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        expiry_time = None
+        if self.ttl != None:
+            expiry_time = time.time() + self.ttl
+        with self.lock:
+            self.entries[key] = (value, expiry_time)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
@@ -1,6 +1,5 @@
 import json
 import requests
-import tempfile
 import uuid
 import operator
 import pydub
@@ -11,6 +10,7 @@ import cloudlanguagetools.ttsvoice
 import cloudlanguagetools.translationlanguage
 import cloudlanguagetools.transliterationlanguage
 import cloudlanguagetools.errors
+import cloudlanguagetools.audiobuffer
 
 NAVER_VOICE_SPEED_DEFAULT = 0
 NAVER_VOICE_PITCH_DEFAULT = 0
@@ -89,9 +89,6 @@ class NaverService(cloudlanguagetools.service.Service):
 
 
     def get_tts_audio(self, text, voice_key, options):
-        output_temp_file = tempfile.NamedTemporaryFile()
-        output_temp_filename = output_temp_file.name
-
         url = 'https://naveropenapi.apigw.ntruss.com/tts-premium/v1/tts'
         headers = {
             'Content-Type': 'application/x-www-form-urlencoded',
@@ -109,9 +106,7 @@ class NaverService(cloudlanguagetools.service.Service):
         # alternate_data = 'speaker=clara&text=vehicle&volume=0&speed=0&pitch=0&format=mp3'
         response = requests.post(url, data=data, headers=headers, timeout=cloudlanguagetools.constants.RequestTimeout)
         if response.status_code == 200:
-            with open(output_temp_filename, 'wb') as audio:
-                audio.write(response.content)
-            return output_temp_file
+            return cloudlanguagetools.audiobuffer.AudioBuffer(response.content)
 
         response_data = json.loads(response.content)['error']
         error_message = f'Status code: {response.status_code}: {response_data}'
@@ -1,4 +1,45 @@
+import cloudlanguagetools.constants
+import cloudlanguagetools.errors
+
+# pause between the texts of a multi-utterance request, so that each clip ends naturally
+MULTI_UTTERANCE_BREAK = '<break time="300ms"/>'
+
+def join_marked_texts(text_list, mark_format):
+    """ssml with a mark named after the index before each text, mark_format is the service's mark tag, like '<mark name="{}"/>'"""
+    return ''.join([mark_format.format(index) + text + MULTI_UTTERANCE_BREAK for index, text in enumerate(text_list)])
+
+def get_mark_offsets(marks, text_count):
+    """marks is a list of (mark name, offset in milliseconds), returns the offsets ordered by text index"""
+    offsets = {}
+    for mark_name, offset in marks:
+        offsets[int(mark_name)] = offset
+    if sorted(offsets.keys()) != list(range(text_count)):
+        raise cloudlanguagetools.errors.RequestError(f'expected {text_count} marks, got {len(offsets)}')
+    return [offsets[index] for index in range(text_count)]
 
 class Service():
     def __init__(self):
-        pass
\ No newline at end of file
+        pass
+
+    def tts_streaming_supported(self):
+        """whether get_tts_audio_stream returns audio chunks as they get synthesized"""
+        return False
+
+    def get_supported_audio_formats(self):
+        """audio formats which get_tts_audio can produce natively, through its audio_format argument.
+        other formats get transcoded from mp3"""
+        return [cloudlanguagetools.constants.AudioFormat.mp3]
+
+    def get_tts_audio_stream(self, text, voice_key, options, **kwargs):
+        """generator of audio chunks. services which can't stream yield the full audio in a single chunk"""
+        yield self.get_tts_audio(text, voice_key, options, **kwargs).get_bytes()
+
+    def tts_multiple_supported(self):
+        """whether the service has get_tts_audio_multiple(text_list, voice_key, options), which synthesizes all the texts
+        in one call, with a mark before each text. it returns the mp3 audio (bytes) and the offset (milliseconds)
+        at which each text starts"""
+        return False
+
+    def get_stats(self):
+        """per-process metrics, reported on /service_stats"""
+        return {}
@@ -1,8 +1,13 @@
 import os
+import json
 import base64
 import tempfile
 import logging
+import time
 import timeit
+import threading
+import queue
+import concurrent.futures
 import cloudlanguagetools.constants
 import cloudlanguagetools.errors
 import cloudlanguagetools.azure
@@ -18,6 +23,41 @@ import cloudlanguagetools.epitran
 import cloudlanguagetools.deepl
 import cloudlanguagetools.vocalware
 import cloudlanguagetools.fptai
+import cloudlanguagetools.audiocache
+import cloudlanguagetools.audiobuffer
+import cloudlanguagetools.transcoding
+import cloudlanguagetools.textsplitting
+import cloudlanguagetools.admissionscheduler
+import cloudlanguagetools.textnormalization
+import cloudlanguagetools.memorycache
+import cloudlanguagetools.audiostorage
+import cloudlanguagetools.sharedaudiocache
+
+# maximum number of concurrent requests to a given service, in each worker process
+SERVICE_MAX_CONCURRENCY = 4
+# threads used to fan out batch requests
+BATCH_MAX_WORKERS = 16
+# sentences of a long text synthesized concurrently
+CHUNK_MAX_WORKERS = 8
+# prefetching runs on a couple of threads only, so that it doesn't compete with interactive requests
+PREFETCH_MAX_WORKERS = 2
+# beyond this, prefetch hints get dropped
+PREFETCH_MAX_PENDING = 200
+PREFETCH_MAX_PENDING_PER_KEY = 20
+# concurrent ffmpeg processes, in each worker process
+TRANSCODING_MAX_WORKERS = 2
+TRANSCODING_TIMEOUT = cloudlanguagetools.constants.RequestTimeout
+# multi-utterance synthesis: short texts on the same voice get synthesized in a single service call
+MULTI_UTTERANCE_MAX_TEXT_LENGTH = 100
+MULTI_UTTERANCE_MAX_ITEMS = 50
+# uploads to the shared audio storage happen in the background
+AUDIO_STORAGE_UPLOAD_MAX_WORKERS = 2
+# translations / transliterations kept in memory, in each worker process
+TEXT_CACHE_MAX_ENTRIES = 20000
+TEXT_CACHE_TTL = 24 * 3600
+# the voice handle index gets built in the background when the process starts
+VOICE_HANDLE_INDEX_WAIT = cloudlanguagetools.constants.RequestTimeout
+VOICE_HANDLE_INDEX_RETRY_INTERVAL = 60
 
 class ServiceManager():
     def  __init__(self, secrets_config):
@@ -36,6 +76,31 @@ class ServiceManager():
         self.services[cloudlanguagetools.constants.Service.DeepL.name] = cloudlanguagetools.deepl.DeepLService()
         self.services[cloudlanguagetools.constants.Service.VocalWare.name] = cloudlanguagetools.vocalware.VocalWareService()
         self.services[cloudlanguagetools.constants.Service.FptAi.name] = cloudlanguagetools.fptai.FptAiService()
+        self.audio_cache = None
+        self.audio_storage = None
+        self.audio_storage_uploads = set()
+        self.audio_storage_lock = threading.Lock()
+        # AUDIO_CACHE_DIR set explicitly, a volume shared with the job workers
+        self.audio_cache_shared = False
+        self.shared_audio_cache = None
+        self.peer_cache = None
+        self.request_coalescer = None
+        self.voice_handle_index = None
+        self.voice_handle_index_ready = threading.Event()
+        # requests from users waiting on the audio (dynamic) get ahead of batch requests
+        self.admission_scheduler = cloudlanguagetools.admissionscheduler.AdmissionScheduler(
+            {key: SERVICE_MAX_CONCURRENCY for key in self.services.keys()})
+        self.batch_executor = concurrent.futures.ThreadPoolExecutor(max_workers=BATCH_MAX_WORKERS)
+        self.transcoding_executor = concurrent.futures.ThreadPoolExecutor(max_workers=TRANSCODING_MAX_WORKERS)
+        self.prefetch_executor = concurrent.futures.ThreadPoolExecutor(max_workers=PREFETCH_MAX_WORKERS)
+        self.audio_storage_executor = concurrent.futures.ThreadPoolExecutor(max_workers=AUDIO_STORAGE_UPLOAD_MAX_WORKERS)
+        # separate from the batch executor: chunked requests can be part of a batch
+        self.chunk_executor = concurrent.futures.ThreadPoolExecutor(max_workers=CHUNK_MAX_WORKERS)
+        self.prefetch_lock = threading.Lock()
+        self.prefetch_stats = {'pending': 0, 'completed': 0, 'errors': 0, 'already_cached': 0, 'dropped': 0}
+        self.prefetch_pending_per_key = {}
+        self.translation_cache = cloudlanguagetools.memorycache.MemoryCache(TEXT_CACHE_MAX_ENTRIES, TEXT_CACHE_TTL)
+        self.transliteration_cache = cloudlanguagetools.memorycache.MemoryCache(TEXT_CACHE_MAX_ENTRIES, TEXT_CACHE_TTL)
 
     def configure(self):
         # azure
@@ -91,8 +156,26 @@ class ServiceManager():
 
         # for AWS, the boto3 library will read environment variables itself
 
+        # audio cache
+        audio_cache_dir = os.environ.get('AUDIO_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'clt_audio_cache'))
+        audio_cache_max_size = int(os.environ.get('AUDIO_CACHE_MAX_SIZE_MB', 512)) * 1024 * 1024
+        self.configure_audio_cache(audio_cache_dir, audio_cache_max_size)
+        self.audio_cache_shared = 'AUDIO_CACHE_DIR' in os.environ
+
+        # hot clips, in memory shared by the gunicorn workers
+        shared_audio_cache_dir = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+        shared_audio_cache_path = os.environ.get('SHARED_AUDIO_CACHE_PATH', os.path.join(shared_audio_cache_dir, 'clt_shared_audio_cache'))
+        shared_audio_cache_slots = int(os.environ.get('SHARED_AUDIO_CACHE_SLOTS', cloudlanguagetools.sharedaudiocache.SHARED_AUDIO_CACHE_DEFAULT_SLOT_COUNT))
+        self.configure_shared_audio_cache(shared_audio_cache_path, shared_audio_cache_slots)
+
+        # audio storage shared between nodes, optional
+        self.configure_audio_storage(cloudlanguagetools.audiostorage.create_audio_storage_from_env())
+
         self.translation_language_list = self.get_translation_language_list()
 
+        # retrieving all the voice lists takes a while, requests shouldn't wait for it
+        threading.Thread(target=self.load_voice_handle_index, daemon=True).start()
+
     def configure_azure(self, region, key):
         self.services[cloudlanguagetools.constants.Service.Azure.name].configure(key, region)
 
@@ -112,6 +195,28 @@ class ServiceManager():
     def configure_forvo(self):
         self.services[cloudlanguagetools.constants.Service.Forvo.name].configure()
 
+    def configure_audio_cache(self, cache_dir, max_size):
+        self.audio_cache = cloudlanguagetools.audiocache.AudioCache(cache_dir, max_size)
+
+    def configure_shared_audio_cache(self, path, slot_count):
+        self.shared_audio_cache = cloudlanguagetools.sharedaudiocache.SharedAudioCache(path, slot_count)
+
+    def configure_audio_storage(self, audio_storage):
+        """audio_storage is a cloudlanguagetools.audiostorage.AudioStorage, or None"""
+        self.audio_storage = audio_storage
+
+    def shared_audio_available(self):
+        """whether audio synthesized by another node (the job workers) can be retrieved, through the audio storage or a shared audio cache directory"""
+        return self.audio_storage != None or self.audio_cache_shared
+
+    def configure_peer_cache(self, peer_cache):
+        """peer_cache must implement fetch_audio(cache_key, audio_request) and get_stats(), or be None"""
+        self.peer_cache = peer_cache
+
+    def configure_request_coalescer(self, request_coalescer):
+        """request_coalescer must implement get_audio(cache_key, cache_lookup, synthesize) and get_stats()"""
+        self.request_coalescer = request_coalescer
+
     def get_language_list(self):
         result_dict = {}
         for language in cloudlanguagetools.constants.Language:
@@ -127,8 +232,30 @@ class ServiceManager():
 
     def get_tts_voice_list_json(self):
         tts_voice_list = self.get_tts_voice_list()
+        self.build_voice_handle_index(tts_voice_list)
         return [voice.json_obj() for voice in tts_voice_list]
 
+    def build_voice_handle_index(self, tts_voice_list):
+        self.voice_handle_index = {voice.get_voice_handle(): (voice.service.name, voice.get_voice_key()) for voice in tts_voice_list}
+        self.voice_handle_index_ready.set()
+
+    def load_voice_handle_index(self):
+        while not self.voice_handle_index_ready.is_set():
+            try:
+                self.build_voice_handle_index(self.get_tts_voice_list())
+            except Exception:
+                logging.exception(f'could not build voice handle index, retrying in {VOICE_HANDLE_INDEX_RETRY_INTERVAL}s')
+                time.sleep(VOICE_HANDLE_INDEX_RETRY_INTERVAL)
+
+    def get_voice_for_handle(self, voice_handle):
+        """returns (service, voice_key) for a voice handle, as found in the voice list"""
+        # only waits right after the process started
+        if not self.voice_handle_index_ready.wait(VOICE_HANDLE_INDEX_WAIT):
+            raise cloudlanguagetools.errors.RequestError('voice list is not available yet, please retry')
+        if voice_handle not in self.voice_handle_index:
+            raise cloudlanguagetools.errors.NotFoundError(f'voice not found: {voice_handle}')
+        return self.voice_handle_index[voice_handle]
+
     def get_translation_language_list(self):
         result = []
         for key, service in self.services.items():
@@ -151,14 +278,403 @@ class ServiceManager():
         language_list = self.get_transliteration_language_list()
         return [language.json_obj() for language in language_list]
 
-    def get_tts_audio(self, text, service, voice_id, options):
-        service = self.services[service]
-        return service.get_tts_audio(text, voice_id, options)
+    def get_audio_format_args(self, audio_format):
+        # services which only produce mp3 don't take an audio_format argument
+        if audio_format == cloudlanguagetools.constants.AudioFormat.mp3:
+            return {}
+        return {'audio_format': audio_format}
+
+    def audio_format_native(self, service, audio_format):
+        return audio_format in self.services[service].get_supported_audio_formats()
+
+    def transcode_audio(self, audio_data, audio_format):
+        future = self.transcoding_executor.submit(cloudlanguagetools.transcoding.transcode_audio, audio_data, audio_format)
+        try:
+            return future.result(TRANSCODING_TIMEOUT)
+        except concurrent.futures.TimeoutError:
+            raise cloudlanguagetools.errors.RequestError(f'could not convert audio to {audio_format.name} within {TRANSCODING_TIMEOUT}s')
+
+    def synthesize_tts_audio(self, text, service, voice_id, options, audio_format=cloudlanguagetools.constants.AudioFormat.mp3,
+            request_mode=cloudlanguagetools.constants.RequestMode.batch):
+        if not self.audio_format_native(service, audio_format):
+            # transcode from the mp3 audio, which itself goes through the cache
+            mp3_audio_buffer = self.get_tts_audio(text, service, voice_id, options, request_mode=request_mode)
+            return cloudlanguagetools.audiobuffer.AudioBuffer(self.transcode_audio(mp3_audio_buffer.get_bytes(), audio_format))
+
+        # call the service, bounding the number of concurrent requests
+        with self.admission_scheduler.admit(service, request_mode):
+            return self.services[service].get_tts_audio(text, voice_id, options, **self.get_audio_format_args(audio_format))
+
+    def get_tts_audio(self, text, service, voice_id, options, audio_format=cloudlanguagetools.constants.AudioFormat.mp3,
+            request_mode=cloudlanguagetools.constants.RequestMode.batch, use_peer_cache=True):
+        """returns a cloudlanguagetools.audiobuffer.AudioBuffer. request_mode determines the priority of the service call.
+        use_peer_cache is False when serving a request from another node, which already determined we own it"""
+        text = self.normalize_text(text, cloudlanguagetools.constants.RequestType.audio, service)
+        if self.audio_cache == None:
+            return self.synthesize_tts_audio(text, service, voice_id, options, audio_format, request_mode)
+
+        cache_key = cloudlanguagetools.audiocache.build_audio_cache_key(text, service, voice_id, options, audio_format)
+        audio_data = self.get_cached_audio(cache_key, audio_format)
+        if audio_data != None:
+            return cloudlanguagetools.audiobuffer.AudioBuffer(audio_data)
+
+        if use_peer_cache and self.peer_cache != None:
+            # the node owning this request may have it cached already, otherwise it synthesizes it
+            audio_data = self.peer_cache.fetch_audio(cache_key, {
+                'text': text,
+                'service': service,
+                'voice_key': voice_id,
+                'options': options,
+                'audio_format': audio_format.name,
+                'request_mode': request_mode.name
+            })
+            if audio_data != None:
+                self.audio_cache.put(cache_key, audio_data)
+                return cloudlanguagetools.audiobuffer.AudioBuffer(audio_data)
+
+        def synthesize():
+            audio_buffer = self.synthesize_tts_audio(text, service, voice_id, options, audio_format, request_mode)
+            self.audio_cache.put(cache_key, audio_buffer.get_bytes())
+            self.store_audio(cache_key, audio_format, audio_buffer.get_bytes())
+            return audio_buffer
+
+        if self.request_coalescer != None:
+            return self.request_coalescer.get_audio(cache_key, lambda: self.audio_cache.get(cache_key), synthesize)
+        return synthesize()
+
+    def get_cached_audio(self, cache_key, audio_format):
+        """audio bytes from the local audio cache, or from the shared audio storage. None if not found"""
+        if self.shared_audio_cache != None:
+            audio_data = self.shared_audio_cache.get(cache_key)
+            if audio_data != None:
+                return audio_data
+        audio_data = self.audio_cache.get(cache_key)
+        if audio_data != None and self.shared_audio_cache != None:
+            # requested at least twice, most audio is only requested once and wouldn't be worth keeping in memory
+            self.shared_audio_cache.put(cache_key, audio_data)
+        if audio_data == None and self.audio_storage != None:
+            # another node may have synthesized it
+            audio_data = self.audio_storage.get(cache_key, audio_format)
+            if audio_data != None:
+                self.audio_cache.put(cache_key, audio_data)
+        return audio_data
+
+    def store_audio(self, cache_key, audio_format, audio_data):
+        if self.audio_storage != None:
+            future = self.audio_storage_executor.submit(self.audio_storage.put, cache_key, audio_format, audio_data)
+            with self.audio_storage_lock:
+                self.audio_storage_uploads.add(future)
+            future.add_done_callback(self.audio_storage_upload_done)
+
+    def audio_storage_upload_done(self, future):
+        with self.audio_storage_lock:
+            self.audio_storage_uploads.discard(future)
+
+    def wait_for_audio_storage(self, timeout):
+        """wait until the pending uploads to the audio storage are done"""
+        with self.audio_storage_lock:
+            uploads = list(self.audio_storage_uploads)
+        concurrent.futures.wait(uploads, timeout=timeout)
+
+    def get_audio_cache_key(self, text, service, voice_id, options, audio_format=cloudlanguagetools.constants.AudioFormat.mp3):
+        """the cache key get_tts_audio uses for this request"""
+        text = self.normalize_text(text, cloudlanguagetools.constants.RequestType.audio, service)
+        return cloudlanguagetools.audiocache.build_audio_cache_key(text, service, voice_id, options, audio_format)
+
+    def get_tts_audio_url(self, text, service, voice_id, options, audio_format=cloudlanguagetools.constants.AudioFormat.mp3):
+        """if the audio is in the shared audio storage, returns a short-lived url to download it, otherwise None.
+        audio cached on this node is returned directly, a redirect would only cost the client a round trip"""
+        if self.audio_storage == None:
+            return None
+        cache_key = self.get_audio_cache_key(text, service, voice_id, options, audio_format)
+        if self.shared_audio_cache != None and self.shared_audio_cache.contains(cache_key):
+            return None
+        if self.audio_cache != None and self.audio_cache.contains(cache_key):
+            return None
+        return self.audio_storage.get_url(cache_key, audio_format)
+
+    def get_tts_audio_chunked(self, text, service, voice_id, options, language=None, audio_format=cloudlanguagetools.constants.AudioFormat.mp3,
+            request_mode=cloudlanguagetools.constants.RequestMode.batch):
+        """for long texts: split at sentence boundaries, synthesize the sentences concurrently and join them.
+        each sentence gets cached separately, so editing one sentence reuses the audio for the others.
+        language is a cloudlanguagetools.constants.Language, used to find sentence boundaries"""
+        text = self.normalize_text(text, cloudlanguagetools.constants.RequestType.audio, service)
+        chunks = cloudlanguagetools.textsplitting.split_text(text, language)
+        if len(chunks) <= 1:
+            return self.get_tts_audio(text, service, voice_id, options, audio_format, request_mode)
+
+        futures = [self.chunk_executor.submit(self.get_tts_audio, chunk, service, voice_id, options, request_mode=request_mode) for chunk in chunks]
+        audio_data_list = [future.result().get_bytes() for future in futures]
+        future = self.transcoding_executor.submit(cloudlanguagetools.transcoding.concatenate_audio, audio_data_list, audio_format)
+        try:
+            return cloudlanguagetools.audiobuffer.AudioBuffer(future.result(TRANSCODING_TIMEOUT))
+        except concurrent.futures.TimeoutError:
+            raise cloudlanguagetools.errors.RequestError(f'could not join {len(chunks)} audio segments within {TRANSCODING_TIMEOUT}s')
+
+    def get_tts_audio_concat(self, items, audio_format=cloudlanguagetools.constants.AudioFormat.mp3,
+            request_mode=cloudlanguagetools.constants.RequestMode.batch):
+        """items is a list of dicts, either audio requests (text, service, voice_key, options) or {'silence': milliseconds}.
+        the audio segments are synthesized concurrently and joined into a single clip, which gets cached on top
+        of the segments. returns a cloudlanguagetools.audiobuffer.AudioBuffer"""
+        segments = []
+        for item in items:
+            if 'silence' in item:
+                segments.append(item)
+                continue
+            text = self.normalize_text(item['text'], cloudlanguagetools.constants.RequestType.audio, item['service'])
+            cache_key = cloudlanguagetools.audiocache.build_audio_cache_key(text, item['service'], item['voice_key'], item['options'])
+            segments.append({**item, 'text': text, 'cache_key': cache_key})
+
+        cache_key = cloudlanguagetools.audiocache.build_audio_concat_cache_key(
+            [segment['silence'] if 'silence' in segment else segment['cache_key'] for segment in segments], audio_format)
+        if self.audio_cache != None:
+            audio_data = self.get_cached_audio(cache_key, audio_format)
+            if audio_data != None:
+                return cloudlanguagetools.audiobuffer.AudioBuffer(audio_data)
+
+        # the same text can appear several times, for example a word, its example sentence, then the word again
+        futures = {}
+        for segment in segments:
+            if 'cache_key' in segment and segment['cache_key'] not in futures:
+                futures[segment['cache_key']] = self.chunk_executor.submit(self.get_tts_audio, segment['text'], segment['service'],
+                    segment['voice_key'], segment['options'], request_mode=request_mode)
+        audio_data_list = []
+        for segment in segments:
+            if 'silence' in segment:
+                audio_data_list.append(segment['silence'])
+            else:
+                audio_data_list.append(futures[segment['cache_key']].result().get_bytes())
+
+        future = self.transcoding_executor.submit(cloudlanguagetools.transcoding.concatenate_audio, audio_data_list, audio_format)
+        try:
+            audio_data = future.result(TRANSCODING_TIMEOUT)
+        except concurrent.futures.TimeoutError:
+            raise cloudlanguagetools.errors.RequestError(f'could not join {len(segments)} audio segments within {TRANSCODING_TIMEOUT}s')
+        if self.audio_cache != None:
+            self.audio_cache.put(cache_key, audio_data)
+            self.store_audio(cache_key, audio_format, audio_data)
+        return cloudlanguagetools.audiobuffer.AudioBuffer(audio_data)
+
+    def get_tts_audio_multiple(self, text_list, service, voice_id, options, audio_format=cloudlanguagetools.constants.AudioFormat.mp3,
+            request_mode=cloudlanguagetools.constants.RequestMode.batch):
+        """synthesize the texts which aren't cached in a single service call, when the service supports it.
+        the audio gets split at the offsets reported by the service, and each clip is cached separately.
+        returns a list of cloudlanguagetools.audiobuffer.AudioBuffer"""
+        text_list = [self.normalize_text(text, cloudlanguagetools.constants.RequestType.audio, service) for text in text_list]
+        cache_keys = [cloudlanguagetools.audiocache.build_audio_cache_key(text, service, voice_id, options, audio_format) for text in text_list]
+        results = [None] * len(text_list)
+        if self.audio_cache != None:
+            for index, cache_key in enumerate(cache_keys):
+                audio_data = self.get_cached_audio(cache_key, audio_format)
+                if audio_data != None:
+                    results[index] = cloudlanguagetools.audiobuffer.AudioBuffer(audio_data)
+
+        missing_indices = [index for index, result in enumerate(results) if result == None]
+        if len(missing_indices) > 1 and self.services[service].tts_multiple_supported():
+            with self.admission_scheduler.admit(service, request_mode):
+                audio_data, offsets = self.services[service].get_tts_audio_multiple([text_list[index] for index in missing_indices], voice_id, options)
+            future = self.transcoding_executor.submit(cloudlanguagetools.transcoding.split_audio, audio_data, offsets, audio_format)
+            try:
+                clips = future.result(TRANSCODING_TIMEOUT)
+            except concurrent.futures.TimeoutError:
+                raise cloudlanguagetools.errors.RequestError(f'could not split audio into {len(offsets)} clips within {TRANSCODING_TIMEOUT}s')
+            for index, clip in zip(missing_indices, clips):
+                results[index] = cloudlanguagetools.audiobuffer.AudioBuffer(clip)
+                if self.audio_cache != None:
+                    self.audio_cache.put(cache_keys[index], clip)
+                    self.store_audio(cache_keys[index], audio_format, clip)
+
+        # a single text, or a service without marks
+        for index in missing_indices:
+            if results[index] == None:
+                results[index] = self.get_tts_audio(text_list[index], service, voice_id, options, audio_format, request_mode)
+        return results
+
+    def get_multi_utterance_groups(self, audio_requests):
+        """indices of the audio requests which can be synthesized together: short texts, same voice / options / format"""
+        groups = {}
+        for index, audio_request in enumerate(audio_requests):
+            if len(audio_request['text']) > MULTI_UTTERANCE_MAX_TEXT_LENGTH or not self.services[audio_request['service']].tts_multiple_supported():
+                continue
+            group_key = json.dumps([audio_request['service'], audio_request['voice_key'], audio_request['options'],
+                audio_request.get('audio_format', cloudlanguagetools.constants.AudioFormat.mp3).name,
+                audio_request.get('request_mode', cloudlanguagetools.constants.RequestMode.batch).name], sort_keys=True)
+            groups.setdefault(group_key, []).append(index)
+        result = []
+        for indices in groups.values():
+            if len(indices) > 1:
+                result.extend([indices[i:i + MULTI_UTTERANCE_MAX_ITEMS] for i in range(0, len(indices), MULTI_UTTERANCE_MAX_ITEMS)])
+        return result
+
+    def get_tts_audio_batch(self, audio_requests, multi_utterance=False):
+        """audio_requests is a list of dicts with text, service, voice_key, options and optionally audio_format, request_mode.
+        requests are processed concurrently, returns a list of dicts with either audio or error set.
+        with multi_utterance, short texts on the same voice get synthesized with a single service call"""
+        def process_audio_request(audio_request):
+            starttime = timeit.default_timer()
+            result = {'audio': None, 'error': None}
+            try:
+                audio_format = audio_request.get('audio_format', cloudlanguagetools.constants.AudioFormat.mp3)
+                request_mode = audio_request.get('request_mode', cloudlanguagetools.constants.RequestMode.batch)
+                result['audio'] = self.get_tts_audio(audio_request['text'], audio_request['service'], audio_request['voice_key'], audio_request['options'], audio_format, request_mode)
+            except (cloudlanguagetools.errors.RequestError, cloudlanguagetools.errors.NotFoundError) as err:
+                result['error'] = err
+            except Exception as err:
+                # one bad request shouldn't fail the whole batch
+                logging.exception(f'could not process audio request {audio_request}')
+                result['error'] = err
+            result['processing_time'] = timeit.default_timer() - starttime
+            return result
+
+        def process_audio_request_group(indices):
+            starttime = timeit.default_timer()
+            audio_request = audio_requests[indices[0]]
+            try:
+                audio_buffers = self.get_tts_audio_multiple([audio_requests[index]['text'] for index in indices], audio_request['service'],
+                    audio_request['voice_key'], audio_request['options'],
+                    audio_request.get('audio_format', cloudlanguagetools.constants.AudioFormat.mp3),
+                    audio_request.get('request_mode', cloudlanguagetools.constants.RequestMode.batch))
+            except Exception as err:
+                # one bad text fails the whole service call, process the requests separately to find out which one
+                logging.warning(f'multi-utterance synthesis failed for {len(indices)} requests, processing them separately: {err}')
+                return [process_audio_request(audio_requests[index]) for index in indices]
+            # the service call is shared between the requests
+            processing_time = timeit.default_timer() - starttime
+            return [{'audio': audio_buffer, 'error': None, 'processing_time': processing_time} for audio_buffer in audio_buffers]
+
+        results = [None] * len(audio_requests)
+        groups = []
+        if multi_utterance:
+            groups = self.get_multi_utterance_groups(audio_requests)
+        grouped_indices = set([index for indices in groups for index in indices])
+        group_futures = [(indices, self.batch_executor.submit(process_audio_request_group, indices)) for indices in groups]
+        futures = [(index, self.batch_executor.submit(process_audio_request, audio_request)) for index, audio_request in enumerate(audio_requests) if index not in grouped_indices]
+        for indices, future in group_futures:
+            for index, result in zip(indices, future.result()):
+                results[index] = result
+        for index, future in futures:
+            results[index] = future.result()
+        return results
+
+    def prefetch_tts_audio(self, audio_requests, api_key=None):
+        """synthesize audio_requests (same format as get_tts_audio_batch) into the audio cache in the background.
+        each api key can only have a few pending requests. returns the number of requests which were queued"""
+        if self.audio_cache == None:
+            return 0
+
+        def prefetch_audio_request(audio_request):
+            try:
+                self.get_tts_audio(audio_request['text'], audio_request['service'], audio_request['voice_key'], audio_request['options'], audio_request['audio_format'])
+                prefetch_result = 'completed'
+            except Exception as err:
+                logging.warning(f'could not prefetch audio request {audio_request}: {err}')
+                prefetch_result = 'errors'
+            with self.prefetch_lock:
+                self.prefetch_stats['pending'] -= 1
+                self.prefetch_stats[prefetch_result] += 1
+                self.prefetch_pending_per_key[api_key] -= 1
+                if self.prefetch_pending_per_key[api_key] == 0:
+                    del self.prefetch_pending_per_key[api_key]
+
+        queued_count = 0
+        for audio_request in audio_requests:
+            audio_request = {'audio_format': cloudlanguagetools.constants.AudioFormat.mp3, **audio_request}
+            audio_request['text'] = self.normalize_text(audio_request['text'], cloudlanguagetools.constants.RequestType.audio, audio_request['service'])
+            cache_key = cloudlanguagetools.audiocache.build_audio_cache_key(audio_request['text'], audio_request['service'], audio_request['voice_key'], audio_request['options'], audio_request['audio_format'])
+            with self.prefetch_lock:
+                if self.audio_cache.contains(cache_key):
+                    self.prefetch_stats['already_cached'] += 1
+                    continue
+                if self.prefetch_stats['pending'] >= PREFETCH_MAX_PENDING or self.prefetch_pending_per_key.get(api_key, 0) >= PREFETCH_MAX_PENDING_PER_KEY:
+                    self.prefetch_stats['dropped'] += 1
+                    continue
+                self.prefetch_stats['pending'] += 1
+                self.prefetch_pending_per_key[api_key] = self.prefetch_pending_per_key.get(api_key, 0) + 1
+            self.prefetch_executor.submit(prefetch_audio_request, audio_request)
+            queued_count += 1
+        return queued_count
+
+    def get_tts_audio_stream(self, text, service, voice_id, options, audio_format=cloudlanguagetools.constants.AudioFormat.mp3,
+            request_mode=cloudlanguagetools.constants.RequestMode.batch):
+        """generator of audio chunks, the complete audio gets cached once the stream is finished"""
+        if not self.audio_format_native(service, audio_format):
+            # transcoding needs the complete audio
+            yield self.get_tts_audio(text, service, voice_id, options, audio_format, request_mode).get_bytes()
+            return
+
+        text = self.normalize_text(text, cloudlanguagetools.constants.RequestType.audio, service)
+        cache_key = None
+        if self.audio_cache != None:
+            cache_key = cloudlanguagetools.audiocache.build_audio_cache_key(text, service, voice_id, options, audio_format)
+            audio_data = self.get_cached_audio(cache_key, audio_format)
+            if audio_data != None:
+                yield audio_data
+                return
+
+        # the service gets read at its own pace on another thread, so that a slow client doesn't hold on to
+        # the service slot while it downloads. the audio still gets cached if the client goes away
+        chunk_queue = queue.Queue()
+        def synthesize():
+            audio_buffer = cloudlanguagetools.audiobuffer.AudioBuffer()
+            try:
+                with self.admission_scheduler.admit(service, request_mode):
+                    for chunk in self.services[service].get_tts_audio_stream(text, voice_id, options, **self.get_audio_format_args(audio_format)):
+                        audio_buffer.write(chunk)
+                        chunk_queue.put(chunk)
+                chunk_queue.put(None)
+            except Exception as err:
+                chunk_queue.put(err)
+                return
+            if cache_key != None:
+                self.audio_cache.put(cache_key, audio_buffer.get_bytes())
+                self.store_audio(cache_key, audio_format, audio_buffer.get_bytes())
+        threading.Thread(target=synthesize, daemon=True).start()
+
+        while True:
+            chunk = chunk_queue.get()
+            if chunk == None:
+                return
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+
+    def get_stats(self):
+        stats = {}
+        if self.audio_cache != None:
+            stats['audio_cache'] = self.audio_cache.get_stats()
+        if self.shared_audio_cache != None:
+            stats['shared_audio_cache'] = self.shared_audio_cache.get_stats()
+        if self.audio_storage != None:
+            stats['audio_storage'] = self.audio_storage.get_stats()
+        if self.peer_cache != None:
+            stats['peer_cache'] = self.peer_cache.get_stats()
+        if self.request_coalescer != None:
+            stats['request_coalescing'] = self.request_coalescer.get_stats()
+        with self.prefetch_lock:
+            stats['prefetch'] = dict(self.prefetch_stats)
+        stats['admission'] = self.admission_scheduler.get_stats()
+        stats['translation_cache'] = self.translation_cache.get_stats()
+        stats['transliteration_cache'] = self.transliteration_cache.get_stats()
+        for key, service in self.services.items():
+            service_stats = service.get_stats()
+            if len(service_stats) > 0:
+                stats[key] = service_stats
+        return stats
+
+    def normalize_text(self, text, request_type, service):
+        """canonical form of the text, used for cache keys and service calls"""
+        return cloudlanguagetools.textnormalization.normalize_text(text, request_type, service)
 
     def get_translation(self, text, service, from_language_key, to_language_key):
         """return text"""
-        service = self.services[service]
-        return service.get_translation(text, from_language_key, to_language_key)
+        text = self.normalize_text(text, cloudlanguagetools.constants.RequestType.translation, service)
+        cache_key = json.dumps([text, service, from_language_key, to_language_key], sort_keys=True, ensure_ascii=False)
+        translated_text = self.translation_cache.get(cache_key)
+        if translated_text != None:
+            return translated_text
+        translated_text = self.services[service].get_translation(text, from_language_key, to_language_key)
+        self.translation_cache.put(cache_key, translated_text)
+        return translated_text
 
     def get_all_translations(self, text, from_language, to_language):
         global_starttime = timeit.default_timer()
@@ -185,8 +701,14 @@ class ServiceManager():
         return result
 
     def get_transliteration(self, text, service, transliteration_key):
-        service = self.services[service]
-        return service.get_transliteration(text, transliteration_key)
+        text = self.normalize_text(text, cloudlanguagetools.constants.RequestType.transliteration, service)
+        cache_key = json.dumps([text, service, transliteration_key], sort_keys=True, ensure_ascii=False)
+        transliterated_text = self.transliteration_cache.get(cache_key)
+        if transliterated_text != None:
+            return transliterated_text
+        transliterated_text = self.services[service].get_transliteration(text, transliteration_key)
+        self.transliteration_cache.put(cache_key, transliterated_text)
+        return transliterated_text
 
     def detect_language(self, text_list):
         """returns an enum from constants.Language"""
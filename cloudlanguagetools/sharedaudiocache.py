@@ -0,0 +1,145 @@
+import os
+import mmap
+import time
+import fcntl
+import struct
+import zlib
+import hashlib
+import threading
+import logging
+
+# docker gives containers 64mb of /dev/shm by default, the default size stays below that
+SHARED_AUDIO_CACHE_DEFAULT_SLOT_COUNT = 2048
+SHARED_AUDIO_CACHE_DEFAULT_SLOT_SIZE = 24 * 1024
+
+FILE_HEADER_FORMAT = '<8sII'
+FILE_HEADER_SIZE = 64
+FILE_MAGIC = b'CLTHOTA1'
+# sequence number (odd while a write is in progress), key digest, data length, crc32 of the data, last access time
+SLOT_HEADER_FORMAT = '<I32sIId'
+SLOT_HEADER_SIZE = 64
+SLOT_TIMESTAMP_OFFSET = struct.calcsize('<I32sII')
+
+class SharedAudioCache():
+    """fixed-size cache of small audio clips in a memory-mapped file, shared by all the worker processes on a host.
+    each key can go in one of two slots, the least recently used one gets replaced.
+    readers don't lock: a slot being overwritten gets detected with the sequence number and the crc.
+    the layout is part of the file name: processes still running with another layout (during a rolling reload)
+    keep using their own file, which must never be resized under them"""
+    def __init__(self, path, slot_count=SHARED_AUDIO_CACHE_DEFAULT_SLOT_COUNT, slot_size=SHARED_AUDIO_CACHE_DEFAULT_SLOT_SIZE):
+        self.path = f'{path}.{slot_count}x{slot_size}'
+        self.slot_count = slot_count
+        self.slot_size = slot_size
+        self.max_data_size = slot_size - SLOT_HEADER_SIZE
+        file_size = FILE_HEADER_SIZE + slot_count * slot_size
+        file_header = struct.pack(FILE_HEADER_FORMAT, FILE_MAGIC, slot_count, slot_size)
+
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self.fd).st_size != file_size or os.pread(self.fd, len(file_header), 0) != file_header:
+                # new file
+                logging.info(f'initializing shared audio cache {self.path}, {slot_count} slots of {slot_size} bytes')
+                os.ftruncate(self.fd, file_size)
+                os.pwrite(self.fd, file_header, 0)
+        finally:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        self.mm = mmap.mmap(self.fd, file_size, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+
+        # flock serializes writers in different processes, but not threads sharing self.fd
+        self.write_lock = threading.Lock()
+        # statistics are per process
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.puts = 0
+        self.too_large = 0
+
+    def get_key_digest(self, cache_key):
+        return hashlib.sha256(cache_key.encode('utf-8')).digest()
+
+    def get_slot_offsets(self, key_digest):
+        slot_1 = int.from_bytes(key_digest[0:8], 'little') % self.slot_count
+        slot_2 = int.from_bytes(key_digest[8:16], 'little') % self.slot_count
+        return [FILE_HEADER_SIZE + slot * self.slot_size for slot in [slot_1, slot_2]]
+
+    def read_slot(self, offset, key_digest):
+        sequence, slot_key_digest, length, crc, timestamp = struct.unpack_from(SLOT_HEADER_FORMAT, self.mm, offset)
+        if slot_key_digest != key_digest or sequence % 2 == 1 or length > self.max_data_size:
+            return None
+        data = self.mm[offset + SLOT_HEADER_SIZE:offset + SLOT_HEADER_SIZE + length]
+        # the slot may have been overwritten while we were copying
+        if struct.unpack_from('<I', self.mm, offset)[0] != sequence or zlib.crc32(data) != crc:
+            return None
+        return data
+
+    def contains(self, cache_key):
+        """doesn't count as a hit / miss and doesn't update the access time"""
+        key_digest = self.get_key_digest(cache_key)
+        return any([self.read_slot(offset, key_digest) != None for offset in self.get_slot_offsets(key_digest)])
+
+    def get(self, cache_key):
+        """audio bytes, or None"""
+        key_digest = self.get_key_digest(cache_key)
+        for offset in self.get_slot_offsets(key_digest):
+            data = self.read_slot(offset, key_digest)
+            if data != None:
+                # not covered by the crc, a concurrent update of the access time is harmless
+                struct.pack_into('<d', self.mm, offset + SLOT_TIMESTAMP_OFFSET, time.time())
+                with self.lock:
+                    self.hits += 1
+                return data
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def put(self, cache_key, data):
+        """clips which don't fit in a slot are ignored"""
+        if len(data) > self.max_data_size:
+            with self.lock:
+                self.too_large += 1
+            return
+        key_digest = self.get_key_digest(cache_key)
+        offsets = self.get_slot_offsets(key_digest)
+        with self.write_lock:
+            self.write_slot(offsets, key_digest, data)
+        with self.lock:
+            self.puts += 1
+
+    def write_slot(self, offsets, key_digest, data):
+        # self.write_lock must be held
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        try:
+            slots = [(struct.unpack_from(SLOT_HEADER_FORMAT, self.mm, offset), offset) for offset in offsets]
+            matching_slots = [offset for header, offset in slots if header[1] == key_digest]
+            if len(matching_slots) > 0:
+                offset = matching_slots[0]
+            else:
+                # least recently used, empty slots have a timestamp of 0
+                offset = min(slots, key=lambda x: x[0][4])[1]
+            # odd while writing, readers skip the slot
+            sequence = ((struct.unpack_from('<I', self.mm, offset)[0] + 1) % 2**32) | 1
+            struct.pack_into('<I', self.mm, offset, sequence)
+            self.mm[offset + SLOT_HEADER_SIZE:offset + SLOT_HEADER_SIZE + len(data)] = data
+            struct.pack_into(SLOT_HEADER_FORMAT, self.mm, offset, (sequence + 1) % 2**32, key_digest, len(data), zlib.crc32(data), time.time())
+        finally:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def get_stats(self):
+        entries = 0
+        used_size = 0
+        for slot in range(self.slot_count):
+            sequence, key_digest, length, crc, timestamp = struct.unpack_from(SLOT_HEADER_FORMAT, self.mm, FILE_HEADER_SIZE + slot * self.slot_size)
+            if timestamp > 0:
+                entries += 1
+                used_size += length
+        with self.lock:
+            return {
+                'entries': entries,
+                'slots': self.slot_count,
+                'used_size': used_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'puts': self.puts,
+                'too_large': self.too_large
+            }
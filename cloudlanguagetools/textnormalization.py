@@ -0,0 +1,95 @@
+import re
+import html
+import unicodedata
+
+import cloudlanguagetools.constants
+
+RequestType = cloudlanguagetools.constants.RequestType
+Service = cloudlanguagetools.constants.Service
+
+# text coming from anki fields is normalized before cache lookups and service calls, so that texts which only differ
+# by entities, non-breaking spaces or whitespace share the same cache entry. markup (ssml, or html which a service
+# may interpret) is left alone.
+
+ENTITY_REGEX = re.compile(r'&(?:#[0-9]+|#[xX][0-9a-fA-F]+|[a-zA-Z][a-zA-Z0-9]*);')
+# these must stay escaped when the text ends up inside an xml document
+XML_ENTITY_CHARACTERS = ['&', '<', '>', '"', "'"]
+# non-breaking, zero width and other exotic spaces
+SPACE_REGEX = re.compile(r'[\u00a0\u1680\u2000-\u200a\u202f\u205f\u3000]')
+ZERO_WIDTH_REGEX = re.compile(r'[\u200b\u200c\u200d\u2060\ufeff]')
+HORIZONTAL_WHITESPACE_REGEX = re.compile(r'[ \t]+')
+NEWLINES_REGEX = re.compile(r'\s*[\r\n]+\s*')
+BLANK_LINES_REGEX = re.compile(r'\n{3,}')
+# "hello !!" -> "hello!", an ellipsis is kept
+TRAILING_PUNCTUATION_REGEX = re.compile(r'\s*([!?])\1*$|\s+([.\u3002\uff01\uff1f])$')
+
+def unescape_html_entities(text):
+    return html.unescape(text)
+
+def unescape_html_entities_xml_safe(text):
+    """like unescape_html_entities, but &amp; &lt; etc stay escaped, the text gets embedded in ssml"""
+    def replace_entity(match):
+        character = html.unescape(match.group())
+        if character in XML_ENTITY_CHARACTERS or character == match.group():
+            return match.group()
+        return character
+    return ENTITY_REGEX.sub(replace_entity, text)
+
+def normalize_unicode(text):
+    # composed and decomposed accents look the same to the user
+    return unicodedata.normalize('NFC', text)
+
+def normalize_spaces(text):
+    text = ZERO_WIDTH_REGEX.sub('', text)
+    return SPACE_REGEX.sub(' ', text)
+
+def collapse_whitespace(text):
+    """collapse runs of spaces / tabs, line breaks are kept. runs of blank lines become a single blank line,
+    so that paragraphs stay separate"""
+    lines = [HORIZONTAL_WHITESPACE_REGEX.sub(' ', line).strip() for line in text.splitlines()]
+    return BLANK_LINES_REGEX.sub('\n\n', '\n'.join(lines)).strip('\n')
+
+def join_lines(text):
+    # a line break doesn't change how the text gets pronounced
+    return NEWLINES_REGEX.sub(' ', text).strip()
+
+def normalize_trailing_punctuation(text):
+    return TRAILING_PUNCTUATION_REGEX.sub(lambda match: match.group(1) or match.group(2), text)
+
+NORMALIZATION_FUNCTIONS = {
+    'html_entities': unescape_html_entities,
+    'html_entities_xml_safe': unescape_html_entities_xml_safe,
+    'unicode': normalize_unicode,
+    'spaces': normalize_spaces,
+    'whitespace': collapse_whitespace,
+    'lines': join_lines,
+    'trailing_punctuation': normalize_trailing_punctuation,
+}
+
+# translation services may interpret html, so &lt; / &gt; must not turn into markup
+DEFAULT_NORMALIZATION_STEPS = {
+    RequestType.audio: ['html_entities', 'unicode', 'spaces', 'whitespace', 'lines', 'trailing_punctuation'],
+    RequestType.translation: ['html_entities_xml_safe', 'unicode', 'spaces', 'whitespace'],
+    RequestType.transliteration: ['html_entities_xml_safe', 'unicode', 'spaces', 'whitespace'],
+}
+
+# these services insert the text into an ssml document, which must remain valid
+AUDIO_SSML_NORMALIZATION_STEPS = ['html_entities_xml_safe', 'unicode', 'spaces', 'whitespace', 'lines', 'trailing_punctuation']
+SERVICE_NORMALIZATION_STEPS = {
+    (RequestType.audio, Service.Azure.name): AUDIO_SSML_NORMALIZATION_STEPS,
+    (RequestType.audio, Service.Google.name): AUDIO_SSML_NORMALIZATION_STEPS,
+    (RequestType.audio, Service.Amazon.name): AUDIO_SSML_NORMALIZATION_STEPS,
+    (RequestType.audio, Service.CereProc.name): AUDIO_SSML_NORMALIZATION_STEPS,
+    (RequestType.audio, Service.Watson.name): AUDIO_SSML_NORMALIZATION_STEPS,
+}
+
+def get_normalization_steps(request_type, service):
+    """service is the service name"""
+    return SERVICE_NORMALIZATION_STEPS.get((request_type, service), DEFAULT_NORMALIZATION_STEPS[request_type])
+
+def normalize_text(text, request_type, service):
+    """returns the canonical form of text, used both as the cache key and for the service call"""
+    for step in get_normalization_steps(request_type, service):
+        text = NORMALIZATION_FUNCTIONS[step](text)
+    return text
+
@@ -0,0 +1,72 @@
+import re
+
+import cloudlanguagetools.constants
+
+Language = cloudlanguagetools.constants.Language
+
+# sentence ending punctuation, followed by closing quotes / brackets (possibly after a space, french style).
+# latin punctuation must be followed by whitespace, so that 3.5 or example.com don't get split.
+# CJK punctuation doesn't need it
+SENTENCE_END_REGEX = re.compile(r'[.!?…]+(?:\s*["\'»”’)\]])*\s+|[。！？]+[」』”’）]*\s*|[।॥]+\s*|[؟]+\s+')
+
+# sentences shorter than this get merged with the next one, a service call per word isn't worth it
+CHUNK_MIN_LENGTH = 20
+
+# abbreviations which end with a period but don't end a sentence
+ABBREVIATIONS = {
+    Language.en: ['mr', 'mrs', 'ms', 'dr', 'prof', 'st', 'jr', 'sr', 'vs', 'etc', 'e.g', 'i.e', 'no'],
+    Language.fr: ['m', 'mme', 'mlle', 'dr', 'pr', 'st', 'ste', 'etc', 'p.ex', 'cf'],
+    Language.de: ['dr', 'prof', 'hr', 'fr', 'nr', 'str', 'bzw', 'z.b', 'u.a', 'usw', 'ca'],
+    Language.es: ['sr', 'sra', 'srta', 'dr', 'dra', 'ud', 'uds', 'etc', 'p.ej'],
+    Language.it: ['sig', 'sig.ra', 'dott', 'prof', 'ecc', 'ca'],
+    Language.pt_pt: ['sr', 'sra', 'dr', 'dra', 'etc'],
+    Language.pt_br: ['sr', 'sra', 'dr', 'dra', 'etc'],
+    Language.nl: ['dhr', 'mevr', 'dr', 'prof', 'bijv', 'enz'],
+}
+
+# languages which don't mark the end of sentences with punctuation, we can't split them reliably
+UNSPLIT_LANGUAGES = [Language.th, Language.lo, Language.km, Language.my]
+
+def is_abbreviation(sentence, language):
+    words = sentence.split()
+    if len(words) == 0 or not sentence.endswith('.'):
+        return False
+    last_word = words[-1][:-1].lower()
+    # initials, like J. R. R. Tolkien
+    if len(last_word) == 1 and last_word.isalpha():
+        return True
+    return last_word in ABBREVIATIONS.get(language, [])
+
+def split_sentences(text, language=None):
+    """returns the list of sentences, whitespace between sentences is kept at the end of each sentence,
+    so that joining the list gives back the original text"""
+    if '<' in text or language in UNSPLIT_LANGUAGES:
+        # ssml markup can't be split safely
+        return [text]
+    sentences = []
+    start = 0
+    for match in SENTENCE_END_REGEX.finditer(text):
+        if is_abbreviation(text[start:match.start()] + match.group().strip()[0:1], language):
+            continue
+        sentences.append(text[start:match.end()])
+        start = match.end()
+    if start < len(text):
+        sentences.append(text[start:])
+    return sentences
+
+def split_text(text, language=None, min_chunk_length=CHUNK_MIN_LENGTH):
+    """split text into chunks of whole sentences, which can be synthesized separately"""
+    chunks = []
+    current_chunk = ''
+    for sentence in split_sentences(text, language):
+        current_chunk += sentence
+        if len(current_chunk.strip()) >= min_chunk_length:
+            chunks.append(current_chunk)
+            current_chunk = ''
+    if len(current_chunk.strip()) > 0:
+        if len(chunks) > 0:
+            # short trailing sentence, attach it to the previous chunk
+            chunks[-1] += current_chunk
+        else:
+            chunks.append(current_chunk)
+    return [chunk.strip() for chunk in chunks]
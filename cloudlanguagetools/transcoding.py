@@ -0,0 +1,49 @@
+import io
+import pydub
+import pydub.silence
+
+# when splitting audio into clips, the silence at the end of each clip is trimmed down to this margin
+SPLIT_SILENCE_THRESHOLD = -50.0 # dBFS
+SPLIT_SILENCE_MARGIN = 100 # milliseconds
+
+def transcode_audio(audio_data, audio_format, input_format='mp3'):
+    """convert audio_data (bytes) to a cloudlanguagetools.constants.AudioFormat, returns bytes.
+    ffmpeg runs in a subprocess, so this can be called from a thread pool"""
+    sound = pydub.AudioSegment.from_file(io.BytesIO(audio_data), format=input_format)
+    sound = sound.set_frame_rate(audio_format.sample_rate).set_channels(1)
+    output = io.BytesIO()
+    sound.export(output, format=audio_format.file_extension, codec=audio_format.codec, bitrate=audio_format.bitrate)
+    return output.getvalue()
+
+def concatenate_audio(audio_data_list, audio_format, input_format='mp3'):
+    """join several clips (bytes) into one, encoded in audio_format. an int in audio_data_list
+    inserts that many milliseconds of silence. returns bytes"""
+    sound = pydub.AudioSegment.empty()
+    for audio_data in audio_data_list:
+        if isinstance(audio_data, int):
+            sound += pydub.AudioSegment.silent(duration=audio_data, frame_rate=audio_format.sample_rate)
+        else:
+            sound += pydub.AudioSegment.from_file(io.BytesIO(audio_data), format=input_format)
+    sound = sound.set_frame_rate(audio_format.sample_rate).set_channels(1)
+    output = io.BytesIO()
+    sound.export(output, format=audio_format.file_extension, codec=audio_format.codec, bitrate=audio_format.bitrate)
+    return output.getvalue()
+
+def split_audio(audio_data, offsets, audio_format, input_format='mp3'):
+    """cut audio_data (bytes) into clips starting at offsets (milliseconds), each clip runs until the start
+    of the next one. returns a list of bytes, encoded in audio_format"""
+    sound = pydub.AudioSegment.from_file(io.BytesIO(audio_data), format=input_format)
+    sound = sound.set_frame_rate(audio_format.sample_rate).set_channels(1)
+    clips = []
+    for index, start in enumerate(offsets):
+        end = len(sound)
+        if index + 1 < len(offsets):
+            end = offsets[index + 1]
+        clip = sound[start:end]
+        # the pause between utterances
+        trailing_silence = pydub.silence.detect_leading_silence(clip.reverse(), silence_threshold=SPLIT_SILENCE_THRESHOLD)
+        clip = clip[:min(len(clip), len(clip) - trailing_silence + SPLIT_SILENCE_MARGIN)]
+        output = io.BytesIO()
+        clip.export(output, format=audio_format.file_extension, codec=audio_format.codec, bitrate=audio_format.bitrate)
+        clips.append(output.getvalue())
+    return clips
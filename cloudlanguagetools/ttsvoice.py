@@ -1,4 +1,15 @@
 
+import json
+import hashlib
+
+VOICE_HANDLE_HASH_LENGTH = 12
+
+def build_voice_handle(service_name, voice_key):
+    """short and stable identifier for a voice, which can be used in urls instead of the voice_key json"""
+    canonical_voice = json.dumps({'service': service_name, 'voice_key': voice_key}, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    voice_hash = hashlib.sha256(canonical_voice.encode('utf-8')).hexdigest()[0:VOICE_HANDLE_HASH_LENGTH]
+    return f'{service_name.lower()}_{voice_hash}'
+
 class TtsVoice():
     def __init__(self):
         pass
@@ -18,6 +29,9 @@ class TtsVoice():
     def get_voice_description(self):
         return f'{self.get_audio_language_name()}, {self.get_gender().name}, {self.get_voice_shortname()}, {self.service.name}'
 
+    def get_voice_handle(self):
+        return build_voice_handle(self.service.name, self.get_voice_key())
+
     def json_obj(self):
         return {
             'service': self.service.name,
@@ -26,6 +40,7 @@ class TtsVoice():
             'audio_language_code': self.get_audio_language_code(),
             'audio_language_name': self.get_audio_language_name(),
             'voice_key': self.get_voice_key(),
+            'voice_handle': self.get_voice_handle(),
             'voice_description': self.get_voice_description(),
             'options': self.get_options()
         }
@@ -2,7 +2,6 @@ import json
 import requests
 import urllib
 import hashlib
-import tempfile
 import uuid
 import operator
 import pydub
@@ -13,6 +12,7 @@ import cloudlanguagetools.ttsvoice
 import cloudlanguagetools.translationlanguage
 import cloudlanguagetools.transliterationlanguage
 import cloudlanguagetools.errors
+import cloudlanguagetools.audiobuffer
 
 NAVER_VOICE_SPEED_DEFAULT = 0
 NAVER_VOICE_PITCH_DEFAULT = 0
@@ -54,9 +54,6 @@ class VocalWareService(cloudlanguagetools.service.Service):
         raise cloudlanguagetools.errors.RequestError('not supported')
 
     def get_tts_audio(self, text, voice_key, options):
-        output_temp_file = tempfile.NamedTemporaryFile()
-        output_temp_filename = output_temp_file.name
-
         urlencoded_text = urllib.parse.unquote_plus(text)
 
         # checksum calculation
@@ -69,9 +66,7 @@ class VocalWareService(cloudlanguagetools.service.Service):
 
         response = requests.get(url, timeout=cloudlanguagetools.constants.RequestTimeout)
         if response.status_code == 200:
-            with open(output_temp_filename, 'wb') as audio:
-                audio.write(response.content)
-            return output_temp_file
+            return cloudlanguagetools.audiobuffer.AudioBuffer(response.content)
 
         response_data = response.content
         error_message = f'Status code: {response.status_code}: {response_data}'
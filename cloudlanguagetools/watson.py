@@ -1,6 +1,5 @@
 import json
 import requests
-import tempfile
 import logging
 
 import cloudlanguagetools.service
@@ -9,6 +8,7 @@ import cloudlanguagetools.ttsvoice
 import cloudlanguagetools.translationlanguage
 import cloudlanguagetools.transliterationlanguage
 import cloudlanguagetools.errors
+import cloudlanguagetools.audiobuffer
 
 def get_translation_language_enum(language_id):
     # print(f'language_id: {language_id}')
@@ -116,9 +116,6 @@ class WatsonService(cloudlanguagetools.service.Service):
         return result
 
     def get_tts_audio(self, text, voice_key, options):
-        output_temp_file = tempfile.NamedTemporaryFile()
-        output_temp_filename = output_temp_file.name
-
         base_url = self.speech_url
         url_path = '/v1/synthesize'
         voice_name = voice_key["name"]
@@ -135,9 +132,7 @@ class WatsonService(cloudlanguagetools.service.Service):
         response = requests.post(constructed_url, data=json.dumps(data), auth=('apikey', self.speech_key), headers=headers, timeout=cloudlanguagetools.constants.RequestTimeout)
 
         if response.status_code == 200:
-            with open(output_temp_filename, 'wb') as audio:
-                audio.write(response.content)
-            return output_temp_file
+            return cloudlanguagetools.audiobuffer.AudioBuffer(response.content)
 
         # otherwise, an error occured
         error_message = f"Status code: {response.status_code} reason: {response.reason} voice: [{voice_name}]]"
@@ -0,0 +1,99 @@
+import os
+import logging
+import timeit
+import threading
+import secrets
+import redisdb
+import request_coalescing
+import peer_cache
+import cloudlanguagetools.constants
+import cloudlanguagetools.errors
+import cloudlanguagetools.servicemanager
+
+# jobs processed concurrently by each worker process
+JOB_WORKER_THREADS = int(os.environ.get('JOB_WORKER_THREADS', 4))
+# how long take_job blocks, so that the loop can be interrupted
+JOB_WORKER_POLL_TIMEOUT = 5
+# the web nodes retrieve the audio from the audio storage once the job is done
+JOB_WORKER_UPLOAD_TIMEOUT = 60
+
+def get_error_status(error):
+    if isinstance(error, cloudlanguagetools.errors.NotFoundError):
+        return 404
+    return 400
+
+def process_audio_job(manager, job_data):
+    """returns results, one dict per item. the audio goes into the audio cache, results contain the cache keys"""
+    audio_format = cloudlanguagetools.constants.AudioFormat[job_data['audio_format']]
+    audio_requests = [{**audio_request, 'audio_format': audio_format} for audio_request in job_data['items']]
+    results = []
+    for index, result in enumerate(manager.get_tts_audio_batch(audio_requests)):
+        status = {'index': index, 'processing_time': result['processing_time']}
+        if result['error'] == None:
+            audio_request = audio_requests[index]
+            status['status'] = 200
+            status['cache_key'] = manager.get_audio_cache_key(audio_request['text'], audio_request['service'],
+                audio_request['voice_key'], audio_request['options'], audio_format)
+        else:
+            status.update({'status': get_error_status(result['error']), 'error': str(result['error'])})
+        results.append(status)
+    manager.wait_for_audio_storage(JOB_WORKER_UPLOAD_TIMEOUT)
+    return results
+
+def process_translation_job(manager, job_data):
+    results = []
+    for index, item in enumerate(job_data['items']):
+        starttime = timeit.default_timer()
+        status = {'index': index}
+        try:
+            translated_text = manager.get_translation(item['text'], item['service'], item['from_language_key'], item['to_language_key'])
+            status.update({'status': 200, 'translated_text': translated_text})
+        except (cloudlanguagetools.errors.RequestError, cloudlanguagetools.errors.NotFoundError) as err:
+            status.update({'status': get_error_status(err), 'error': str(err)})
+        status['processing_time'] = timeit.default_timer() - starttime
+        results.append(status)
+    return results
+
+def process_job(manager, redis_connection, job):
+    logging.info(f"processing job {job['job_id']} ({job['job_type']}, {len(job['data']['items'])} items)")
+    try:
+        if job['job_type'] == redisdb.JOB_TYPE_AUDIO:
+            results = process_audio_job(manager, job['data'])
+        else:
+            results = process_translation_job(manager, job['data'])
+    except Exception as err:
+        # the job must complete, otherwise clients would poll until it expires
+        logging.exception(f"could not process job {job['job_id']}")
+        results = [{'index': index, 'status': 500, 'error': str(err)} for index in range(len(job['data']['items']))]
+    redis_connection.complete_job(job['job_id'], results)
+
+def run_worker_thread(manager):
+    # each thread has its own redis connection, take_job blocks
+    redis_connection = redisdb.RedisDb()
+    while True:
+        job = redis_connection.take_job(JOB_WORKER_POLL_TIMEOUT)
+        if job != None:
+            process_job(manager, redis_connection, job)
+
+def run_worker():
+    manager = cloudlanguagetools.servicemanager.ServiceManager(secrets.config)
+    manager.configure()
+    if not manager.shared_audio_available():
+        # the web nodes would have nowhere to find the audio
+        raise Exception('the job worker requires AUDIO_STORAGE_BUCKET, or an AUDIO_CACHE_DIR shared with the web nodes')
+    # same as the web nodes, so that jobs don't synthesize audio which is already being synthesized elsewhere
+    redis_connection = redisdb.RedisDb()
+    manager.configure_request_coalescer(request_coalescing.RequestCoalescer(redis_connection))
+    manager.configure_peer_cache(peer_cache.create_peer_cache_from_env(redis_connection, serve=False))
+    logging.info(f'starting {JOB_WORKER_THREADS} job worker threads')
+    threads = [threading.Thread(target=run_worker_thread, args=(manager,), daemon=True) for i in range(JOB_WORKER_THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+if __name__ == '__main__':
+    logging.basicConfig(format='%(asctime)s %(levelname)-8s [%(filename)s:%(lineno)d] %(message)s',
+                        datefmt='%Y%m%d-%H:%M:%S',
+                        level=logging.INFO)
+    run_worker()
@@ -0,0 +1,131 @@
+import os
+import time
+import threading
+import logging
+import requests
+import cloudlanguagetools.constants
+import cloudlanguagetools.errors
+import cloudlanguagetools.hashring
+
+# groupcache-style audio cache across API nodes: each audio request has an owner node in a consistent hash ring,
+# other nodes ask the owner for the audio, the owner serves it from its cache or synthesizes it.
+# membership is either static (PEER_CACHE_NODES=http://node1:8042,http://node2:8042) or through redis,
+# where each node registers PEER_CACHE_SELF_URL. to try it locally, run several gunicorn instances on different
+# ports, each with its own PEER_CACHE_SELF_URL and AUDIO_CACHE_DIR, and the same PEER_CACHE_SECRET
+
+# nodes register this often (and refresh their view of the ring), and disappear from the ring after PEER_NODE_MAX_AGE without registering
+PEER_MEMBERSHIP_REFRESH_INTERVAL = 10
+PEER_NODE_MAX_AGE = 30
+PEER_CONNECT_TIMEOUT = 0.5
+# the owner may have to call the service
+PEER_READ_TIMEOUT = 2 * cloudlanguagetools.constants.RequestTimeout
+PEER_SECRET_HEADER = 'peer_secret'
+
+def create_peer_cache_from_env(redis_connection, serve=True):
+    """returns a PeerCache if PEER_CACHE_SELF_URL and PEER_CACHE_SECRET are set, None otherwise.
+    processes which don't serve /_peer_audio (the job worker) pass serve=False: they only fetch from the other nodes,
+    and are enabled by PEER_CACHE_SECRET"""
+    self_url = None
+    shared_secret = os.environ.get('PEER_CACHE_SECRET', None)
+    if serve:
+        self_url = os.environ.get('PEER_CACHE_SELF_URL', None)
+        if self_url == None:
+            return None
+        if shared_secret == None:
+            # the other nodes would reject our requests, and /_peer_audio rejects theirs
+            logging.error('PEER_CACHE_SELF_URL is set but PEER_CACHE_SECRET is missing, peer audio cache disabled')
+            return None
+    elif shared_secret == None:
+        return None
+    static_nodes = None
+    if 'PEER_CACHE_NODES' in os.environ:
+        static_nodes = [x.strip() for x in os.environ['PEER_CACHE_NODES'].split(',') if len(x.strip()) > 0]
+    logging.info(f'peer audio cache: {self_url}, nodes: {static_nodes if static_nodes != None else "from redis"}')
+    return PeerCache(self_url, shared_secret, redis_connection, static_nodes)
+
+class PeerCache():
+    def __init__(self, self_url, shared_secret, redis_connection, static_nodes=None):
+        self.self_url = self_url
+        self.shared_secret = shared_secret
+        self.redis_connection = redis_connection
+        self.static_nodes = static_nodes
+        self.session = requests.Session()
+        self.lock = threading.Lock()
+        self.hash_ring = None
+        self.membership_update_time = 0
+        self.stats = {'owner': 0, 'peer_hits': 0, 'peer_errors': 0}
+        if self.self_url != None and self.static_nodes == None:
+            # registration can't depend on traffic, otherwise quiet nodes drop out of the ring and key ownership keeps moving
+            threading.Thread(target=self.run_heartbeat, daemon=True).start()
+
+    def run_heartbeat(self):
+        while True:
+            try:
+                self.redis_connection.register_peer_node(self.self_url)
+            except Exception as err:
+                logging.warning(f'peer audio cache: could not register {self.self_url}: {err}')
+            time.sleep(PEER_MEMBERSHIP_REFRESH_INTERVAL)
+
+    def increment_stat(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    def get_hash_ring(self):
+        with self.lock:
+            if self.hash_ring != None and (self.static_nodes != None or time.time() - self.membership_update_time < PEER_MEMBERSHIP_REFRESH_INTERVAL):
+                return self.hash_ring
+            self.membership_update_time = time.time()
+            if self.static_nodes != None:
+                nodes = self.static_nodes
+            else:
+                try:
+                    nodes = self.redis_connection.list_peer_nodes(PEER_NODE_MAX_AGE)
+                except Exception as err:
+                    # keep going with the nodes we knew about
+                    logging.warning(f'peer audio cache: could not update membership: {err}')
+                    if self.hash_ring != None:
+                        return self.hash_ring
+                    nodes = []
+            if self.self_url != None:
+                nodes = nodes + [self.self_url]
+            self.hash_ring = cloudlanguagetools.hashring.HashRing(nodes)
+            return self.hash_ring
+
+    def get_owner(self, cache_key):
+        return self.get_hash_ring().get_node(cache_key)
+
+    def fetch_audio(self, cache_key, audio_request):
+        """audio bytes from the owner of cache_key, or None if this node is the owner, or the owner can't be reached.
+        audio_request is a dict with text, service, voice_key, options, audio_format and request_mode, so that
+        the owner can synthesize the audio. raises the owner's RequestError / NotFoundError"""
+        owner = self.get_owner(cache_key)
+        if owner == None or owner == self.self_url:
+            self.increment_stat('owner')
+            return None
+        try:
+            response = self.session.post(f'{owner}/_peer_audio', json=audio_request,
+                headers={PEER_SECRET_HEADER: self.shared_secret}, timeout=(PEER_CONNECT_TIMEOUT, PEER_READ_TIMEOUT))
+        except requests.exceptions.RequestException as err:
+            logging.warning(f'peer audio cache: could not reach {owner}: {err}')
+            self.increment_stat('peer_errors')
+            return None
+        if response.status_code == 200:
+            self.increment_stat('peer_hits')
+            return response.content
+        if response.status_code in [400, 404]:
+            # the service itself failed on the owner, it would fail here too
+            try:
+                error_message = response.json().get('error', 'peer error')
+            except ValueError:
+                error_message = response.text
+            if response.status_code == 404:
+                raise cloudlanguagetools.errors.NotFoundError(error_message)
+            raise cloudlanguagetools.errors.RequestError(error_message)
+        logging.warning(f'peer audio cache: {owner} returned status {response.status_code}')
+        self.increment_stat('peer_errors')
+        return None
+
+    def get_stats(self):
+        hash_ring = self.get_hash_ring()
+        with self.lock:
+            return {**self.stats, 'nodes': hash_ring.nodes}
@@ -23,6 +23,20 @@ KEY_TYPE_USER_REQUEST_MODE ='user_request_mode'
 KEY_TYPE_USER_SERVICE ='user_service'
 KEY_TYPE_USER_AUDIO_LANGUAGE ='user_audio_language'
 KEY_TYPE_AUDIO_LOG ='audio_log'
+KEY_TYPE_AUDIO_LOCK = 'audio_lock'
+KEY_TYPE_AUDIO_COALESCING = 'audio_coalescing'
+KEY_TYPE_JOB = 'job'
+KEY_TYPE_JOB_QUEUE = 'job_queue'
+KEY_TYPE_PEER_NODES = 'peer_nodes'
+
+JOB_TYPE_AUDIO = 'audio'
+JOB_TYPE_TRANSLATION = 'translation'
+
+JOB_STATUS_QUEUED = 'queued'
+JOB_STATUS_RUNNING = 'running'
+JOB_STATUS_DONE = 'done'
+# jobs and their results get removed after that, clients are expected to collect results quickly
+JOB_EXPIRE_TIME = 3600
 
 KEY_PREFIX = 'clt'
 
@@ -409,6 +423,111 @@ class RedisDb():
         self.r.rpush(redis_key, value_str)
         self.r.expire(redis_key, self.get_expire_time_usage())
 
+    # audio request coalescing
+    # ========================
+
+    def acquire_audio_lock(self, lock_id, ttl_ms):
+        """returns a token if the lock was acquired, None otherwise"""
+        redis_key = self.build_key(KEY_TYPE_AUDIO_LOCK, lock_id)
+        token = self.password_generator()
+        if self.r.set(redis_key, token, nx=True, px=ttl_ms):
+            return token
+        return None
+
+    def release_audio_lock(self, lock_id, token):
+        # only delete the lock if we still own it, it may have expired and been acquired by another worker
+        redis_key = self.build_key(KEY_TYPE_AUDIO_LOCK, lock_id)
+        script = """if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"""
+        self.r.eval(script, 1, redis_key, token)
+
+    def audio_lock_exists(self, lock_id):
+        redis_key = self.build_key(KEY_TYPE_AUDIO_LOCK, lock_id)
+        return self.r.exists(redis_key) == 1
+
+    def track_audio_coalescing(self, counter):
+        date_str = datetime.datetime.today().strftime('%Y%m%d')
+        redis_key = self.build_key(KEY_TYPE_AUDIO_COALESCING, date_str)
+        self.r.hincrby(redis_key, counter, 1)
+        self.r.expire(redis_key, self.get_expire_time_usage())
+
+    def get_audio_coalescing_stats(self):
+        date_str = datetime.datetime.today().strftime('%Y%m%d')
+        redis_key = self.build_key(KEY_TYPE_AUDIO_COALESCING, date_str)
+        return {counter: int(value) for counter, value in self.r.hgetall(redis_key).items()}
+
+    # peer audio cache membership (peer_cache.py)
+    # ============================================
+
+    def register_peer_node(self, node_url):
+        redis_key = self.build_key(KEY_TYPE_PEER_NODES, 'audio')
+        self.r.zadd(redis_key, {node_url: datetime.datetime.now().timestamp()})
+
+    def list_peer_nodes(self, max_age):
+        """nodes which registered within the last max_age seconds"""
+        redis_key = self.build_key(KEY_TYPE_PEER_NODES, 'audio')
+        min_timestamp = datetime.datetime.now().timestamp() - max_age
+        self.r.zremrangebyscore(redis_key, '-inf', min_timestamp)
+        return self.r.zrangebyscore(redis_key, min_timestamp, '+inf')
+
+    # asynchronous jobs (job_worker.py)
+    # ==================================
+
+    def submit_job(self, api_key, job_type, job_data):
+        """queue a job for the job workers, returns the job id"""
+        job_id = self.password_generator()
+        redis_key = self.build_key(KEY_TYPE_JOB, job_id)
+        self.r.hset(redis_key, mapping={
+            'api_key': api_key,
+            'job_type': job_type,
+            'status': JOB_STATUS_QUEUED,
+            'data': json.dumps(job_data),
+            'submitted_time': int(datetime.datetime.now().timestamp())
+        })
+        self.r.expire(redis_key, JOB_EXPIRE_TIME)
+        self.r.rpush(self.build_key(KEY_TYPE_JOB_QUEUE, 'pending'), job_id)
+        return job_id
+
+    def get_job(self, job_id):
+        """returns the job as a dict, or None if it doesn't exist (or expired)"""
+        redis_key = self.build_key(KEY_TYPE_JOB, job_id)
+        job = self.r.hgetall(redis_key)
+        if len(job) == 0:
+            return None
+        job['job_id'] = job_id
+        job['data'] = json.loads(job['data'])
+        job['results'] = json.loads(job.get('results', '[]'))
+        return job
+
+    def take_job(self, timeout):
+        """blocks until a job is available, returns the job, or None after timeout seconds"""
+        entry = self.r.blpop(self.build_key(KEY_TYPE_JOB_QUEUE, 'pending'), timeout=timeout)
+        if entry == None:
+            return None
+        queue_key, job_id = entry
+        job = self.get_job(job_id)
+        if job == None:
+            # expired while in the queue
+            return None
+        self.r.hset(self.build_key(KEY_TYPE_JOB, job_id), mapping={
+            'status': JOB_STATUS_RUNNING,
+            'started_time': int(datetime.datetime.now().timestamp())
+        })
+        return job
+
+    def complete_job(self, job_id, results):
+        """results is a list of dicts (one per item). the audio itself stays in the audio cache, results only
+        contain the cache keys"""
+        redis_key = self.build_key(KEY_TYPE_JOB, job_id)
+        self.r.hset(redis_key, mapping={
+            'status': JOB_STATUS_DONE,
+            'results': json.dumps(results),
+            'completed_time': int(datetime.datetime.now().timestamp())
+        })
+        self.r.expire(redis_key, JOB_EXPIRE_TIME)
+
+    def get_job_queue_length(self):
+        return self.r.llen(self.build_key(KEY_TYPE_JOB_QUEUE, 'pending'))
+
     def track_audio_language(self, api_key, language_code):
         redis_key = self.build_monthly_user_key(KEY_TYPE_USER_AUDIO_LANGUAGE, api_key)
         self.r.hincrby(redis_key, language_code.name, 1)
@@ -471,7 +590,8 @@ class RedisDb():
         })
 
 
-    def track_usage(self, api_key, service, request_type, characters: int, language_code=None):
+    def track_usage(self, api_key, service, request_type, characters: int, language_code=None, track=True):
+        """raises OverQuotaError if the request would put the key over quota. with track=False, only checks the quota"""
         expire_time_seconds = 30*3*24*3600 # 3 months
 
         if language_code != None:
@@ -561,6 +681,9 @@ class RedisDb():
                 error_msg = f'Exceeded {usage_slice.usage_scope.name} {usage_slice.usage_period.name} quota)'
                 raise cloudlanguagetools.errors.OverQuotaError(error_msg)        
 
+        if not track:
+            return
+
         # track usage
         for usage_slice in usage_slice_list:
             key = self.build_key(KEY_TYPE_USAGE, usage_slice.build_key_suffix())
@@ -0,0 +1,53 @@
+import time
+import socket
+import logging
+import cloudlanguagetools.constants
+import cloudlanguagetools.audiobuffer
+
+# the lock must outlive the slowest service call, otherwise a second worker would call the service too
+COALESCING_LOCK_TTL_MS = 3 * cloudlanguagetools.constants.RequestTimeout * 1000
+COALESCING_WAIT_TIMEOUT = 2 * cloudlanguagetools.constants.RequestTimeout
+COALESCING_POLL_INTERVAL = 0.05
+
+class RequestCoalescer():
+    """when identical audio requests arrive concurrently on several workers, only one of them
+    calls the service. the others wait for the lock to be released and pick up the result
+    from the audio cache, which is shared between workers on the same host"""
+    def __init__(self, redis_connection):
+        self.redis_connection = redis_connection
+        # the audio cache directory is local to this host, so is the coalescing
+        self.hostname = socket.gethostname()
+
+    def get_audio(self, cache_key, cache_lookup, synthesize):
+        """cache_lookup returns audio bytes or None, synthesize calls the service,
+        stores the result in the cache and returns an AudioBuffer"""
+        lock_id = f'{self.hostname}:{cache_key}'
+        token = self.redis_connection.acquire_audio_lock(lock_id, COALESCING_LOCK_TTL_MS)
+        if token != None:
+            try:
+                # another worker may have completed the same request right before we acquired the lock
+                audio_data = cache_lookup()
+                if audio_data != None:
+                    return cloudlanguagetools.audiobuffer.AudioBuffer(audio_data)
+                self.redis_connection.track_audio_coalescing('service_calls')
+                return synthesize()
+            finally:
+                self.redis_connection.release_audio_lock(lock_id, token)
+
+        # another worker is calling the service for this request, wait for it to finish
+        deadline = time.time() + COALESCING_WAIT_TIMEOUT
+        while time.time() < deadline and self.redis_connection.audio_lock_exists(lock_id):
+            time.sleep(COALESCING_POLL_INTERVAL)
+
+        audio_data = cache_lookup()
+        if audio_data != None:
+            self.redis_connection.track_audio_coalescing('coalesced')
+            return cloudlanguagetools.audiobuffer.AudioBuffer(audio_data)
+
+        # the other worker failed or timed out, call the service ourselves
+        logging.warning(f'audio request coalescing: no result after waiting for {lock_id}, calling service')
+        self.redis_connection.track_audio_coalescing('fallback_service_calls')
+        return synthesize()
+
+    def get_stats(self):
+        return self.redis_connection.get_audio_coalescing_stats()
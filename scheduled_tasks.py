@@ -7,6 +7,12 @@ import json
 import os
 import redisdb
 import user_utils
+import secrets
+import cache_warming
+import cloudlanguagetools.servicemanager
+
+# off-peak, server time
+CACHE_WARMING_TIME = os.environ.get('CACHE_WARMING_TIME', '03:00')
 
 def backup_redis_db():
     scp_username = os.environ['RSYNC_NET_USER']
@@ -39,6 +45,15 @@ def report_getcheddar_usage():
     utils = user_utils.UserUtils()
     utils.report_getcheddar_usage_all_users()
 
+def warm_audio_cache():
+    logging.info('warming audio cache')
+    manager = cloudlanguagetools.servicemanager.ServiceManager(secrets.config)
+    manager.configure()
+    connection = redisdb.RedisDb()
+    audio_request_log = connection.retrieve_audio_requests()
+    budget = float(os.environ.get('CACHE_WARMING_BUDGET', cache_warming.CACHE_WARMING_DEFAULT_BUDGET))
+    cache_warming.warm_audio_cache(manager, audio_request_log, budget)
+
 def setup_tasks():
     logging.info('running tasks once')
     report_getcheddar_usage()
@@ -48,6 +63,9 @@ def setup_tasks():
     schedule.every(1).hour.do(backup_redis_db)
     schedule.every(3).hours.do(update_airtable)
     schedule.every(6).hours.do(report_getcheddar_usage)
+    # the warmed audio is only useful if the cache directory is shared with the api containers
+    if 'AUDIO_CACHE_DIR' in os.environ:
+        schedule.every().day.at(CACHE_WARMING_TIME).do(warm_audio_cache)
 
 
 def run_scheduler():
@@ -15,9 +15,16 @@ then
 . ${CWD}/digitalocean_spaces.sh
 . ${CWD}/patreon_prod_digitalocean.sh
 . ${CWD}/rsync_net.sh
+. ${CWD}/tts_keys.sh
 python3 scheduled_tasks.py
+elif [ -n "$RUN_JOB_WORKER" ]
+then
+. ${CWD}/tts_keys.sh
+. ${CWD}/digitalocean_spaces.sh
+python3 job_worker.py
 else
 . ${CWD}/tts_keys.sh
 . ${CWD}/convertkit.sh
+. ${CWD}/digitalocean_spaces.sh
 exec gunicorn --workers 3 -b :8042 --timeout 120 --access-logfile - --error-logfile - app:app
 fi
\ No newline at end of file
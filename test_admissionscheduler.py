@@ -0,0 +1,91 @@
+import unittest
+import threading
+import time
+
+import cloudlanguagetools.constants
+import cloudlanguagetools.errors
+import cloudlanguagetools.admissionscheduler
+
+RequestMode = cloudlanguagetools.constants.RequestMode
+
+class TestAdmissionScheduler(unittest.TestCase):
+    def wait_for_queue_depth(self, scheduler, service, queue_depth):
+        for i in range(100):
+            if scheduler.services[service].queue_depth() == queue_depth:
+                return
+            time.sleep(0.01)
+        self.fail(f'queue depth did not reach {queue_depth}')
+
+    def test_priority(self):
+        scheduler = cloudlanguagetools.admissionscheduler.AdmissionScheduler({'Azure': 1})
+        admission_order = []
+
+        def request(request_mode):
+            with scheduler.admit('Azure', request_mode):
+                admission_order.append(request_mode)
+
+        # the only slot is taken
+        scheduler.acquire('Azure', RequestMode.batch)
+        threads = []
+        for request_mode in [RequestMode.batch] * 4 + [RequestMode.dynamic] * 2:
+            thread = threading.Thread(target=request, args=(request_mode,))
+            thread.start()
+            threads.append(thread)
+            self.wait_for_queue_depth(scheduler, 'Azure', len(threads))
+
+        stats = scheduler.get_stats()['Azure']
+        self.assertEqual(stats['request_modes']['batch']['queue_depth'], 4)
+        self.assertEqual(stats['request_modes']['dynamic']['queue_depth'], 2)
+
+        scheduler.release('Azure')
+        for thread in threads:
+            thread.join()
+
+        # dynamic requests jump ahead of the batch requests which were queued before them
+        self.assertEqual(admission_order, [RequestMode.dynamic] * 2 + [RequestMode.batch] * 4)
+        stats = scheduler.get_stats()['Azure']
+        self.assertEqual(stats['running'], 0)
+        self.assertEqual(stats['request_modes']['batch']['admitted'], 5)
+        self.assertEqual(stats['request_modes']['dynamic']['admitted'], 2)
+        self.assertTrue(stats['request_modes']['batch']['max_wait'] > 0)
+
+    def test_weighted_sharing(self):
+        # when both classes are backlogged, batch still gets its share
+        scheduler = cloudlanguagetools.admissionscheduler.AdmissionScheduler({'Google': 1}, weights={RequestMode.dynamic: 2, RequestMode.edit: 2, RequestMode.batch: 1})
+        admission_order = []
+
+        def request(request_mode):
+            with scheduler.admit('Google', request_mode):
+                admission_order.append(request_mode)
+
+        scheduler.acquire('Google', RequestMode.batch)
+        threads = []
+        for request_mode in [RequestMode.dynamic] * 4 + [RequestMode.batch] * 2:
+            thread = threading.Thread(target=request, args=(request_mode,))
+            thread.start()
+            threads.append(thread)
+            self.wait_for_queue_depth(scheduler, 'Google', len(threads))
+        scheduler.release('Google')
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(admission_order, [RequestMode.dynamic, RequestMode.dynamic, RequestMode.batch,
+            RequestMode.dynamic, RequestMode.dynamic, RequestMode.batch])
+
+    def test_timeout(self):
+        scheduler = cloudlanguagetools.admissionscheduler.AdmissionScheduler({'Amazon': 1},
+            timeouts={RequestMode.dynamic: 0.05, RequestMode.edit: 0.05, RequestMode.batch: 0.2})
+        scheduler.acquire('Amazon', RequestMode.batch)
+        self.assertRaises(cloudlanguagetools.errors.RequestError, scheduler.acquire, 'Amazon', RequestMode.dynamic)
+        # batch requests wait longer
+        start_time = time.time()
+        self.assertRaises(cloudlanguagetools.errors.RequestError, scheduler.acquire, 'Amazon', RequestMode.batch)
+        self.assertGreaterEqual(time.time() - start_time, 0.2)
+        stats = scheduler.get_stats()['Amazon']
+        self.assertEqual(stats['request_modes']['batch']['timeouts'], 1)
+        self.assertEqual(stats['request_modes']['dynamic']['timeouts'], 1)
+        self.assertEqual(stats['request_modes']['dynamic']['queue_depth'], 0)
+        scheduler.release('Amazon')
+        # the slot is available again
+        with scheduler.admit('Amazon', RequestMode.dynamic):
+            self.assertEqual(scheduler.get_stats()['Amazon']['running'], 1)
@@ -8,8 +8,14 @@ import pytest
 import quotas
 import redisdb
 import urllib.parse
-from app import app, redis_connection
+import io
+import zipfile
+import time
+from app import app, redis_connection, manager
+import job_worker
 import cloudlanguagetools.constants
+import cloudlanguagetools.audiocache
+import cloudlanguagetools.servicemanager
 
 class ApiTests(unittest.TestCase):
     @classmethod
@@ -103,6 +109,10 @@ class ApiTests(unittest.TestCase):
         self.assertTrue(len(voice1['voice_description']) > 0)
         self.assertTrue(len(voice1['service']) > 0)
         self.assertTrue('voice_key' in voice1)
+        self.assertTrue(voice1['voice_handle'].startswith(voice1['service'].lower() + '_'))
+
+        # voice handles are unique
+        self.assertEqual(len(set([x['voice_handle'] for x in voice_list])), len(voice_list))
 
     def test_translation_language_list(self):
         # pytest test_api.py -rPP -k 'test_translation_language_list'
@@ -447,6 +457,12 @@ class ApiTests(unittest.TestCase):
         tracking_audio_language_redis_key = redis_connection.build_monthly_user_key(redisdb.KEY_TYPE_USER_AUDIO_LANGUAGE, self.api_key_v2)
         self.assertEqual(1, int(redis_connection.r.hget(tracking_audio_language_redis_key, 'fr')))
 
+        # audio request log
+        self.assertEqual(1, redis_connection.r.llen(log_audio_request_redis_key))
+        audio_request_log_entry = json.loads(redis_connection.r.lindex(log_audio_request_redis_key, 0))
+        self.assertEqual(audio_request_log_entry['text'], source_text_french)
+        self.assertEqual(audio_request_log_entry['service'], 'Azure')
+
 
         # make two more requests
         # ======================
@@ -499,6 +515,328 @@ class ApiTests(unittest.TestCase):
 
 
 
+    def test_audio_v2_stream(self):
+        # pytest test_api.py -k test_audio_v2_stream
+
+        source_text_french = 'Je ne suis pas intéressé.'
+
+        for service in ['Amazon', 'Azure', 'Google']:
+            french_voices = [x for x in self.voice_list if x['language_code'] == 'fr' and x['service'] == service]
+            first_voice = french_voices[0]
+            response = self.client.post('/audio_v2', json={
+                'text': source_text_french,
+                'service': service,
+                'deck_name': 'french_deck_1',
+                'request_mode': 'dynamic',
+                'language_code': first_voice['language_code'],
+                'voice_key': first_voice['voice_key'],
+                'options': {},
+                'stream': True
+            }, headers={'api_key': self.api_key, 'client': 'test', 'client_version': self.client_version})
+
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.is_streamed)
+
+            output_temp_file = tempfile.NamedTemporaryFile()
+            with open(output_temp_file.name, 'wb') as f:
+                f.write(response.data)
+            f.close()
+
+            # verify file type
+            filetype = magic.from_file(output_temp_file.name)
+            # should be an MP3 file
+            expected_filetype = 'MPEG ADTS, layer III'
+
+            self.assertTrue(expected_filetype in filetype)
+
+    def test_audio_v2_audio_format(self):
+        # pytest test_api.py -k test_audio_v2_audio_format
+
+        source_text_french = 'Je ne suis pas intéressé.'
+
+        # Azure and Google produce ogg opus natively, Amazon and Naver get transcoded
+        for service in ['Azure', 'Google', 'Amazon', 'Naver']:
+            french_voices = [x for x in self.voice_list if x['language_code'] == 'fr' and x['service'] == service]
+            first_voice = french_voices[0]
+            for audio_format, mime_type, expected_filetype in [('ogg_opus', 'audio/ogg', 'Ogg data, Opus audio'), ('mp3_low', 'audio/mpeg', 'MPEG ADTS, layer III')]:
+                response = self.client.post('/audio_v2', json={
+                    'text': source_text_french,
+                    'service': service,
+                    'deck_name': 'french_deck_1',
+                    'request_mode': 'batch',
+                    'language_code': first_voice['language_code'],
+                    'voice_key': first_voice['voice_key'],
+                    'options': {},
+                    'audio_format': audio_format
+                }, headers={'api_key': self.api_key, 'client': 'test', 'client_version': self.client_version})
+
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.mimetype, mime_type)
+                self.assertTrue(expected_filetype in magic.from_buffer(response.data))
+
+        # rejected before usage gets tracked
+        response = self.client.post('/audio_v2', json={
+            'text': source_text_french,
+            'service': 'Azure',
+            'request_mode': 'batch',
+            'language_code': first_voice['language_code'],
+            'voice_key': first_voice['voice_key'],
+            'options': {},
+            'audio_format': 'wav'
+        }, headers={'api_key': self.api_key, 'client': 'test', 'client_version': self.client_version})
+        self.assertEqual(response.status_code, 400)
+
+    def test_audio_v2_chunked(self):
+        # pytest test_api.py -k test_audio_v2_chunked
+
+        source_text = 'Je ne suis pas intéressé par cette offre. Merci de ne plus me contacter. Bonne journée à vous.'
+        service = 'Azure'
+        french_voices = [x for x in self.voice_list if x['language_code'] == 'fr' and x['service'] == service]
+        first_voice = french_voices[0]
+        response = self.client.post('/audio_v2', json={
+            'text': source_text,
+            'service': service,
+            'deck_name': 'french_deck_1',
+            'request_mode': 'batch',
+            'language_code': first_voice['language_code'],
+            'voice_key': first_voice['voice_key'],
+            'options': {},
+            'chunked': True
+        }, headers={'api_key': self.api_key, 'client': 'test', 'client_version': self.client_version})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue('MPEG ADTS, layer III' in magic.from_buffer(response.data))
+
+        # each sentence got cached separately
+        cache_key = cloudlanguagetools.audiocache.build_audio_cache_key('Merci de ne plus me contacter.', service, first_voice['voice_key'], {})
+        self.assertTrue(manager.audio_cache.contains(cache_key))
+
+    def test_audio_batch(self):
+        # pytest test_api.py -k test_audio_batch
+
+        items = []
+        for service in ['Azure', 'Google', 'Amazon']:
+            french_voices = [x for x in self.voice_list if x['language_code'] == 'fr' and x['service'] == service]
+            voice = french_voices[0]
+            items.append({
+                'text': 'Je ne suis pas intéressé.',
+                'service': service,
+                'language_code': voice['language_code'],
+                'voice_key': voice['voice_key'],
+                'options': {}
+            })
+        # forvo doesn't have this word
+        forvo_voices = [x for x in self.voice_list if x['language_code'] == 'fr' and x['service'] == 'Forvo']
+        items.append({
+            'text': 'wordnotfound',
+            'service': 'Forvo',
+            'language_code': 'fr',
+            'voice_key': forvo_voices[0]['voice_key'],
+            'options': {}
+        })
+
+        response = self.client.post('/audio_batch', json={
+            'request_mode': 'batch',
+            'items': items
+        }, headers={'api_key': self.api_key, 'client': 'test', 'client_version': self.client_version})
+        self.assertEqual(response.status_code, 200)
+
+        zip_file = zipfile.ZipFile(io.BytesIO(response.data))
+        results = json.loads(zip_file.read('results.json'))
+        self.assertEqual(len(results), 4)
+        self.assertEqual([x['status'] for x in results], [200, 200, 200, 404])
+
+        for result in results[0:3]:
+            output_temp_file = tempfile.NamedTemporaryFile()
+            with open(output_temp_file.name, 'wb') as f:
+                f.write(zip_file.read(result['filename']))
+            filetype = magic.from_file(output_temp_file.name)
+            self.assertTrue('MPEG ADTS, layer III' in filetype)
+
+    def test_audio_batch_not_authenticated(self):
+        # pytest test_api.py -k test_audio_batch_not_authenticated
+        response = self.client.post('/audio_batch', json={
+            'request_mode': 'batch',
+            'items': []
+        })
+        self.assertEqual(response.status_code, 401)
+
+    def test_service_stats_not_authenticated(self):
+        # pytest test_api.py -k test_service_stats_not_authenticated
+        response = self.client.get('/service_stats')
+        self.assertEqual(response.status_code, 401)
+        # a regular api key isn't enough
+        response = self.client.get('/service_stats', headers={'api_key': self.api_key})
+        self.assertEqual(response.status_code, 401)
+
+    def test_voice_comparison(self):
+        # pytest test_api.py -k test_voice_comparison
+
+        voices = []
+        for service in ['Azure', 'Google', 'Amazon']:
+            french_voices = [x for x in self.voice_list if x['language_code'] == 'fr' and x['service'] == service]
+            for voice in french_voices[0:2]:
+                voices.append({
+                    'service': service,
+                    'voice_key': voice['voice_key'],
+                    'options': {}
+                })
+
+        response = self.client.post('/voice_comparison', json={
+            'text': 'Je ne suis pas intéressé.',
+            'language_code': 'fr',
+            'voices': voices
+        }, headers={'api_key': self.api_key, 'client': 'test', 'client_version': self.client_version})
+        self.assertEqual(response.status_code, 200)
+
+        zip_file = zipfile.ZipFile(io.BytesIO(response.data))
+        results = json.loads(zip_file.read('results.json'))
+        self.assertEqual(len(results), 6)
+        for result in results:
+            self.assertEqual(result['status'], 200)
+            self.assertTrue(result['processing_time'] >= 0)
+            filetype = magic.from_buffer(zip_file.read(result['filename']))
+            self.assertTrue('MPEG ADTS, layer III' in filetype)
+
+    def test_audio_concat(self):
+        # pytest test_api.py -k test_audio_concat
+        azure_voices = [x for x in self.voice_list if x['language_code'] == 'fr' and x['service'] == 'Azure']
+        google_voices = [x for x in self.voice_list if x['language_code'] == 'fr' and x['service'] == 'Google']
+        items = [
+            {'text': 'intéressé', 'service': 'Azure', 'language_code': 'fr', 'voice_key': azure_voices[0]['voice_key'], 'options': {}},
+            {'silence': 500},
+            {'text': 'Je ne suis pas intéressé.', 'service': 'Google', 'language_code': 'fr', 'voice_key': google_voices[0]['voice_key'], 'options': {}}
+        ]
+        response = self.client.post('/audio_concat', json={
+            'items': items
+        }, headers={'api_key': self.api_key, 'client': 'test', 'client_version': self.client_version})
+        self.assertEqual(response.status_code, 200)
+        filetype = magic.from_buffer(response.data)
+        self.assertTrue('MPEG ADTS, layer III' in filetype)
+
+        # the joined clip comes from the cache the second time
+        second_response = self.client.post('/audio_concat', json={
+            'items': items
+        }, headers={'api_key': self.api_key, 'client': 'test', 'client_version': self.client_version})
+        self.assertEqual(second_response.status_code, 200)
+        self.assertEqual(second_response.data, response.data)
+
+        # silence only
+        response = self.client.post('/audio_concat', json={
+            'items': [{'silence': 500}]
+        }, headers={'api_key': self.api_key, 'client': 'test', 'client_version': self.client_version})
+        self.assertEqual(response.status_code, 400)
+
+        # silence too long
+        response = self.client.post('/audio_concat', json={
+            'items': [items[0], {'silence': 60000}]
+        }, headers={'api_key': self.api_key, 'client': 'test', 'client_version': self.client_version})
+        self.assertEqual(response.status_code, 400)
+
+    def test_audio_prefetch(self):
+        # pytest test_api.py -k test_audio_prefetch
+
+        service = 'Azure'
+        french_voices = [x for x in self.voice_list if x['language_code'] == 'fr' and x['service'] == service]
+        voice = french_voices[0]
+        source_text = f'Je ne suis pas intéressé {datetime.datetime.now().timestamp()}.'
+        audio_request = {
+            'text': source_text,
+            'service': service,
+            'language_code': voice['language_code'],
+            'voice_key': voice['voice_key'],
+            'options': {}
+        }
+
+        response = self.client.post('/audio_prefetch', json={'items': [audio_request]},
+            headers={'api_key': self.api_key, 'client': 'test', 'client_version': self.client_version})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json['queued'], 1)
+
+        # wait for the audio to be cached
+        cache_key = cloudlanguagetools.audiocache.build_audio_cache_key(source_text, service, voice['voice_key'], {})
+        for i in range(100):
+            if manager.audio_cache.contains(cache_key):
+                break
+            time.sleep(0.1)
+        self.assertTrue(manager.audio_cache.contains(cache_key))
+
+        # already cached, doesn't get queued again
+        response = self.client.post('/audio_prefetch', json={'items': [audio_request]},
+            headers={'api_key': self.api_key, 'client': 'test', 'client_version': self.client_version})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json['queued'], 0)
+
+    def test_jobs(self):
+        # pytest test_api.py -k test_jobs
+
+        items = []
+        for service in ['Azure', 'Google']:
+            french_voices = [x for x in self.voice_list if x['language_code'] == 'fr' and x['service'] == service]
+            voice = french_voices[0]
+            items.append({
+                'text': 'Je ne suis pas intéressé.',
+                'service': service,
+                'language_code': voice['language_code'],
+                'voice_key': voice['voice_key'],
+                'options': {}
+            })
+        headers = {'api_key': self.api_key, 'client': 'test', 'client_version': self.client_version}
+        job_request = {
+            'job_type': 'audio',
+            'request_mode': 'batch',
+            'items': items
+        }
+        # the web node needs to be able to retrieve the audio synthesized by the job worker
+        audio_cache_shared = manager.audio_cache_shared
+        manager.audio_cache_shared = False
+        if manager.audio_storage == None:
+            response = self.client.post('/jobs', json=job_request, headers=headers)
+            self.assertEqual(response.status_code, 503)
+        # the job worker runs in this process, and uses the same audio cache
+        manager.audio_cache_shared = True
+        self.addCleanup(setattr, manager, 'audio_cache_shared', audio_cache_shared)
+
+        response = self.client.post('/jobs', json=job_request, headers=headers)
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json['job_id']
+
+        response = self.client.get(f'/jobs/{job_id}', headers=headers)
+        self.assertEqual(response.json['status'], 'queued')
+
+        response = self.client.get(f'/jobs/{job_id}?wait=abc', headers=headers)
+        self.assertEqual(response.status_code, 400)
+
+        # another user can't see the job
+        response = self.client.get(f'/jobs/{job_id}', headers={'api_key': self.api_key_v2})
+        self.assertEqual(response.status_code, 404)
+
+        # process the job, as job_worker.py would
+        job = redis_connection.take_job(1)
+        self.assertEqual(job['job_id'], job_id)
+        job_worker.process_job(manager, redis_connection, job)
+
+        response = self.client.get(f'/jobs/{job_id}?wait=5', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['status'], 'done')
+        self.assertEqual([x['status'] for x in response.json['results']], [200, 200])
+
+        for index in range(2):
+            response = self.client.get(f'/jobs/{job_id}/audio/{index}', headers=headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue('MPEG ADTS, layer III' in magic.from_buffer(response.data))
+
+        # translation job
+        response = self.client.post('/jobs', json={
+            'job_type': 'translation',
+            'items': [{'text': 'Je ne suis pas intéressé.', 'service': 'Azure', 'from_language_key': 'fr', 'to_language_key': 'en'}]
+        }, headers=headers)
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json['job_id']
+        job_worker.process_job(manager, redis_connection, redis_connection.take_job(1))
+        response = self.client.get(f'/jobs/{job_id}', headers=headers)
+        self.assertEqual(response.json['results'][0]['translated_text'], "I'm not interested.")
+
     def test_audio_forvo_not_found(self):
         # pytest test_api.py -k test_audio_forvo_not_found
         
@@ -548,6 +886,79 @@ class ApiTests(unittest.TestCase):
 
         self.assertTrue(expected_filetype in filetype)
 
+    def test_audio_yomichan_etag(self):
+        # pytest test_api.py -rPP -k test_audio_yomichan_etag
+
+        service = 'Azure'
+        japanese_voices = [x for x in self.voice_list if x['language_code'] == 'ja' and x['service'] == service]
+        first_voice = japanese_voices[0]
+
+        source_text = 'こんばんは'
+        voice_key_str = urllib.parse.quote_plus(json.dumps(first_voice['voice_key']))
+        url_params = f'api_key={self.api_key}&service={service}&voice_key={voice_key_str}&text={source_text}'
+        url = f'/yomichan_audio?{url_params}'
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag, weak = response.get_etag()
+        self.assertNotEqual(etag, None)
+        self.assertTrue('max-age' in response.headers['Cache-Control'])
+
+        # usage after the first request
+        usage_slice = quotas.UsageSlice(cloudlanguagetools.constants.RequestType.audio,
+                            cloudlanguagetools.constants.UsageScope.User,
+                            cloudlanguagetools.constants.UsagePeriod.daily,
+                            cloudlanguagetools.constants.Service.Azure,
+                            self.api_key,
+                            cloudlanguagetools.constants.ApiKeyType.test,
+                            None)
+        usage_redis_key = redis_connection.build_key(redisdb.KEY_TYPE_USAGE, usage_slice.build_key_suffix())
+        characters = redis_connection.r.hget(usage_redis_key, 'characters')
+
+        # the client already has the audio: not modified, and not charged
+        response = self.client.get(url, headers={'If-None-Match': f'"{etag}"'})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(response.data), 0)
+        self.assertEqual(response.get_etag()[0], etag)
+        self.assertEqual(redis_connection.r.hget(usage_redis_key, 'characters'), characters)
+
+        # a different text has a different etag
+        url_params = f'api_key={self.api_key}&service={service}&voice_key={voice_key_str}&text=おやすみなさい'
+        response = self.client.get(f'/yomichan_audio?{url_params}', headers={'If-None-Match': f'"{etag}"'})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.get_etag()[0], etag)
+
+    def test_audio_yomichan_voice_handle(self):
+        # pytest test_api.py -rPP -k test_audio_yomichan_voice_handle
+
+        service = 'Azure'
+        japanese_voices = [x for x in self.voice_list if x['language_code'] == 'ja' and x['service'] == service]
+        first_voice = japanese_voices[0]
+
+        source_text = 'おはようございます'
+        voice_key_str = urllib.parse.quote_plus(json.dumps(first_voice['voice_key']))
+        response_voice_key = self.client.get(f'/yomichan_audio?api_key={self.api_key}&service={service}&voice_key={voice_key_str}&text={source_text}')
+        self.assertEqual(response_voice_key.status_code, 200)
+
+        # same voice, specified with its handle
+        response = self.client.get(f"/yomichan_audio?api_key={self.api_key}&voice={first_voice['voice_handle']}&text={source_text}")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue('MPEG ADTS, layer III' in magic.from_buffer(response.data))
+        self.assertEqual(response.get_etag(), response_voice_key.get_etag())
+
+        response = self.client.get(f'/yomichan_audio?api_key={self.api_key}&voice=azure_000000000000&text={source_text}')
+        self.assertEqual(response.status_code, 404)
+
+        # the voice handle index isn't built yet
+        manager.voice_handle_index_ready.clear()
+        self.addCleanup(manager.voice_handle_index_ready.set)
+        voice_handle_index_wait = cloudlanguagetools.servicemanager.VOICE_HANDLE_INDEX_WAIT
+        cloudlanguagetools.servicemanager.VOICE_HANDLE_INDEX_WAIT = 0
+        self.addCleanup(setattr, cloudlanguagetools.servicemanager, 'VOICE_HANDLE_INDEX_WAIT', voice_handle_index_wait)
+        response = self.client.get(f"/yomichan_audio?api_key={self.api_key}&voice={first_voice['voice_handle']}&text={source_text}")
+        self.assertEqual(response.status_code, 503)
+        self.assertTrue('Retry-After' in response.headers)
+
     def test_audio_yomichan_incorrect_api_key(self):
         # pytest test_api.py -rPP -k test_audio_yomichan_incorrect_api_key
         
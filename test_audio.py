@@ -225,6 +225,25 @@ class TestAudio(unittest.TestCase):
         source_text = 'wordnotfound'
         self.assertRaises(cloudlanguagetools.errors.NotFoundError, self.verify_service_audio_language, source_text, Service.Forvo, AudioLanguage.fr_FR, 'fr-FR')
 
+    def test_forvo_cache(self):
+        # pytest test_audio.py -k test_forvo_cache
+        forvo_service = self.manager.services[Service.Forvo.name]
+        voice_key = {
+            "country_code": "FRA",
+            "language_code": "fr"
+        }
+        # the second lookup of a missing word is served from the negative cache
+        not_found_hits = forvo_service.get_stats()['not_found_cache']['hits']
+        for i in range(2):
+            self.assertRaises(cloudlanguagetools.errors.NotFoundError, forvo_service.get_tts_audio, 'wordnotfound', voice_key, {})
+        self.assertEqual(forvo_service.get_stats()['not_found_cache']['hits'], not_found_hits + 1)
+
+        audio_1 = forvo_service.get_tts_audio('absolument', voice_key, {})
+        audio_hits = forvo_service.get_stats()['audio_cache']['hits']
+        audio_2 = forvo_service.get_tts_audio('absolument', voice_key, {})
+        self.assertEqual(forvo_service.get_stats()['audio_cache']['hits'], audio_hits + 1)
+        self.assertEqual(audio_1.get_bytes(), audio_2.get_bytes())
+
 
     def test_azure_options(self):
         service = 'Azure'
@@ -240,6 +259,20 @@ class TestAudio(unittest.TestCase):
         audio_text = self.speech_to_text(audio_temp_file, 'fr-FR')
         self.assertEqual(self.sanitize_recognized_text(source_text), self.sanitize_recognized_text(audio_text))
 
+    def test_multiple_utterances(self):
+        # pytest test_audio.py -k test_multiple_utterances
+        text_list = ['Bonjour', 'Je ne suis pas intéressé.', 'absolument']
+        # opt-in for polly, it costs a second request
+        self.manager.services[Service.Amazon.name].multi_utterance_enabled = True
+        for service in [Service.Azure, Service.Google, Service.Amazon]:
+            voice = self.get_voice_list_service_audio_language(service, AudioLanguage.fr_FR)[0]
+            # one service call, split into one clip per text
+            audio_buffers = self.manager.get_tts_audio_multiple(text_list, service.name, voice['voice_key'], {})
+            self.assertEqual(len(audio_buffers), len(text_list))
+            for text, audio_buffer in zip(text_list, audio_buffers):
+                audio_text = self.speech_to_text(audio_buffer, 'fr-FR')
+                self.assertEqual(self.sanitize_recognized_text(text), self.sanitize_recognized_text(audio_text), msg=f'{service.name}: {text}')
+
     def test_fptai_options(self):
         service = 'FptAi'
         source_text = 'Tôi bị mất cái ví.'
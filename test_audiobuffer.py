@@ -0,0 +1,31 @@
+import unittest
+
+import cloudlanguagetools.audiobuffer
+
+class TestAudioBuffer(unittest.TestCase):
+    def test_in_memory(self):
+        audio_buffer = cloudlanguagetools.audiobuffer.AudioBuffer(b'audio')
+        audio_buffer.write(b' data')
+        self.assertFalse(audio_buffer.spooled())
+        self.assertEqual(audio_buffer.get_bytes(), b'audio data')
+        self.assertEqual(bytes(audio_buffer.get_memoryview()), b'audio data')
+        self.assertEqual(audio_buffer.get_file().read(), b'audio data')
+        self.assertEqual(len(audio_buffer), 10)
+
+    def test_spool_to_disk(self):
+        audio_buffer = cloudlanguagetools.audiobuffer.AudioBuffer(spool_size=8)
+        audio_buffer.write(b'audio')
+        self.assertFalse(audio_buffer.spooled())
+        audio_buffer.write(b' data')
+        self.assertTrue(audio_buffer.spooled())
+        audio_buffer.write(b' 2')
+        self.assertEqual(audio_buffer.get_bytes(), b'audio data 2')
+        with audio_buffer.get_file() as f:
+            self.assertEqual(f.read(), b'audio data 2')
+        self.assertEqual(len(audio_buffer), 12)
+
+    def test_name_compatibility(self):
+        audio_buffer = cloudlanguagetools.audiobuffer.AudioBuffer(b'audio data')
+        with open(audio_buffer.name, 'rb') as f:
+            self.assertEqual(f.read(), b'audio data')
+        self.assertEqual(audio_buffer.get_bytes(), b'audio data')
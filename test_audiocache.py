@@ -0,0 +1,108 @@
+import unittest
+import tempfile
+import os
+import time
+
+import cloudlanguagetools.constants
+import cloudlanguagetools.audiocache
+
+class TestAudioCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.cache_dir.cleanup()
+
+    def test_cache_key(self):
+        build_audio_cache_key = cloudlanguagetools.audiocache.build_audio_cache_key
+        key_1 = build_audio_cache_key('hello', 'Google', {'name': 'en-US-Wavenet-A', 'language_code': 'en-US'}, {'pitch': 1.0, 'speaking_rate': 1.2})
+        # ordering of dict entries doesn't matter
+        key_2 = build_audio_cache_key('hello', 'Google', {'language_code': 'en-US', 'name': 'en-US-Wavenet-A'}, {'speaking_rate': 1.2, 'pitch': 1.0})
+        self.assertEqual(key_1, key_2)
+        # but every component does
+        self.assertNotEqual(key_1, build_audio_cache_key('hello!', 'Google', {'name': 'en-US-Wavenet-A', 'language_code': 'en-US'}, {'pitch': 1.0, 'speaking_rate': 1.2}))
+        self.assertNotEqual(key_1, build_audio_cache_key('hello', 'Azure', {'name': 'en-US-Wavenet-A', 'language_code': 'en-US'}, {'pitch': 1.0, 'speaking_rate': 1.2}))
+        self.assertNotEqual(key_1, build_audio_cache_key('hello', 'Google', {'name': 'en-US-Wavenet-A', 'language_code': 'en-US'}, {'pitch': 1.0}))
+        # including the audio format
+        self.assertEqual(key_1, build_audio_cache_key('hello', 'Google', {'name': 'en-US-Wavenet-A', 'language_code': 'en-US'}, {'pitch': 1.0, 'speaking_rate': 1.2}, cloudlanguagetools.constants.AudioFormat.mp3))
+        self.assertNotEqual(key_1, build_audio_cache_key('hello', 'Google', {'name': 'en-US-Wavenet-A', 'language_code': 'en-US'}, {'pitch': 1.0, 'speaking_rate': 1.2}, cloudlanguagetools.constants.AudioFormat.ogg_opus))
+
+    def test_concat_cache_key(self):
+        build_audio_concat_cache_key = cloudlanguagetools.audiocache.build_audio_concat_cache_key
+        key_1 = build_audio_concat_cache_key(['abc', 500, 'def'])
+        self.assertEqual(key_1, build_audio_concat_cache_key(['abc', 500, 'def'], cloudlanguagetools.constants.AudioFormat.mp3))
+        # ordering, silences and audio format matter
+        self.assertNotEqual(key_1, build_audio_concat_cache_key(['def', 500, 'abc']))
+        self.assertNotEqual(key_1, build_audio_concat_cache_key(['abc', 'def']))
+        self.assertNotEqual(key_1, build_audio_concat_cache_key(['abc', 1000, 'def']))
+        self.assertNotEqual(key_1, build_audio_concat_cache_key(['abc', 500, 'def'], cloudlanguagetools.constants.AudioFormat.ogg_opus))
+        # a single segment doesn't collide with the segment itself
+        self.assertNotEqual(build_audio_concat_cache_key(['abc']), 'abc')
+
+    def test_get_put(self):
+        audio_cache = cloudlanguagetools.audiocache.AudioCache(self.cache_dir.name)
+        self.assertEqual(audio_cache.get('abcdef'), None)
+        self.assertFalse(audio_cache.contains('abcdef'))
+        audio_cache.put('abcdef', b'audio data 1')
+        self.assertTrue(audio_cache.contains('abcdef'))
+        self.assertEqual(audio_cache.get('abcdef'), b'audio data 1')
+
+        stats = audio_cache.get_stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['size'], len(b'audio data 1'))
+
+        # a new instance on the same directory (another worker) sees the same data
+        audio_cache_2 = cloudlanguagetools.audiocache.AudioCache(self.cache_dir.name)
+        self.assertEqual(audio_cache_2.get('abcdef'), b'audio data 1')
+        self.assertEqual(audio_cache_2.get_stats()['size'], len(b'audio data 1'))
+
+    def test_eviction(self):
+        audio_cache = cloudlanguagetools.audiocache.AudioCache(self.cache_dir.name, max_size=300)
+        audio_cache.put('key_1', b'1' * 100)
+        audio_cache.put('key_2', b'2' * 100)
+        audio_cache.put('key_3', b'3' * 100)
+        # make key_1 the least recently used entry
+        past_time = time.time() - 60
+        os.utime(audio_cache.get_path('key_1'), (past_time, past_time))
+        os.utime(audio_cache.get_path('key_2'), (past_time + 1, past_time + 1))
+        os.utime(audio_cache.get_path('key_3'), (past_time + 2, past_time + 2))
+        # access key_1, it becomes the most recently used
+        self.assertEqual(audio_cache.get('key_1'), b'1' * 100)
+
+        # goes over max size, key_2 and key_3 must be evicted to get down to 90%
+        audio_cache.put('key_4', b'4' * 100)
+        self.assertEqual(audio_cache.get('key_2'), None)
+        self.assertEqual(audio_cache.get('key_3'), None)
+        self.assertEqual(audio_cache.get('key_1'), b'1' * 100)
+        self.assertEqual(audio_cache.get('key_4'), b'4' * 100)
+        self.assertEqual(audio_cache.get_stats()['evictions'], 2)
+        self.assertEqual(audio_cache.get_stats()['size'], 200)
+
+    def test_overwrite(self):
+        audio_cache = cloudlanguagetools.audiocache.AudioCache(self.cache_dir.name)
+        audio_cache.put('abcdef', b'audio data 1')
+        audio_cache.put('abcdef', b'audio data 22')
+        self.assertEqual(audio_cache.get('abcdef'), b'audio data 22')
+        self.assertEqual(audio_cache.get_stats()['size'], len(b'audio data 22'))
+
+    def test_shared_directory_size(self):
+        audio_cache_1 = cloudlanguagetools.audiocache.AudioCache(self.cache_dir.name, max_size=300)
+        # another worker on the same directory
+        audio_cache_2 = cloudlanguagetools.audiocache.AudioCache(self.cache_dir.name, max_size=300)
+        audio_cache_2.put('key_1', b'1' * 100)
+        audio_cache_2.put('key_2', b'2' * 100)
+        audio_cache_2.put('key_3', b'3' * 100)
+        past_time = time.time() - 60
+        for index, cache_key in enumerate(['key_1', 'key_2', 'key_3']):
+            os.utime(audio_cache_2.get_path(cache_key), (past_time + index, past_time + index))
+
+        # doesn't know about the other worker's entries until it refreshes its size from disk
+        audio_cache_1.put('key_4', b'4' * 100)
+        self.assertEqual(audio_cache_1.get_stats()['size'], 100)
+        audio_cache_1.size_refresh_time = 0
+        audio_cache_1.put('key_5', b'5' * 100)
+        self.assertEqual(audio_cache_1.get_stats()['size'], 200)
+        self.assertEqual(audio_cache_1.get_stats()['evictions'], 3)
+        self.assertEqual(audio_cache_1.get('key_1'), None)
+        self.assertEqual(audio_cache_1.get('key_5'), b'5' * 100)
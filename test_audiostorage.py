@@ -0,0 +1,45 @@
+import unittest
+import uuid
+import hashlib
+import requests
+
+import cloudlanguagetools.constants
+import cloudlanguagetools.audiostorage
+
+# needs an S3-compatible bucket, see tools/local_audio_storage.sh to run against a local minio
+class TestAudioStorage(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.audio_storage = cloudlanguagetools.audiostorage.create_audio_storage_from_env()
+        if cls.audio_storage == None:
+            raise unittest.SkipTest('AUDIO_STORAGE_BUCKET is not set')
+        existing_buckets = [x['Name'] for x in cls.audio_storage.client.list_buckets()['Buckets']]
+        if cls.audio_storage.bucket_name not in existing_buckets:
+            cls.audio_storage.client.create_bucket(Bucket=cls.audio_storage.bucket_name)
+
+    def test_put_get(self):
+        cache_key = hashlib.sha256(uuid.uuid4().bytes).hexdigest()
+        audio_format = cloudlanguagetools.constants.AudioFormat.mp3
+        self.assertFalse(self.audio_storage.contains(cache_key, audio_format))
+        self.assertEqual(self.audio_storage.get(cache_key, audio_format), None)
+        self.assertEqual(self.audio_storage.get_url(cache_key, audio_format), None)
+
+        self.audio_storage.put(cache_key, audio_format, b'audio data')
+        self.assertTrue(self.audio_storage.contains(cache_key, audio_format))
+        self.assertEqual(self.audio_storage.get(cache_key, audio_format), b'audio data')
+
+        # the presigned url can be downloaded without credentials
+        url = self.audio_storage.get_url(cache_key, audio_format)
+        response = requests.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'audio data')
+        self.assertEqual(response.headers['Content-Type'], 'audio/mpeg')
+
+    def test_uploaded_by_other_node(self):
+        cache_key = hashlib.sha256(uuid.uuid4().bytes).hexdigest()
+        audio_format = cloudlanguagetools.constants.AudioFormat.ogg_opus
+        # another node, with its own knowledge of which objects exist
+        other_audio_storage = cloudlanguagetools.audiostorage.AudioStorage(self.audio_storage.client, self.audio_storage.bucket_name)
+        other_audio_storage.put(cache_key, audio_format, b'ogg audio data')
+        self.assertEqual(self.audio_storage.get(cache_key, audio_format), b'ogg audio data')
+        self.assertNotEqual(self.audio_storage.get_url(cache_key, audio_format), None)
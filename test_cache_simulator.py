@@ -0,0 +1,95 @@
+import unittest
+import sys
+import os
+import random
+import collections
+import numpy
+import pandas
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tools'))
+import cache_simulator
+
+def reference_lru(key_ids, sizes, capacity):
+    cached = collections.OrderedDict()
+    used_size = 0
+    hits = []
+    for key_id, size in zip(key_ids, sizes):
+        if key_id in cached:
+            cached.move_to_end(key_id)
+            hits.append(True)
+            continue
+        hits.append(False)
+        if size > capacity:
+            continue
+        while used_size + size > capacity:
+            evicted_key_id, evicted_size = cached.popitem(last=False)
+            used_size -= evicted_size
+        cached[key_id] = size
+        used_size += size
+    return numpy.array(hits)
+
+def reference_lfu(key_ids, sizes, capacity):
+    # key_id -> [frequency, last position, size], the least frequently / least recently used entry gets evicted
+    cached = {}
+    used_size = 0
+    hits = []
+    for position, (key_id, size) in enumerate(zip(key_ids, sizes)):
+        if key_id in cached:
+            cached[key_id][0] += 1
+            cached[key_id][1] = position
+            hits.append(True)
+            continue
+        hits.append(False)
+        if size > capacity:
+            continue
+        while used_size + size > capacity:
+            evicted_key_id = min(cached.keys(), key=lambda x: (cached[x][0], cached[x][1]))
+            used_size -= cached[evicted_key_id][2]
+            del cached[evicted_key_id]
+        cached[key_id] = [1, position, size]
+        used_size += size
+    return numpy.array(hits)
+
+class TestCacheSimulator(unittest.TestCase):
+    def get_random_requests(self, seed):
+        random.seed(seed)
+        key_ids = numpy.array([random.randint(0, 60) for i in range(3000)])
+        key_sizes = {key_id: random.randint(1, 50) for key_id in set(key_ids.tolist())}
+        sizes = numpy.array([key_sizes[key_id] for key_id in key_ids.tolist()])
+        return key_ids, sizes
+
+    def test_lru(self):
+        for seed in range(3):
+            key_ids, sizes = self.get_random_requests(seed)
+            stack_distances = cache_simulator.compute_lru_stack_distances(key_ids.tolist(), sizes.tolist())
+            # including capacities smaller than some of the entries
+            for capacity in [10, 40, 100, 300, 800, 2000]:
+                numpy.testing.assert_array_equal(cache_simulator.get_lru_hits(key_ids, sizes, capacity, stack_distances),
+                    reference_lru(key_ids.tolist(), sizes.tolist(), capacity), err_msg=f'seed {seed} capacity {capacity}')
+
+    def test_lfu(self):
+        for seed in range(3):
+            key_ids, sizes = self.get_random_requests(seed)
+            for capacity in [10, 100, 800]:
+                numpy.testing.assert_array_equal(cache_simulator.simulate_lfu(key_ids.tolist(), sizes.tolist(), capacity),
+                    reference_lfu(key_ids.tolist(), sizes.tolist(), capacity), err_msg=f'seed {seed} capacity {capacity}')
+
+    def test_simulate(self):
+        requests_df = pandas.DataFrame([
+            {'text': 'Bonjour', 'service': 'Azure', 'voice': '{"name": "fr-FR-DeniseNeural"}', 'language_code': 'fr', 'timestamp': 0},
+            # same entry once normalized
+            {'text': ' Bonjour ', 'service': 'Azure', 'voice': '{"name": "fr-FR-DeniseNeural"}', 'language_code': 'fr', 'timestamp': 3600},
+            {'text': 'Bonjour', 'service': 'Google', 'voice': '{"name": "fr-FR-Wavenet-A"}', 'language_code': 'fr', 'timestamp': 7200},
+            {'text': 'Bonjour', 'service': 'Azure', 'voice': '{"name": "fr-FR-DeniseNeural"}', 'language_code': 'fr', 'timestamp': 10 * 24 * 3600},
+        ])
+        requests_df = cache_simulator.prepare_requests(requests_df)
+        self.assertEqual(requests_df['key_id'].tolist(), [0, 0, 1, 0])
+        self.assertEqual(requests_df['size'].tolist(), [7 * cache_simulator.AUDIO_BYTES_PER_CHARACTER] * 4)
+
+        results_df = cache_simulator.simulate(requests_df, capacities_mb=[1], ttl_hours=[24]).set_index('policy')
+        self.assertEqual(results_df.loc['unbounded', 'hit_ratio'], 0.5)
+        self.assertEqual(results_df.loc['lru', 'hit_ratio'], 0.5)
+        self.assertEqual(results_df.loc['lfu', 'hit_ratio'], 0.5)
+        # the last request comes after the entry expired
+        self.assertEqual(results_df.loc['ttl', 'hit_ratio'], 0.25)
+        self.assertGreater(results_df.loc['lru', 'cost_saved'], 0)
@@ -0,0 +1,56 @@
+import unittest
+import tempfile
+import json
+
+import cache_warming
+import cloudlanguagetools.audiocache
+
+class TestCacheWarming(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.audio_cache = cloudlanguagetools.audiocache.AudioCache(self.cache_dir.name)
+
+    def tearDown(self):
+        self.cache_dir.cleanup()
+
+    def build_log_entry(self, text, service, voice_name, language_code='fr'):
+        return json.dumps({
+            'text': text,
+            'service': service,
+            'voice_key': {'name': voice_name},
+            'options': {},
+            'language_code': language_code,
+            'request_mode': 'batch',
+            'api_key': 'key_1',
+            'timestamp': 0
+        })
+
+    def test_popular_audio_requests(self):
+        audio_request_log = [self.build_log_entry('bonjour', 'Azure', 'voice_1')] * 3 + \
+            [self.build_log_entry('merci', 'Azure', 'voice_1')] * 5 + \
+            [self.build_log_entry('merci', 'Azure', 'voice_2')] + \
+            [self.build_log_entry('au revoir', 'Google', 'voice_3')] * 2
+        popular_audio_requests = cache_warming.get_popular_audio_requests(audio_request_log)
+        # requested once only, not included
+        self.assertEqual(len(popular_audio_requests), 3)
+        self.assertEqual([(count, x['text']) for count, x in popular_audio_requests], [(5, 'merci'), (3, 'bonjour'), (2, 'au revoir')])
+
+    def test_select_audio_requests(self):
+        audio_request_log = [self.build_log_entry('a' * 1000, 'Azure', 'voice_1')] * 4 + \
+            [self.build_log_entry('b' * 1000, 'Google', 'voice_2')] * 3 + \
+            [self.build_log_entry('c' * 100, 'Forvo', 'voice_3')] * 3 + \
+            [self.build_log_entry('d' * 10, 'Amazon', 'voice_4')] * 2
+        popular_audio_requests = cache_warming.get_popular_audio_requests(audio_request_log)
+
+        # first request already cached
+        cache_key = cloudlanguagetools.audiocache.build_audio_cache_key('a' * 1000, 'Azure', {'name': 'voice_1'}, {})
+        self.audio_cache.put(cache_key, b'audio')
+
+        # forvo has no known cost, the google request is over budget, the amazon request fits
+        budget = 0.001
+        selected, total_cost = cache_warming.select_audio_requests(popular_audio_requests, self.audio_cache, budget)
+        self.assertEqual([x['service'] for x in selected], ['Amazon'])
+        self.assertAlmostEqual(total_cost, 10 * 16.0 / 1000000)
+
+        selected, total_cost = cache_warming.select_audio_requests(popular_audio_requests, self.audio_cache, 1.0)
+        self.assertEqual([x['service'] for x in selected], ['Google', 'Amazon'])
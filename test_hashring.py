@@ -0,0 +1,35 @@
+import unittest
+
+import cloudlanguagetools.hashring
+
+class TestHashRing(unittest.TestCase):
+    def test_distribution(self):
+        nodes = ['http://node1:8042', 'http://node2:8042', 'http://node3:8042']
+        hash_ring = cloudlanguagetools.hashring.HashRing(nodes)
+        counts = {node: 0 for node in nodes}
+        for i in range(30000):
+            counts[hash_ring.get_node(f'key_{i}')] += 1
+        # roughly a third each
+        for node in nodes:
+            self.assertGreater(counts[node], 8000)
+            self.assertLess(counts[node], 12000)
+
+    def test_consistency(self):
+        nodes = ['http://node1:8042', 'http://node2:8042', 'http://node3:8042']
+        hash_ring = cloudlanguagetools.hashring.HashRing(nodes)
+        # every node computes the same owner, regardless of the ordering of the node list
+        other_hash_ring = cloudlanguagetools.hashring.HashRing(list(reversed(nodes)))
+        keys = [f'key_{i}' for i in range(10000)]
+        self.assertEqual([hash_ring.get_node(key) for key in keys], [other_hash_ring.get_node(key) for key in keys])
+
+        # adding a node only moves keys to the new node
+        bigger_hash_ring = cloudlanguagetools.hashring.HashRing(nodes + ['http://node4:8042'])
+        moved_count = 0
+        for key in keys:
+            if bigger_hash_ring.get_node(key) != hash_ring.get_node(key):
+                self.assertEqual(bigger_hash_ring.get_node(key), 'http://node4:8042')
+                moved_count += 1
+        self.assertLess(moved_count, 3500)
+
+    def test_empty(self):
+        self.assertEqual(cloudlanguagetools.hashring.HashRing([]).get_node('key'), None)
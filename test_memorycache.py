@@ -0,0 +1,35 @@
+import unittest
+import time
+
+import cloudlanguagetools.memorycache
+
+class TestMemoryCache(unittest.TestCase):
+    def test_get_put(self):
+        cache = cloudlanguagetools.memorycache.MemoryCache(10)
+        self.assertEqual(cache.get('word'), None)
+        cache.put('word', ('id_1', 'https://forvo/1.mp3'))
+        self.assertEqual(cache.get('word'), ('id_1', 'https://forvo/1.mp3'))
+        stats = cache.get_stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['entries'], 1)
+
+    def test_lru_eviction(self):
+        cache = cloudlanguagetools.memorycache.MemoryCache(2)
+        cache.put('key_1', 1)
+        cache.put('key_2', 2)
+        # key_1 becomes the most recently used
+        self.assertEqual(cache.get('key_1'), 1)
+        cache.put('key_3', 3)
+        self.assertEqual(cache.get('key_2'), None)
+        self.assertEqual(cache.get('key_1'), 1)
+        self.assertEqual(cache.get('key_3'), 3)
+        self.assertEqual(cache.get_stats()['evictions'], 1)
+
+    def test_ttl(self):
+        cache = cloudlanguagetools.memorycache.MemoryCache(10, ttl=0.05)
+        cache.put('key_1', 'not found')
+        self.assertEqual(cache.get('key_1'), 'not found')
+        time.sleep(0.1)
+        self.assertEqual(cache.get('key_1'), None)
+        self.assertEqual(cache.get_stats()['entries'], 0)
@@ -88,6 +88,11 @@ class TestApiKeys(unittest.TestCase):
 
         # this request will throw an exception
         self.assertRaises(cloudlanguagetools.errors.OverQuotaError, self.redis_connection.track_usage, api_key, service, request_type, 150)
+        self.assertRaises(cloudlanguagetools.errors.OverQuotaError, self.redis_connection.track_usage, api_key, service, request_type, 150, track=False)
+
+        # checking the quota doesn't use it up
+        self.redis_connection.track_usage(api_key, service, request_type, 100, track=False)
+        self.redis_connection.track_usage(api_key, service, request_type, 100)
 
     def test_track_usage_trial(self):
         email = 'trial_user_42@gmail.com'
@@ -112,5 +117,50 @@ class TestApiKeys(unittest.TestCase):
 
         
 
-
-
+    def test_audio_lock(self):
+        lock_id = 'host1:abcdef'
+        token_1 = self.redis_connection.acquire_audio_lock(lock_id, 5000)
+        self.assertNotEqual(token_1, None)
+        self.assertTrue(self.redis_connection.audio_lock_exists(lock_id))
+
+        # can't acquire the lock while it's held
+        self.assertEqual(self.redis_connection.acquire_audio_lock(lock_id, 5000), None)
+
+        # releasing with the wrong token doesn't do anything
+        self.redis_connection.release_audio_lock(lock_id, 'wrong_token')
+        self.assertTrue(self.redis_connection.audio_lock_exists(lock_id))
+
+        self.redis_connection.release_audio_lock(lock_id, token_1)
+        self.assertFalse(self.redis_connection.audio_lock_exists(lock_id))
+
+        token_2 = self.redis_connection.acquire_audio_lock(lock_id, 5000)
+        self.assertNotEqual(token_2, None)
+
+    def test_jobs(self):
+        job_id = self.redis_connection.submit_job('api_key_1', 'audio', {'items': [{'text': 'hello'}, {'text': 'world'}], 'audio_format': 'mp3'})
+        job = self.redis_connection.get_job(job_id)
+        self.assertEqual(job['status'], redisdb.JOB_STATUS_QUEUED)
+        self.assertEqual(job['api_key'], 'api_key_1')
+        self.assertEqual(job['data']['items'][1]['text'], 'world')
+        self.assertEqual(self.redis_connection.get_job_queue_length(), 1)
+
+        job = self.redis_connection.take_job(1)
+        self.assertEqual(job['job_id'], job_id)
+        self.assertEqual(self.redis_connection.get_job(job_id)['status'], redisdb.JOB_STATUS_RUNNING)
+        self.assertEqual(self.redis_connection.get_job_queue_length(), 0)
+        # queue is empty
+        self.assertEqual(self.redis_connection.take_job(1), None)
+
+        results = [{'index': 0, 'status': 200}, {'index': 1, 'status': 404, 'error': 'not found'}]
+        self.redis_connection.complete_job(job_id, results)
+        job = self.redis_connection.get_job(job_id)
+        self.assertEqual(job['status'], redisdb.JOB_STATUS_DONE)
+        self.assertEqual(job['results'], results)
+
+        self.assertEqual(self.redis_connection.get_job('nonexistentjob'), None)
+
+    def test_track_audio_coalescing(self):
+        self.redis_connection.track_audio_coalescing('coalesced')
+        self.redis_connection.track_audio_coalescing('coalesced')
+        self.redis_connection.track_audio_coalescing('leader')
+        self.assertEqual(self.redis_connection.get_audio_coalescing_stats(), {'coalesced': 2, 'leader': 1})
@@ -0,0 +1,72 @@
+import unittest
+import tempfile
+import os
+import multiprocessing
+
+import cloudlanguagetools.sharedaudiocache
+
+def put_in_other_process(path, slot_count):
+    shared_audio_cache = cloudlanguagetools.sharedaudiocache.SharedAudioCache(path, slot_count)
+    shared_audio_cache.put('key_from_other_process', b'audio from other process')
+
+class TestSharedAudioCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.cache_dir.name, 'shared_audio_cache')
+
+    def tearDown(self):
+        self.cache_dir.cleanup()
+
+    def test_get_put(self):
+        shared_audio_cache = cloudlanguagetools.sharedaudiocache.SharedAudioCache(self.path, 16)
+        self.assertEqual(shared_audio_cache.get('key_1'), None)
+        self.assertFalse(shared_audio_cache.contains('key_1'))
+        shared_audio_cache.put('key_1', b'audio data 1')
+        self.assertTrue(shared_audio_cache.contains('key_1'))
+        self.assertEqual(shared_audio_cache.get('key_1'), b'audio data 1')
+        # overwrite
+        shared_audio_cache.put('key_1', b'audio 1')
+        self.assertEqual(shared_audio_cache.get('key_1'), b'audio 1')
+
+        # too large for a slot
+        shared_audio_cache.put('key_2', b'x' * cloudlanguagetools.sharedaudiocache.SHARED_AUDIO_CACHE_DEFAULT_SLOT_SIZE)
+        self.assertEqual(shared_audio_cache.get('key_2'), None)
+
+        stats = shared_audio_cache.get_stats()
+        self.assertEqual(stats['entries'], 1)
+        self.assertEqual(stats['hits'], 2)
+        self.assertEqual(stats['misses'], 2)
+        self.assertEqual(stats['too_large'], 1)
+
+    def test_shared_between_processes(self):
+        shared_audio_cache = cloudlanguagetools.sharedaudiocache.SharedAudioCache(self.path, 16)
+        process = multiprocessing.Process(target=put_in_other_process, args=(self.path, 16))
+        process.start()
+        process.join()
+        self.assertEqual(shared_audio_cache.get('key_from_other_process'), b'audio from other process')
+
+        # survives a restart of the worker
+        shared_audio_cache = cloudlanguagetools.sharedaudiocache.SharedAudioCache(self.path, 16)
+        self.assertEqual(shared_audio_cache.get('key_from_other_process'), b'audio from other process')
+        # but not a change of layout, which goes to a different file
+        other_shared_audio_cache = cloudlanguagetools.sharedaudiocache.SharedAudioCache(self.path, 32)
+        self.assertEqual(other_shared_audio_cache.get('key_from_other_process'), None)
+        # processes using the previous layout are unaffected
+        self.assertNotEqual(other_shared_audio_cache.path, shared_audio_cache.path)
+        self.assertEqual(shared_audio_cache.get('key_from_other_process'), b'audio from other process')
+
+    def test_eviction(self):
+        shared_audio_cache = cloudlanguagetools.sharedaudiocache.SharedAudioCache(self.path, 4)
+        for i in range(100):
+            shared_audio_cache.put(f'key_{i}', f'audio {i}'.encode('utf-8'))
+        self.assertEqual(shared_audio_cache.get_stats()['entries'], 4)
+        # the most recent one is still there
+        self.assertEqual(shared_audio_cache.get('key_99'), b'audio 99')
+
+    def test_corrupted_slot(self):
+        shared_audio_cache = cloudlanguagetools.sharedaudiocache.SharedAudioCache(self.path, 1)
+        shared_audio_cache.put('key_1', b'audio data 1')
+        # a torn write: data doesn't match the crc anymore
+        offset = cloudlanguagetools.sharedaudiocache.FILE_HEADER_SIZE + cloudlanguagetools.sharedaudiocache.SLOT_HEADER_SIZE
+        shared_audio_cache.mm[offset:offset + 5] = b'xxxxx'
+        self.assertEqual(shared_audio_cache.get('key_1'), None)
@@ -0,0 +1,37 @@
+import unittest
+
+import cloudlanguagetools.constants
+import cloudlanguagetools.textnormalization
+
+RequestType = cloudlanguagetools.constants.RequestType
+
+class TestTextNormalization(unittest.TestCase):
+    def test_audio(self):
+        normalize_text = cloudlanguagetools.textnormalization.normalize_text
+        # all these variants end up with the same cache key
+        for text in ['Hello world!', ' Hello&nbsp;world! ', 'Hello\u00a0 world !!', 'Hello\nworld!', 'Hello\u200b world!']:
+            self.assertEqual(normalize_text(text, RequestType.audio, 'Naver'), 'Hello world!')
+        self.assertEqual(normalize_text('bonjour le monde .', RequestType.audio, 'Naver'), 'bonjour le monde.')
+        self.assertEqual(normalize_text('Tom &amp; Jerry', RequestType.audio, 'Naver'), 'Tom & Jerry')
+        # decomposed accent
+        self.assertEqual(normalize_text('cafe\u0301', RequestType.audio, 'Naver'), 'caf\u00e9')
+        # an ellipsis is kept
+        self.assertEqual(normalize_text('wait...', RequestType.audio, 'Naver'), 'wait...')
+
+    def test_ssml_preserved(self):
+        normalize_text = cloudlanguagetools.textnormalization.normalize_text
+        # azure embeds the text in ssml, xml entities and markup must survive
+        self.assertEqual(normalize_text('Tom &amp; Jerry&nbsp;&lt;3', RequestType.audio, 'Azure'), 'Tom &amp; Jerry &lt;3')
+        text = 'Hello <break time="1s"/> world'
+        self.assertEqual(normalize_text(text, RequestType.audio, 'Azure'), text)
+
+    def test_translation(self):
+        normalize_text = cloudlanguagetools.textnormalization.normalize_text
+        # line breaks are meaningful in translations
+        self.assertEqual(normalize_text(' first  line\n\nsecond&nbsp;line ', RequestType.translation, 'DeepL'), 'first line\n\nsecond line')
+        # paragraphs stay separate, but only by a single blank line
+        self.assertEqual(normalize_text('first line\n \n\n\nsecond line\nthird line\n\n', RequestType.translation, 'DeepL'), 'first line\n\nsecond line\nthird line')
+        self.assertEqual(normalize_text('1 &lt; 2', RequestType.translation, 'Google'), '1 &lt; 2')
+        # idempotent
+        text = normalize_text(' Hello&nbsp;world !! ', RequestType.audio, 'Google')
+        self.assertEqual(normalize_text(text, RequestType.audio, 'Google'), text)
@@ -0,0 +1,38 @@
+import unittest
+
+import cloudlanguagetools.constants
+import cloudlanguagetools.textsplitting
+
+Language = cloudlanguagetools.constants.Language
+
+class TestTextSplitting(unittest.TestCase):
+    def test_split_sentences(self):
+        split_sentences = cloudlanguagetools.textsplitting.split_sentences
+        text = 'Hello Mr. Smith, how are you? I am fine. It costs 3.5 dollars on example.com!'
+        sentences = split_sentences(text, Language.en)
+        self.assertEqual(sentences, ['Hello Mr. Smith, how are you? ', 'I am fine. ', 'It costs 3.5 dollars on example.com!'])
+        # no characters get lost
+        self.assertEqual(''.join(sentences), text)
+
+        self.assertEqual(split_sentences('J. R. R. Tolkien a écrit des livres. M. Dupont les a lus.', Language.fr),
+            ['J. R. R. Tolkien a écrit des livres. ', 'M. Dupont les a lus.'])
+        self.assertEqual(split_sentences('Il a dit « bonjour. » Puis il est parti.', Language.fr),
+            ['Il a dit « bonjour. » ', 'Puis il est parti.'])
+        self.assertEqual(split_sentences('今日はいい天気ですね。散歩に行きましょうか？', Language.ja),
+            ['今日はいい天気ですね。', '散歩に行きましょうか？'])
+
+    def test_no_split(self):
+        split_sentences = cloudlanguagetools.textsplitting.split_sentences
+        # ssml
+        text = 'Hello. <break time="1s"/> World.'
+        self.assertEqual(split_sentences(text, Language.en), [text])
+        # no sentence punctuation in thai
+        text = 'สวัสดีครับ. ยินดีที่ได้รู้จัก.'
+        self.assertEqual(split_sentences(text, Language.th), [text])
+
+    def test_split_text(self):
+        split_text = cloudlanguagetools.textsplitting.split_text
+        text = 'Yes. I would like to order a coffee. And a croissant, please. Thanks.'
+        # short sentences get merged with the next one, or the previous one at the end
+        self.assertEqual(split_text(text, Language.en), ['Yes. I would like to order a coffee.', 'And a croissant, please. Thanks.'])
+        self.assertEqual(split_text('Short text.', Language.en), ['Short text.'])
@@ -0,0 +1,236 @@
+import sys
+import os
+import inspect
+import json
+import heapq
+import logging
+import argparse
+
+import numpy
+import pandas
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+
+import quotas
+import cloudlanguagetools.constants
+import cloudlanguagetools.textnormalization
+
+# replays the audio request log through LRU, LFU and TTL caches, to see what hit ratio a given cache size buys.
+# preparing the log, the TTL policy and the LRU hit ratios are vectorized with pandas / numpy. the LRU stack
+# distances and LFU depend on the cache state left by every earlier request, so they are computed in a single
+# sequential pass each, O(log n) per request: a million requests take a couple of seconds, and the LRU pass
+# covers every capacity at once.
+# usage:
+#   python user_utils.py --action download_audio_requests
+#   python tools/cache_simulator.py --source csv --capacities_mb 128 512 2048
+
+# the request log doesn't record the size of the audio, estimate it from the text length:
+# speech is around 15 characters per second, mp3 at 96kbps is 12KB per second
+AUDIO_BYTES_PER_CHARACTER = 800
+DEFAULT_CAPACITIES_MB = [64, 128, 256, 512, 1024, 2048, 4096]
+DEFAULT_TTL_HOURS = [1, 6, 24, 7 * 24, 30 * 24]
+AUDIO_REQUESTS_CSV = 'temp_data_files/audio_requests.csv'
+
+def load_requests_redis():
+    import redisdb
+    redis_connection = redisdb.RedisDb()
+    audio_requests = [json.loads(x) for x in redis_connection.retrieve_audio_requests()]
+    for request in audio_requests:
+        # same columns as user_utils.download_audio_requests
+        request['voice'] = json.dumps(request['voice_key'])
+        request['options'] = json.dumps(request.get('options', {}), sort_keys=True)
+    return pandas.DataFrame(audio_requests)
+
+def load_requests_csv(filename):
+    return pandas.read_csv(filename, keep_default_na=False, na_values={'timestamp': ['']})
+
+def get_character_multipliers(requests_df):
+    """quotas.adjust_character_count for each (service, language_code) pair, as a multiplier column"""
+    multipliers_df = requests_df[['service', 'language_code']].drop_duplicates()
+    multipliers = []
+    for service, language_code in multipliers_df.itertuples(index=False):
+        language = None
+        if language_code in cloudlanguagetools.constants.Language.__members__:
+            language = cloudlanguagetools.constants.Language[language_code]
+        multipliers.append(quotas.adjust_character_count(cloudlanguagetools.constants.Service[service],
+            cloudlanguagetools.constants.RequestType.audio, language, 1000) / 1000)
+    multipliers_df['multiplier'] = multipliers
+    return multipliers_df
+
+def prepare_requests(requests_df, bytes_per_character=AUDIO_BYTES_PER_CHARACTER):
+    """adds key_id, size (bytes) and cost (dollars) columns, sorted by time"""
+    requests_df = requests_df.copy()
+    for column, default_value in [('options', '{}'), ('audio_format', cloudlanguagetools.constants.AudioFormat.mp3.name), ('language_code', '')]:
+        if column not in requests_df:
+            requests_df[column] = default_value
+    requests_df['options'] = requests_df['options'].astype(str)
+    requests_df['audio_format'] = requests_df['audio_format'].replace('', cloudlanguagetools.constants.AudioFormat.mp3.name)
+
+    # the log contains the text as the user sent it, the cache sees the normalized text.
+    # most requests are repeats, each distinct text only gets normalized once
+    requests_df['text'] = requests_df['text'].astype(str)
+    texts_df = requests_df[['text', 'service']].drop_duplicates()
+    texts_df['normalized_text'] = [cloudlanguagetools.textnormalization.normalize_text(text, cloudlanguagetools.constants.RequestType.audio, service)
+        for text, service in texts_df.itertuples(index=False)]
+    requests_df = requests_df.merge(texts_df, on=['text', 'service'], how='left')
+    requests_df['text'] = requests_df['normalized_text']
+    key_hashes = pandas.util.hash_pandas_object(requests_df[['text', 'service', 'voice', 'options', 'audio_format']], index=False)
+    requests_df['key_id'] = pandas.factorize(key_hashes)[0]
+
+    characters = requests_df['text'].str.len()
+    requests_df['size'] = characters * bytes_per_character
+    requests_df = requests_df.merge(get_character_multipliers(requests_df), on=['service', 'language_code'], how='left')
+    # services missing from the cost table count as free
+    character_costs = {x['service']: x['character_cost'] for x in quotas.COST_TABLE if x['request_type'] == 'audio'}
+    requests_df['cost'] = characters * requests_df['multiplier'] * requests_df['service'].map(character_costs).fillna(0)
+
+    # the log concatenates months, older entries may not have a timestamp
+    if 'timestamp' not in requests_df:
+        requests_df['timestamp'] = numpy.nan
+    requests_df['timestamp'] = pandas.to_numeric(requests_df['timestamp'], errors='coerce').ffill().bfill().fillna(0)
+    requests_df = requests_df.sort_values('timestamp', kind='stable').reset_index(drop=True)
+    return requests_df[['timestamp', 'key_id', 'service', 'size', 'cost']]
+
+def compute_lru_stack_distances(key_ids, sizes):
+    """for each request, the bytes of the distinct entries accessed since the previous request for the same entry,
+    including the entry itself (Mattson's stack distance). an LRU cache of capacity C hits exactly when the
+    distance is <= C, so a single pass gives the hit ratio at every capacity. numpy.inf on first requests"""
+    request_count = len(key_ids)
+    # fenwick tree over request positions, each entry's size is stored at the position of its latest request
+    tree = [0] * (request_count + 1)
+    last_positions = {}
+    distances = numpy.full(request_count, numpy.inf)
+    total_size = 0
+    for position, (key_id, size) in enumerate(zip(key_ids, sizes)):
+        previous_position = last_positions.get(key_id)
+        if previous_position == None:
+            total_size += size
+        else:
+            # bytes stored after previous_position: total minus the prefix sum up to previous_position
+            prefix_size = 0
+            index = previous_position + 1
+            while index > 0:
+                prefix_size += tree[index]
+                index -= index & -index
+            distances[position] = total_size - prefix_size + size
+            index = previous_position + 1
+            while index <= request_count:
+                tree[index] -= size
+                index += index & -index
+        last_positions[key_id] = position
+        index = position + 1
+        while index <= request_count:
+            tree[index] += size
+            index += index & -index
+    return distances
+
+def get_lru_hits(key_ids, sizes, capacity, stack_distances):
+    """boolean hit array for an LRU cache of capacity bytes. entries larger than the capacity never get cached
+    and don't evict anything: when there are any, the stack distances get computed again without them"""
+    cacheable = sizes <= capacity
+    if cacheable.all():
+        return stack_distances <= capacity
+    hits = numpy.zeros(len(key_ids), dtype=bool)
+    hits[cacheable] = compute_lru_stack_distances(key_ids[cacheable].tolist(), sizes[cacheable].tolist()) <= capacity
+    return hits
+
+def simulate_lfu(key_ids, sizes, capacity):
+    """returns a boolean hit array. frequencies are counted while the entry is cached,
+    ties are evicted least recently used first"""
+    hits = numpy.zeros(len(key_ids), dtype=bool)
+    # key_id -> (frequency, last position), the heap has stale entries which get skipped
+    cached = {}
+    heap = []
+    used_size = 0
+    for position, (key_id, size) in enumerate(zip(key_ids, sizes)):
+        entry = cached.get(key_id)
+        if entry != None:
+            hits[position] = True
+            entry = (entry[0] + 1, position)
+            cached[key_id] = entry
+            heapq.heappush(heap, (entry[0], entry[1], key_id))
+            continue
+        if size > capacity:
+            continue
+        while used_size + size > capacity:
+            frequency, last_position, evicted_key_id = heapq.heappop(heap)
+            if cached.get(evicted_key_id) == (frequency, last_position):
+                del cached[evicted_key_id]
+                used_size -= sizes[last_position]
+        cached[key_id] = (1, position)
+        heapq.heappush(heap, (1, position, key_id))
+        used_size += size
+    return hits
+
+def summarize(policy, parameter, hits, requests_df):
+    return {
+        'policy': policy,
+        'parameter': parameter,
+        'hit_ratio': hits.mean(),
+        'bytes_saved_mb': requests_df['size'].values[hits].sum() / (1024 * 1024),
+        'cost_saved': requests_df['cost'].values[hits].sum()
+    }
+
+def simulate(requests_df, capacities_mb=DEFAULT_CAPACITIES_MB, ttl_hours=DEFAULT_TTL_HOURS, lfu=True):
+    """requests_df comes from prepare_requests, returns a dataframe with one row per policy / parameter"""
+    key_ids = requests_df['key_id'].values
+    sizes = requests_df['size'].values
+    results = []
+
+    # unbounded cache: only the first request for each entry misses
+    results.append(summarize('unbounded', '', requests_df['key_id'].duplicated().values, requests_df))
+
+    stack_distances = compute_lru_stack_distances(key_ids.tolist(), sizes.tolist())
+    for capacity_mb in capacities_mb:
+        hits = get_lru_hits(key_ids, sizes, capacity_mb * 1024 * 1024, stack_distances)
+        results.append(summarize('lru', f'{capacity_mb}mb', hits, requests_df))
+
+    if lfu:
+        for capacity_mb in capacities_mb:
+            hits = simulate_lfu(key_ids.tolist(), sizes.tolist(), capacity_mb * 1024 * 1024)
+            results.append(summarize('lfu', f'{capacity_mb}mb', hits, requests_df))
+
+    # ttl: entries expire when they haven't been requested for ttl seconds, there is no size limit
+    timestamps = requests_df['timestamp'].values
+    previous_gaps = requests_df.groupby('key_id')['timestamp'].diff().values
+    next_gaps = -requests_df.groupby('key_id')['timestamp'].diff(-1).values
+    duration = max(timestamps.max() - timestamps.min(), 1)
+    for hours in ttl_hours:
+        ttl = hours * 3600
+        hits = previous_gaps <= ttl
+        result = summarize('ttl', f'{hours}h', hits, requests_df)
+        # each request keeps the entry around until the next request, or until it expires
+        residency = numpy.minimum(numpy.nan_to_num(next_gaps, nan=numpy.inf), numpy.minimum(ttl, timestamps.max() - timestamps))
+        result['average_size_mb'] = (sizes * residency).sum() / duration / (1024 * 1024)
+        results.append(result)
+
+    return pandas.DataFrame(results)
+
+if __name__ == '__main__':
+    logging.basicConfig(format='%(asctime)s %(levelname)-8s [%(filename)s:%(lineno)d] %(message)s',
+                        datefmt='%Y%m%d-%H:%M:%S',
+                        level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description='Audio cache simulator')
+    parser.add_argument('--source', choices=['csv', 'redis'], default='csv', help='csv written by user_utils.py --action download_audio_requests, or read the log from redis')
+    parser.add_argument('--filename', default=AUDIO_REQUESTS_CSV)
+    parser.add_argument('--capacities_mb', type=int, nargs='+', default=DEFAULT_CAPACITIES_MB)
+    parser.add_argument('--ttl_hours', type=int, nargs='+', default=DEFAULT_TTL_HOURS)
+    parser.add_argument('--bytes_per_character', type=int, default=AUDIO_BYTES_PER_CHARACTER)
+    parser.add_argument('--no_lfu', action='store_true', help='lfu is simulated request by request, once per capacity')
+    parser.add_argument('--output', help='write the results to this csv file')
+    args = parser.parse_args()
+
+    if args.source == 'redis':
+        requests_df = load_requests_redis()
+    else:
+        requests_df = load_requests_csv(args.filename)
+    requests_df = prepare_requests(requests_df, args.bytes_per_character)
+    logging.info(f"{len(requests_df)} requests, {requests_df['key_id'].nunique()} distinct entries")
+
+    results_df = simulate(requests_df, args.capacities_mb, args.ttl_hours, lfu=not args.no_lfu)
+    print(results_df.to_string(index=False))
+    if args.output != None:
+        results_df.to_csv(args.output, index=False)
@@ -0,0 +1,12 @@
+#!/bin/sh
+# local S3 stand-in for the audio storage tier, so that it can be exercised offline.
+# start minio first:
+#   docker run -d --name clt-minio -p 9000:9000 -e MINIO_ROOT_USER=clt_minio -e MINIO_ROOT_PASSWORD=clt_minio_secret minio/minio server /data
+# then:
+#   . tools/local_audio_storage.sh
+#   python -m pytest test_audiostorage.py
+export AUDIO_STORAGE_BUCKET=clt-audio-test
+export AUDIO_STORAGE_ENDPOINT_URL=http://localhost:9000
+export AUDIO_STORAGE_REGION=us-east-1
+export AUDIO_STORAGE_KEY=clt_minio
+export AUDIO_STORAGE_SECRET=clt_minio_secret